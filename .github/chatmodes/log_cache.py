@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - TraceId搜索结果缓存
+
+搜索结果压缩后保存在本地磁盘, 同时记录调用方校验结果所需的远程日志文件状态
+(产生结果的历史日志的大小和修改时间, 以及当前日志已搜索的字节数), 命中缓存前由调用方
+用一次 `stat` 校验, 当前日志只有新追加的内容时由调用方只搜索追加的部分。缓存总大小受字节预算限制,
+超出时按最近最少使用(LRU)淘汰。多个进程(命令行、守护进程、MCP)可共享同一缓存目录。
+"""
+import fcntl
+import hashlib
+import json
+import os
+import time
+import zlib
+from contextlib import contextmanager
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'vibedev-log-search')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResultCache(object):
+    """搜索结果缓存 - zlib压缩存储, LRU淘汰"""
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存文件总字节数上限
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = int(max_bytes or DEFAULT_MAX_BYTES)
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    @staticmethod
+    def make_key(**parts):
+        """根据TraceId和搜索选项生成缓存键"""
+        return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json.z')
+
+    @contextmanager
+    def _manifest(self):
+        """加锁读取清单, 退出时原子写回"""
+        with open(os.path.join(self.cache_dir, '.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                path = os.path.join(self.cache_dir, self.MANIFEST)
+                try:
+                    with open(path, 'r') as f:
+                        manifest = json.load(f)
+                except (IOError, ValueError):
+                    manifest = {}
+                yield manifest
+                tmp_path = path + '.tmp'
+                with open(tmp_path, 'w') as f:
+                    json.dump(manifest, f)
+                os.replace(tmp_path, path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """读取缓存条目
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            (结果字典, {文件路径: [大小, 修改时间]}), 未命中时返回None; 修改时间为None的
+            文件是只追加写入的当前日志, 大小为已搜索的字节数
+        """
+        with self._manifest() as manifest:
+            entry = manifest.get(key)
+            if entry is None:
+                return None
+            try:
+                with open(self._path(key), 'rb') as f:
+                    result = json.loads(zlib.decompress(f.read()).decode('utf-8'))
+            except (IOError, OSError, ValueError, zlib.error):
+                del manifest[key]
+                return None
+            entry['atime'] = time.time()
+            return result, entry['files']
+
+    def put(self, key, result, files):
+        """写入缓存条目并按LRU淘汰超出预算的条目
+
+        Args:
+            key: 缓存键
+            result: 搜索结果字典
+            files: 校验结果所需的文件 {文件路径: [大小, 修改时间]}, 格式见 get
+        """
+        data = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        if len(data) > self.max_bytes:
+            return
+        tmp_path = self._path(key) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+
+        with self._manifest() as manifest:
+            manifest[key] = {'size': len(data), 'atime': time.time(), 'files': files}
+            total = sum(entry['size'] for entry in manifest.values())
+            for old_key in sorted(manifest, key=lambda k: manifest[k]['atime']):
+                if total <= self.max_bytes:
+                    break
+                total -= manifest.pop(old_key)['size']
+                self._remove(old_key)
+
+    def invalidate(self, key):
+        """删除缓存条目"""
+        with self._manifest() as manifest:
+            if manifest.pop(key, None) is not None:
+                self._remove(key)
+
+    def _remove(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - 日志搜索守护进程
+
+常驻进程保持已认证的SSH连接, 通过本地Unix socket接收JSON搜索请求(每行一个请求,
+每行一个响应), 省去每次搜索的进程启动、paramiko导入和SSH握手。客户端只依赖标准库:
+
+    python log_daemon.py serve
+    python log_daemon.py search <trace_id>
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+
+
+def default_socket_path():
+    """默认的socket路径 (每个用户一个)"""
+    return os.path.join(tempfile.gettempdir(), "log_search-{0}.sock".format(os.getuid()))
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接: 逐行读取JSON请求并返回JSON响应"""
+
+    def handle(self):
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            request = None
+            try:
+                request = json.loads(raw.decode('utf-8'))
+                response = self.server.daemon.handle_request(request)
+            except Exception as e:
+                response = {'error': str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode('utf-8'))
+            self.wfile.flush()
+            if isinstance(request, dict) and request.get('op') == 'shutdown':
+                # 响应发出之后再停止, 否则进程可能在写入响应之前退出
+                threading.Thread(target=self.server.daemon.stop).start()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class SearchDaemon(object):
+    """日志搜索守护进程 - 在多次搜索之间复用SSH连接"""
+
+    def __init__(self, searcher, socket_path=None, idle_timeout=None):
+        """初始化守护进程
+
+        Args:
+            searcher: LogSearcher实例, 其连接池在请求之间保持
+            socket_path: Unix socket路径
+            idle_timeout: 连接空闲多少秒后关闭, 默认读取 searchOptions.idleTimeout (300)
+        """
+        self.searcher = searcher
+        self.socket_path = socket_path or default_socket_path()
+        if idle_timeout is None:
+            idle_timeout = float(searcher.config.get('searchOptions', {}).get('idleTimeout', 300))
+        self.idle_timeout = idle_timeout
+        self._active = 0
+        self._active_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def handle_request(self, request):
+        """处理一个请求
+
+        Args:
+            request: 请求字典, `op` 为 search / search_batch / business_info / ping / shutdown;
+                search 的 `ordered` 为真时按日志时间戳合并输出
+
+        Returns:
+            响应字典
+        """
+        op = request.get('op')
+        if op == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if op == 'shutdown':
+            # 由连接处理线程在发出响应后调用 stop
+            return {'ok': True}
+
+        since = self._parse_time(request.get('since'))
+        until = self._parse_time(request.get('until'))
+        with self._active_lock:
+            self._active += 1
+        try:
+            if op == 'search':
+                result = self._with_retry(lambda: self.searcher.search(request['trace_id'], since, until))
+                return self.searcher.order_timeline(result) if request.get('ordered') else result
+            if op == 'search_batch':
+                return self._with_retry(lambda: self.searcher.search_by_traceids(
+                    request['trace_ids'], since=since, until=until))
+            if op == 'business_info':
+                return self._with_retry(lambda: self.searcher.search_business_info(
+                    request['trace_id'], request.get('remote', True), since, until))
+            return {'error': "unknown op: {0}".format(op)}
+        finally:
+            with self._active_lock:
+                self._active -= 1
+
+    @staticmethod
+    def _parse_time(value):
+        if not value:
+            return None
+        from log_search import _parse_time
+        return _parse_time(value)
+
+    def _failed_hosts(self, result):
+        """找出结果中失败的服务器"""
+        if 'trace_id' not in result:
+            # 批量结果: 各TraceId共享同一组服务器错误
+            result = next(iter(result.values()), {})
+        if 'errors' in result:
+            return set(result['errors'])
+        if 'error' in result:
+            return set([result.get('host')])
+        return set()
+
+    def _with_retry(self, search):
+        """执行搜索; 失败是因为连接已断开(SSH传输不再活动)时丢弃该连接, 重新连接后重试一次
+
+        文件不存在、超时等其他错误重试也不会成功, 直接返回。
+        """
+        result = search()
+        failed = self._failed_hosts(result)
+        if not failed:
+            return result
+        pool = self.searcher.pool
+        broken = [server for server in self.searcher.servers
+                  if self.searcher._server_name(server) in failed and pool.is_broken(server)]
+        if not broken:
+            return result
+        for server in broken:
+            pool.discard(server)
+        return search()
+
+    def _reap_idle(self):
+        """定期关闭空闲连接 (有请求在处理时跳过)"""
+        interval = max(1.0, min(60.0, self.idle_timeout / 2))
+        while not self._stopped.wait(interval):
+            with self._active_lock:
+                if self._active:
+                    continue
+                closed = self.searcher.pool.close_idle(self.idle_timeout)
+            if closed:
+                print("Closed {0} idle SSH connections".format(closed))
+
+    def serve_forever(self):
+        """启动守护进程, 直到收到shutdown请求"""
+        if os.path.exists(self.socket_path):
+            if DaemonClient(self.socket_path, timeout=2).available():
+                raise Exception("守护进程已在运行: {0}".format(self.socket_path))
+            os.remove(self.socket_path)
+
+        self._server = _UnixServer(self.socket_path, _Handler)
+        self._server.daemon = self
+        os.chmod(self.socket_path, 0o600)
+        threading.Thread(target=self._reap_idle, daemon=True).start()
+        print("Log search daemon listening on {0}".format(self.socket_path))
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self.searcher.disconnect()
+
+    def stop(self):
+        """停止守护进程"""
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class DaemonClient(object):
+    """守护进程客户端 - 只依赖标准库, 无需导入paramiko"""
+
+    def __init__(self, socket_path=None, timeout=300):
+        """初始化客户端
+
+        Args:
+            socket_path: Unix socket路径
+            timeout: 等待响应的超时秒数
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    def request(self, payload):
+        """发送一个请求并等待响应
+
+        Args:
+            payload: 请求字典
+
+        Returns:
+            响应字典
+        """
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall((json.dumps(payload) + "\n").encode('utf-8'))
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                if chunk.endswith(b"\n"):
+                    break
+        finally:
+            sock.close()
+        return json.loads(b"".join(chunks).decode('utf-8'))
+
+    def available(self):
+        """守护进程是否在运行"""
+        if not os.path.exists(self.socket_path):
+            return False
+        try:
+            return bool(self.request({'op': 'ping'}).get('ok'))
+        except (socket.error, ValueError):
+            return False
+
+    def search(self, trace_id, since=None, until=None, ordered=False):
+        """通过守护进程搜索TraceId, 返回值与 LogSearcher.search 相同
+
+        ordered为True时输出按日志时间戳合并为一条时间线 (见 LogSearcher.order_timeline)
+        """
+        return self.request({'op': 'search', 'trace_id': trace_id, 'since': since, 'until': until,
+                             'ordered': ordered})
+
+    def search_batch(self, trace_ids, since=None, until=None):
+        """通过守护进程批量搜索, 返回值与 LogSearcher.search_by_traceids 相同"""
+        return self.request({'op': 'search_batch', 'trace_ids': list(trace_ids), 'since': since, 'until': until})
+
+    def search_business_info(self, trace_id, remote=True, since=None, until=None):
+        """通过守护进程提取业务信息, 返回值与 LogSearcher.search_business_info 相同"""
+        return self.request({'op': 'business_info', 'trace_id': trace_id, 'remote': remote,
+                             'since': since, 'until': until})
+
+    def shutdown(self):
+        """停止守护进程"""
+        return self.request({'op': 'shutdown'})
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Log search daemon")
+    parser.add_argument('--socket', help="unix socket path")
+    parser.add_argument('--config', default=".github/chatmodes/bugfix.config.json")
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser('serve', help="start the daemon")
+    serve_parser.add_argument('--idle-timeout', type=float, help="seconds before idle SSH connections are closed")
+
+    search_parser = subparsers.add_parser('search', help="search a TraceId through the daemon")
+    search_parser.add_argument('trace_id')
+    search_parser.add_argument('--since')
+    search_parser.add_argument('--until')
+
+    subparsers.add_parser('ping', help="check whether the daemon is running")
+    subparsers.add_parser('stop', help="stop the daemon")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    if args.command == 'serve':
+        from log_search import LogSearcher
+        SearchDaemon(LogSearcher(args.config), args.socket, args.idle_timeout).serve_forever()
+        return
+
+    client = DaemonClient(args.socket)
+    try:
+        if args.command == 'search':
+            response = client.search(args.trace_id, args.since, args.until)
+        elif args.command == 'ping':
+            response = client.request({'op': 'ping'})
+        else:
+            response = client.shutdown()
+    except socket.error as e:
+        print("Log search daemon is not available: {0}".format(str(e)))
+        sys.exit(2)
+
+    print(json.dumps(response, ensure_ascii=False, indent=2))
+    if 'error' in response:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
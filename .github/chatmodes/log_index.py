@@ -0,0 +1,463 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - TraceId倒排索引
+
+在日志服务器(或本地镜像)上增量读取日志文件, 维护 TraceId -> (文件, 字节偏移, 长度)
+的磁盘索引, 查询时只读取索引中记录的字节区间。只依赖标准库, 可以直接部署到日志服务器:
+
+    python log_index.py --db /data/trace.idx update /logs/app/ --follow
+    python log_index.py --db /data/trace.idx fetch <trace_id> --context 3 -- /logs/app/*.log
+
+索引记录日志中所有符合TraceId格式(traceIdPatterns第一个分组)的值, 不要求前面有 `traceId=` 等前缀,
+与grep按字面量查找的结果一致。fetch传入候选文件时, 索引尚未覆盖的文件和尾部字节区间直接扫描。
+"""
+import argparse
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# fetch 无法用索引回答时的退出码, LogSearcher据此回退到grep
+EXIT_MISS = 3
+
+# 索引内容的格式版本, 与数据库记录的不同时清空后重新索引
+INDEX_VERSION = 2
+
+DEFAULT_TRACE_ID_PATTERNS = [
+    r'traceId[=:\s]+([a-f0-9]{32})',
+    r'trace-id[=:\s]+([a-f0-9-]{36})',
+    r'X-Trace-Id[=:\s]+([a-f0-9-]{36})'
+]
+
+# 压缩的历史日志无法按字节区间读取, 不建立索引(查询时回退到grep)
+COMPRESSED_SUFFIXES = ('.gz', '.bz2', '.xz')
+
+
+def _first_group(pattern):
+    """正则中第一个捕获分组的内容, 没有捕获分组时返回整个正则"""
+    depth = 0
+    group = None
+    escaped = in_class = False
+    for index, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+            if group is None and (not pattern.startswith('(?', index) or pattern.startswith('(?P<', index)):
+                body = pattern.index('>', index) + 1 if pattern.startswith('(?P<', index) else index + 1
+                group = (depth, body)
+        elif char == ')':
+            if group is not None and group[0] == depth:
+                return pattern[group[1]:index]
+            depth -= 1
+    return pattern
+
+
+class TraceIndex(object):
+    """TraceId倒排索引 - 基于SQLite的磁盘存储"""
+
+    BLOCK_SIZE = 4 * 1024 * 1024
+    HEAD_SIZE = 256
+
+    def __init__(self, db_path, trace_id_patterns=None):
+        """初始化索引
+
+        Args:
+            db_path: 索引数据库路径
+            trace_id_patterns: TraceId正则列表, 第一个分组为TraceId; 索引记录所有符合该分组格式的值
+        """
+        self.db = sqlite3.connect(db_path)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            # 旧版本只记录带前缀的TraceId, 重新索引
+            self.db.executescript("""
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS postings;
+                PRAGMA user_version = {0};
+            """.format(INDEX_VERSION))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY,
+                path TEXT NOT NULL,
+                dev INTEGER NOT NULL,
+                ino INTEGER NOT NULL,
+                head TEXT NOT NULL,
+                offset INTEGER NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS files_inode ON files (dev, ino);
+            CREATE TABLE IF NOT EXISTS postings (
+                trace_id TEXT NOT NULL,
+                file_id INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS postings_trace ON postings (trace_id);
+            CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+        """)
+
+        # 日志中的TraceId不一定带有 `traceId=` 前缀 (例如作为参数或JSON值), 只按值的格式匹配
+        formats = [_first_group(pattern) for pattern in trace_id_patterns or DEFAULT_TRACE_ID_PATTERNS]
+        self._formats = [re.compile(value_format, re.IGNORECASE) for value_format in formats]
+        self._pattern = re.compile('|'.join('(?:{0})'.format(value_format) for value_format in formats).encode('utf-8'),
+                                   re.IGNORECASE)
+
+    def close(self):
+        self.db.close()
+
+    def _file_head(self, path):
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read(self.HEAD_SIZE)).hexdigest()
+
+    def _drop_file(self, file_id):
+        self.db.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        self.db.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def indexable(self, trace_id):
+        """TraceId是否符合索引记录的格式, 不符合时索引中不会有它的记录"""
+        return any(value_format.fullmatch(trace_id) for value_format in self._formats)
+
+    def update(self, directory, pattern='*.log'):
+        """增量更新索引
+
+        文件按 (设备号, inode) 识别: 轮转改名的文件保留已有索引并更新路径;
+        文件被截断或inode被复用时重新索引; 已删除(或被压缩)的文件删除索引。
+        每处理一个数据块提交一次, 中断后从记录的偏移继续。
+
+        Args:
+            directory: 日志目录
+            pattern: 日志文件名通配符, 默认与LogSearcher搜索的 `*.log` 相同
+
+        Returns:
+            本次新增的索引条目数
+        """
+        seen = set()
+        added = 0
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not fnmatch.fnmatch(name, pattern) or name.endswith(COMPRESSED_SUFFIXES):
+                continue
+            if not os.path.isfile(path):
+                continue
+            try:
+                st = os.stat(path)
+                head = self._file_head(path)
+            except (IOError, OSError):
+                continue
+
+            row = self.db.execute("SELECT id, path, head, offset FROM files WHERE dev = ? AND ino = ?",
+                                  (st.st_dev, st.st_ino)).fetchone()
+            if row is not None:
+                file_id, old_path, old_head, offset = row
+                if st.st_size < offset or (offset >= self.HEAD_SIZE and head != old_head):
+                    self._drop_file(file_id)
+                    row = None
+                elif old_path != path:
+                    self.db.execute("UPDATE files SET path = ? WHERE id = ?", (path, file_id))
+            if row is None:
+                # 路径被新文件占用(轮转后重建), 旧记录由inode匹配到新路径或在最后清理
+                cursor = self.db.execute("INSERT INTO files (path, dev, ino, head, offset) VALUES (?, ?, ?, ?, 0)",
+                                         (path, st.st_dev, st.st_ino, head))
+                file_id, offset = cursor.lastrowid, 0
+            else:
+                self.db.execute("UPDATE files SET head = ? WHERE id = ?", (head, file_id))
+            self.db.commit()
+
+            seen.add(file_id)
+            added += self._index_file(file_id, path, offset)
+
+        for (file_id,) in self.db.execute("SELECT id FROM files").fetchall():
+            if file_id not in seen:
+                self._drop_file(file_id)
+        self.db.commit()
+        return added
+
+    def _index_file(self, file_id, path, offset):
+        """从offset开始索引文件中的完整行"""
+        added = 0
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            pending = b''
+            while True:
+                block = f.read(self.BLOCK_SIZE)
+                if not block:
+                    break
+                data = pending + block
+                end = data.rfind(b'\n') + 1
+                pending = data[end:]
+                if not end:
+                    continue
+
+                postings = []
+                seen_lines = set()
+                for match in self._pattern.finditer(data, 0, end):
+                    line_start = data.rfind(b'\n', 0, match.start()) + 1
+                    line_end = data.find(b'\n', match.end())
+                    trace_id = match.group(0).decode('utf-8', 'replace').lower()
+                    if (trace_id, line_start) in seen_lines:
+                        continue
+                    seen_lines.add((trace_id, line_start))
+                    postings.append((trace_id, file_id, offset + line_start, line_end - line_start))
+
+                offset += end
+                self.db.executemany("INSERT INTO postings (trace_id, file_id, offset, length) VALUES (?, ?, ?, ?)",
+                                    postings)
+                self.db.execute("UPDATE files SET offset = ? WHERE id = ?", (offset, file_id))
+                self.db.commit()
+                added += len(postings)
+        return added
+
+    def lookup(self, trace_id):
+        """查询TraceId所在的字节区间
+
+        Args:
+            trace_id: 追踪ID
+
+        Returns:
+            [(文件路径, 字节偏移, 长度)], 按文件和偏移排序
+        """
+        return self.db.execute(
+            "SELECT f.path, p.offset, p.length FROM postings p JOIN files f ON f.id = p.file_id "
+            "WHERE p.trace_id = ? ORDER BY f.path, p.offset", (trace_id.lower(),)).fetchall()
+
+    def fetch(self, trace_id, context_lines=0, max_lines=None, files=None, ignore_case=True):
+        """读取TraceId对应的日志行, 输出格式与 `grep -H -A n -B n ... | head -N` 一致
+
+        指定候选文件时结果与grep搜索这些文件相同: 索引记录的文件只读取记录的字节区间,
+        文件在索引之后追加的完整行、以及尚未索引(或已被替换)的文件直接扫描。
+
+        Args:
+            trace_id: 追踪ID
+            context_lines: 前后上下文行数
+            max_lines: 最多输出的行数 (包括 `--` 分隔行)
+            files: 候选文件列表, 为None时只输出索引中的记录
+            ignore_case: 是否忽略大小写
+
+        Yields:
+            日志行
+        """
+        needle = re.compile(re.escape(trace_id.encode('utf-8')), re.IGNORECASE if ignore_case else 0)
+        if files is None:
+            by_file = {}
+            for path, offset, length in self.lookup(trace_id):
+                by_file.setdefault(path, []).append((offset, length))
+            paths = sorted(by_file)
+        else:
+            paths = []
+            for path in files:
+                if path not in paths:
+                    paths.append(path)
+
+        emitted = 0
+        first_group = True
+        for path in paths:
+            try:
+                f = open(path, 'rb')
+            except (IOError, OSError):
+                continue
+            with f:
+                if files is None:
+                    hits, covered = by_file[path], None
+                else:
+                    hits, covered = self._indexed_hits(f, trace_id)
+                # 索引记录的行不区分大小写, 按查询的大小写规则核对
+                hits = [(offset, length) for offset, length in hits if self._line_matches(f, offset, length, needle)]
+                if covered is not None:
+                    hits.extend(self._scan(f, covered, needle))
+
+                for start, end, hit_offsets in self._context_ranges(f, hits, context_lines):
+                    lines = []
+                    if context_lines > 0 and not first_group:
+                        lines.append('--')
+                    first_group = False
+
+                    f.seek(start)
+                    position = start
+                    for raw in f.read(end - start).split(b'\n')[:-1]:
+                        separator = ':' if position in hit_offsets else '-'
+                        lines.append("{0}{1}{2}".format(path, separator, raw.decode('utf-8', 'replace').rstrip('\r')))
+                        position += len(raw) + 1
+                    for line in lines:
+                        yield line
+                        emitted += 1
+                        if max_lines is not None and emitted >= max_lines:
+                            return
+
+    def _indexed_hits(self, f, trace_id):
+        """文件在索引中记录的命中行
+
+        Returns:
+            ([(偏移, 长度)], 已索引的字节数); 文件未索引或已被截断、替换时为 ([], 0)
+        """
+        st = os.fstat(f.fileno())
+        row = self.db.execute("SELECT id, head, offset FROM files WHERE dev = ? AND ino = ?",
+                              (st.st_dev, st.st_ino)).fetchone()
+        if row is None:
+            return [], 0
+        file_id, head, offset = row
+        if st.st_size < offset:
+            return [], 0
+        if offset >= self.HEAD_SIZE:
+            f.seek(0)
+            if hashlib.sha1(f.read(self.HEAD_SIZE)).hexdigest() != head:
+                return [], 0
+        hits = self.db.execute("SELECT offset, length FROM postings WHERE trace_id = ? AND file_id = ? ORDER BY offset",
+                               (trace_id.lower(), file_id)).fetchall()
+        return hits, offset
+
+    @staticmethod
+    def _line_matches(f, offset, length, needle):
+        f.seek(offset)
+        return needle.search(f.read(length)) is not None
+
+    def _scan(self, f, offset, needle):
+        """扫描文件从offset开始的完整行, 返回包含TraceId的行 [(偏移, 长度)]"""
+        hits = []
+        f.seek(offset)
+        pending = b''
+        while True:
+            block = f.read(self.BLOCK_SIZE)
+            if not block:
+                break
+            data = pending + block
+            end = data.rfind(b'\n') + 1
+            pending = data[end:]
+            position = 0
+            while True:
+                match = needle.search(data, position, end)
+                if match is None:
+                    break
+                line_start = data.rfind(b'\n', 0, match.start()) + 1
+                line_end = data.find(b'\n', match.end())
+                hits.append((offset + line_start, line_end - line_start))
+                position = line_end + 1
+            offset += end
+        return hits
+
+    def _context_ranges(self, f, hits, context_lines):
+        """计算命中行连同上下文的字节区间, 重叠或相邻的区间合并"""
+        ranges = []
+        for offset, length in hits:
+            start = self._lines_before(f, offset, context_lines)
+            end = self._lines_after(f, offset + length, context_lines)
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+                ranges[-1][2].add(offset)
+            else:
+                ranges.append([start, end, set([offset])])
+        return ranges
+
+    @staticmethod
+    def _lines_before(f, offset, count):
+        """向前扫描count行, 返回上下文起始偏移"""
+        if count <= 0 or offset == 0:
+            return offset
+        window = 8192
+        while True:
+            start = max(0, offset - window)
+            f.seek(start)
+            data = f.read(offset - start)
+            # data以上一行的换行符结尾, 再向前找count个换行符
+            position = len(data) - 1
+            for _ in range(count):
+                position = data.rfind(b'\n', 0, position)
+                if position < 0:
+                    break
+            if position >= 0:
+                return start + position + 1
+            if start == 0:
+                return 0
+            window *= 2
+
+    @staticmethod
+    def _lines_after(f, line_end, count):
+        """向后扫描count行, 返回上下文结束偏移 (包含换行符)"""
+        end = line_end + 1
+        f.seek(end)
+        for _ in range(count):
+            line = f.readline()
+            if not line.endswith(b'\n'):
+                break
+            end += len(line)
+        return end
+
+
+def load_trace_id_patterns(config_path):
+    """从 bugfix.config.json 或 bugfix.project.auto.json 读取 extractionPatterns.traceIdPatterns"""
+    if not config_path:
+        return None
+    with open(config_path, 'r') as f:
+        return json.load(f).get('extractionPatterns', {}).get('traceIdPatterns')
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="TraceId inverted index for log files")
+    parser.add_argument('--db', required=True, help="index database path")
+    parser.add_argument('--config', help="config file providing extractionPatterns.traceIdPatterns")
+    subparsers = parser.add_subparsers(dest='command')
+
+    update_parser = subparsers.add_parser('update', help="index new log lines")
+    update_parser.add_argument('directory')
+    update_parser.add_argument('--pattern', default='*.log', help="file name pattern (default: the *.log files log_search.py greps)")
+    update_parser.add_argument('--follow', action='store_true', help="keep tailing the directory")
+    update_parser.add_argument('--interval', type=float, default=5.0, help="seconds between updates with --follow")
+
+    lookup_parser = subparsers.add_parser('lookup', help="print indexed byte ranges")
+    lookup_parser.add_argument('trace_id')
+
+    fetch_parser = subparsers.add_parser('fetch', help="print indexed lines in grep format")
+    fetch_parser.add_argument('trace_id')
+    fetch_parser.add_argument('--context', type=int, default=0)
+    fetch_parser.add_argument('--max-lines', type=int)
+    fetch_parser.add_argument('--case-sensitive', action='store_true')
+    fetch_parser.add_argument('files', nargs='*',
+                              help="candidate log files; parts not covered by the index are scanned")
+
+    args = parser.parse_args()
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    index = TraceIndex(args.db, load_trace_id_patterns(args.config))
+    try:
+        if args.command == 'update':
+            while True:
+                added = index.update(args.directory, args.pattern)
+                print("Indexed {0} new entries".format(added))
+                if not args.follow:
+                    break
+                time.sleep(args.interval)
+        elif args.command == 'lookup':
+            ranges = index.lookup(args.trace_id)
+            for path, offset, length in ranges:
+                print("{0}\t{1}\t{2}".format(path, offset, length))
+            if not ranges:
+                sys.exit(EXIT_MISS)
+        elif args.command == 'fetch':
+            if not index.indexable(args.trace_id):
+                # 索引中不会有该TraceId的记录, 由调用方grep
+                sys.exit(EXIT_MISS)
+            found = False
+            for line in index.fetch(args.trace_id, args.context, args.max_lines, args.files or None,
+                                    not args.case_sensitive):
+                found = True
+                print(line)
+            # 指定了候选文件时结果是完整的, 没有输出即没有命中
+            if not found and not args.files:
+                sys.exit(EXIT_MISS)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - 本地日志目录搜索
+
+日志目录通过NFS挂载或保存有本地镜像时, 直接在本机搜索 `baseDirectory`, 不需要SSH和grep。
+文件通过mmap映射, 用字节串查找定位TraceId, 从命中位置向前、向后查找换行符得到上下文行;
+多个文件由进程池并行搜索。输出格式与 `grep -H -A n -B n` 一致。只依赖标准库。
+"""
+import bz2
+import fnmatch
+import functools
+import gzip
+import lzma
+import mmap
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# 压缩的历史日志整体解压到内存后搜索
+OPENERS = {'.gz': gzip.open, '.bz2': bz2.open, '.xz': lzma.open}
+
+
+def _hit_lines(data, needles, ignore_case):
+    """查找包含任一TraceId的行
+
+    只有一个区分大小写的TraceId时直接用字节串查找, 否则使用预编译的字面量正则。
+    每行只记录一次, 下一次查找从该行末尾开始。
+
+    Yields:
+        (行起始偏移, 行结束偏移), 结束偏移为换行符位置 (最后一行没有换行符时为数据长度)
+    """
+    if len(needles) == 1 and not ignore_case:
+        needle = needles[0]
+
+        def find(position):
+            return data.find(needle, position)
+    else:
+        pattern = re.compile(b'|'.join(re.escape(needle) for needle in needles), re.IGNORECASE if ignore_case else 0)
+
+        def find(position):
+            match = pattern.search(data, position)
+            return match.start() if match else -1
+
+    size = len(data)
+    position = 0
+    while position < size:
+        hit = find(position)
+        if hit < 0:
+            return
+        start = data.rfind(b'\n', 0, hit) + 1
+        end = data.find(b'\n', hit)
+        if end < 0:
+            end = size
+        yield start, end
+        position = end + 1
+
+
+def _lines_before(data, start, count):
+    """从行起始偏移向前count行"""
+    for _ in range(count):
+        if start == 0:
+            break
+        start = data.rfind(b'\n', 0, start - 1) + 1
+    return start
+
+
+def _lines_after(data, end, count):
+    """从行结束偏移向后count行"""
+    size = len(data)
+    for _ in range(count):
+        if end + 1 >= size:
+            break
+        end = data.find(b'\n', end + 1)
+        if end < 0:
+            end = size
+    return end
+
+
+def search_buffer(data, label, needles, context_lines=0, ignore_case=False, max_lines=None):
+    """在一个文件的内容中搜索TraceId
+
+    Args:
+        data: 文件内容 (bytes或mmap)
+        label: 输出行前缀的文件路径
+        needles: TraceId字节串列表
+        context_lines: 前后上下文行数
+        ignore_case: 是否忽略大小写
+        max_lines: 最多输出的行数
+
+    Returns:
+        行组列表, 每组为连续的 `文件路径:匹配行` / `文件路径-上下文行`; 不相邻的组之间由调用方插入 `--`
+    """
+    groups = []
+    for start, end in _hit_lines(data, needles, ignore_case):
+        group_start = _lines_before(data, start, context_lines)
+        group_end = _lines_after(data, end, context_lines)
+        if groups and group_start <= groups[-1][1] + 1:
+            groups[-1][1] = max(groups[-1][1], group_end)
+            groups[-1][2].add(start)
+        else:
+            groups.append([group_start, group_end, set([start])])
+
+    output = []
+    emitted = 0
+    for group_start, group_end, hits in groups:
+        lines = []
+        position = group_start
+        for raw in data[group_start:group_end].split(b'\n'):
+            separator = ':' if position in hits else '-'
+            lines.append("{0}{1}{2}".format(label, separator, raw.decode('utf-8', 'replace').rstrip('\r')))
+            position += len(raw) + 1
+            emitted += 1
+            if max_lines is not None and emitted >= max_lines:
+                break
+        output.append(lines)
+        if max_lines is not None and emitted >= max_lines:
+            break
+    return output
+
+
+def search_file(path, needles, context_lines=0, ignore_case=False, max_lines=None):
+    """搜索一个日志文件 (进程池的任务函数), 返回值见 search_buffer"""
+    opener = next((opener for ext, opener in OPENERS.items() if path.endswith(ext)), None)
+    try:
+        if opener is not None:
+            with opener(path, 'rb') as f:
+                return search_buffer(f.read(), path, needles, context_lines, ignore_case, max_lines)
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return []
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                return search_buffer(data, path, needles, context_lines, ignore_case, max_lines)
+            finally:
+                data.close()
+    except (IOError, OSError, EOFError):
+        return []
+
+
+def _with_separators(results, context_lines, max_lines=None):
+    """依次输出各文件的行组, 带上下文时组之间插入 `--` (与grep相同), max_lines包括 `--` 行"""
+    emitted = 0
+    first_group = True
+    for groups in results:
+        for lines in groups:
+            if context_lines > 0 and not first_group:
+                lines = ['--'] + lines
+            first_group = False
+            for line in lines:
+                yield line
+                emitted += 1
+                if max_lines is not None and emitted >= max_lines:
+                    return
+
+
+class LocalLogBackend(object):
+    """本地日志目录 - 在连接池中代替SSH客户端"""
+
+    def __init__(self, base_dir, processes=None):
+        """初始化本地搜索
+
+        Args:
+            base_dir: 日志目录
+            processes: 并行搜索的进程数, 默认为CPU核数
+        """
+        self.base_dir = base_dir
+        self.processes = int(processes or os.cpu_count() or 1)
+        self._executor = None
+
+    # 连接池接口: 本地目录没有连接, 始终可用
+    def get_transport(self):
+        return self
+
+    def is_active(self):
+        return True
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _entries(self, pattern):
+        directory = os.path.dirname(self.base_dir) or '.'
+        prefix = os.path.basename(self.base_dir)
+        try:
+            names = sorted(os.listdir(directory))
+        except OSError:
+            return []
+        return [os.path.join(directory, name) for name in names
+                if name.startswith(prefix) and fnmatch.fnmatch(name[len(prefix):], pattern)
+                and os.path.isfile(os.path.join(directory, name))]
+
+    def log_files(self):
+        """当前的 *.log 文件 (与远程 `grep -r {baseDirectory}*.log` 搜索的文件相同)"""
+        return self._entries('*.log')
+
+    def listing(self):
+        """所有日志文件(包括轮转和压缩的历史日志)的 `修改时间 路径` 列表, 格式与远程find命令相同"""
+        lines = []
+        for path in self._entries('*.log*'):
+            try:
+                lines.append("{0} {1}".format(os.stat(path).st_mtime, path))
+            except OSError:
+                pass
+        return lines
+
+    def file_stats(self, files):
+        """文件的大小和修改时间 {文件路径: [大小, 修改时间]}, 不存在的文件不包含在内"""
+        stats = {}
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            stats[path] = [st.st_size, int(st.st_mtime)]
+        return stats
+
+    def search(self, trace_ids, context_lines=0, max_lines=None, ignore_case=False, files=None):
+        """搜索TraceId, 输出与 `grep -H -A n -B n ... | head -N` 相同
+
+        Args:
+            trace_ids: 追踪ID列表 (任一匹配即输出, 与 `grep -F -f` 相同)
+            context_lines: 前后上下文行数
+            max_lines: 最多输出的行数 (包括 `--` 分隔行)
+            ignore_case: 是否忽略大小写
+            files: 要搜索的文件列表, 默认为 log_files()
+
+        Returns:
+            日志行迭代器
+        """
+        files = self.log_files() if files is None else files
+        needles = [trace_id.encode('utf-8') for trace_id in trace_ids]
+        task = functools.partial(search_file, needles=needles, context_lines=context_lines,
+                                 ignore_case=ignore_case, max_lines=max_lines)
+        if len(files) > 1 and self.processes > 1:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+            results = self._executor.map(task, files)
+        else:
+            results = map(task, files)
+        return _with_separators(results, context_lines, max_lines)
+
+    def search_appended(self, trace_ids, offsets, context_lines=0, ignore_case=False):
+        """只搜索文件在已搜索的字节数之后追加的内容
+
+        输出与 `tail -c +偏移 文件 | tail -n +2 | grep -H --label=文件` 相同: 偏移落在一行中间时,
+        该行属于已经搜索过的内容, 不再输出。
+
+        Args:
+            trace_ids: 追踪ID列表
+            offsets: {文件路径: 已搜索的字节数}, 为0时搜索整个文件
+            context_lines: 前后上下文行数
+            ignore_case: 是否忽略大小写
+
+        Returns:
+            日志行迭代器
+        """
+        needles = [trace_id.encode('utf-8') for trace_id in trace_ids]
+        results = []
+        for path in sorted(offsets):
+            offset = offsets[path]
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(max(offset - 1, 0))
+                    data = f.read()
+            except (IOError, OSError):
+                continue
+            if offset > 0:
+                newline = data.find(b'\n')
+                data = data[newline + 1:] if newline >= 0 else b''
+            results.append(search_buffer(data, path, needles, context_lines, ignore_case))
+        return _with_separators(results, context_lines)
@@ -3,23 +3,427 @@
 """
 Bug分析 - 自动化日志搜索脚本
 """
-import paramiko
+import argparse
+import codecs
+import heapq
+import inspect
 import json
+import os
 import re
+import select
 import sys
-from datetime import datetime
+import shlex
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from log_cache import ResultCache
+from log_daemon import DaemonClient, SearchDaemon
+from log_local import LocalLogBackend
+from log_tables import TableMatcher
+from project_config import load_section
+
+# 只搜索本地日志目录(type: local)时不需要paramiko
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+
+# 日志时间戳 (2024-05-01 10:00:00.123 / 2024-05-01T10:00:00,123), 允许前面有grep的文件名和服务器名前缀
+LOG_TIMESTAMP = re.compile(r'(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(?:[.,](\d{1,6}))?')
+
+# 时间线合并时各来源待排序的行在内存中合计保留的字节数, 超出后排序并写入有序段
+MERGE_SPOOL_BYTES = 4 * 1024 * 1024
+
+# 每个有序段在内存中保留的字节数, 超出后转存到磁盘临时文件
+MERGE_RUN_BYTES = 64 * 1024
+
+# 流式搜索为写入缓存保留的输出在内存中最多占用的字节数, 超出后本次结果不缓存
+CACHE_STREAM_BYTES = 4 * 1024 * 1024
+
+# 只搜索当前日志新追加的内容时, 从上次搜索的位置向前多读取的字节数: 覆盖上次只写了一半的行
+# 和新匹配行的前文上下文, 重复读到的行在合并时去掉
+APPEND_OVERLAP_BYTES = 64 * 1024
+
+
+def timestamp_key(line, default=''):
+    """取日志行的时间戳排序键
+
+    只做一次预编译正则匹配并拼接为定长字符串, 字符串顺序即时间顺序, 不构造datetime对象。
+
+    Args:
+        line: 日志行
+        default: 没有时间戳的行(异常堆栈等)使用的键, 通常为上一行的键
+
+    Returns:
+        形如 '2024-05-01 10:00:00.123000' 的排序键
+    """
+    match = LOG_TIMESTAMP.search(line)
+    if match is None:
+        return default
+    return match.group(1) + ' ' + match.group(2) + '.' + (match.group(3) or '').ljust(6, '0')
+
+
+# 远程提取的入口: 从标准输入读取grep输出, 按完整行分块交给提取器, 输出zlib压缩的JSON
+_REMOTE_EXTRACT_DRIVER = """
+def _main():
+    extractor = BusinessInfoExtractor.from_config(json.loads(sys.argv[1]))
+    stream = getattr(sys.stdin, 'buffer', sys.stdin)
+    pending = b''
+    lines_count = 0
+    while True:
+        chunk = stream.read(1 << 20)
+        if not chunk:
+            break
+        data = pending + chunk
+        end = data.rfind(b'\\n') + 1
+        pending = data[end:]
+        lines_count += data.count(b'\\n', 0, end)
+        extractor.feed_text(data[:end].decode('utf-8', 'replace'))
+    if pending:
+        lines_count += 1
+        extractor.feed_text(pending.decode('utf-8', 'replace'))
+    result = extractor.result()
+    result['lines_count'] = lines_count
+    getattr(sys.stdout, 'buffer', sys.stdout).write(zlib.compress(json.dumps(result).encode('utf-8'), 9))
+
+_main()
+"""
+
+
+# 实时跟踪的远程入口: 从当前末尾开始读取一个日志文件, 按inode识别轮转(读完旧文件后从头读取新文件),
+# 文件被截断时回到开头; 只输出包含TraceId的行。等待时监听标准输入, 连接关闭后立即退出。
+_REMOTE_FOLLOW_SCRIPT = """
+import os, select, sys, time
+path, needle, ignore_case, interval = sys.argv[1], sys.argv[2].encode('utf-8'), sys.argv[3] == '1', float(sys.argv[4])
+if ignore_case:
+    needle = needle.lower()
+out = getattr(sys.stdout, 'buffer', sys.stdout)
+prefix = path.encode('utf-8') + b':'
+
+def open_log(from_end):
+    try:
+        f = open(path, 'rb')
+    except IOError:
+        return None, None
+    if from_end:
+        f.seek(0, 2)
+    return f, os.fstat(f.fileno()).st_ino
+
+f, inode = open_log(True)
+pending = b''
+while True:
+    data = f.read(1 << 20) if f else b''
+    if data:
+        data = pending + data
+        end = data.rfind(b'\\n') + 1
+        pending = data[end:]
+        for line in data[:end].splitlines():
+            if needle in (line.lower() if ignore_case else line):
+                out.write(prefix + line + b'\\n')
+        out.flush()
+        continue
+    try:
+        st = os.stat(path)
+    except OSError:
+        st = None
+    if st is not None and (f is None or st.st_ino != inode):
+        if f is not None:
+            f.close()
+        f, inode = open_log(False)
+        pending = b''
+    elif st is not None and st.st_size < f.tell():
+        f.seek(0)
+        pending = b''
+    elif select.select([sys.stdin], [], [], interval)[0] and not os.read(sys.stdin.fileno(), 1):
+        break
+"""
+
+
+class SSHConnectionPool(object):
+    """SSH连接池 - 每台日志服务器保持一个长连接 (本地日志目录对应一个LocalLogBackend)"""
+
+    def __init__(self, client_factory=None):
+        """初始化连接池
+
+        Args:
+            client_factory: 创建SSH客户端的工厂, 默认为paramiko.SSHClient
+                (测试时可替换为进程内的替身实现)
+        """
+        self.client_factory = client_factory or (paramiko.SSHClient if paramiko is not None else None)
+        self._clients = {}
+        self._last_used = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def server_key(server):
+        """连接池中服务器的唯一标识"""
+        if server.get('type') == 'local':
+            return "local:{0}".format(server.get('baseDirectory', '/logs/'))
+        return "{0}@{1}:{2}".format(server.get('username'), server.get('host'), server.get('port', 22))
+
+    def _lock_for(self, key):
+        with self._guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    @staticmethod
+    def _is_alive(client):
+        transport = client.get_transport()
+        return transport is not None and transport.is_active()
+
+    def _open(self, server):
+        if server.get('type') == 'local':
+            return LocalLogBackend(server.get('baseDirectory', '/logs/'), server.get('workers'))
+        if self.client_factory is None:
+            raise Exception("连接远程日志服务器需要安装paramiko: pip install paramiko")
+        client = self.client_factory()
+        if paramiko is not None:
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=server.get('host'),
+            port=int(server.get('port', 22)),
+            username=server.get('username'),
+            password=server.get('password'),
+            timeout=int(server.get('timeout', 30))
+        )
+        return client
+
+    def get(self, server):
+        """获取服务器的活动连接, 连接不存在或已断开时重新建立
+
+        Args:
+            server: 服务器配置
+
+        Returns:
+            已连接的SSH客户端
+        """
+        key = self.server_key(server)
+        with self._lock_for(key):
+            self._last_used[key] = time.time()
+            client = self._clients.get(key)
+            if client is not None and self._is_alive(client):
+                return client
+            if client is not None:
+                client.close()
+                del self._clients[key]
+            client = self._open(server)
+            self._clients[key] = client
+            return client
+
+    def is_broken(self, server):
+        """池中该服务器的连接是否已断开 (没有连接时为False)"""
+        client = self._clients.get(self.server_key(server))
+        return client is not None and not self._is_alive(client)
+    
+    def discard(self, server):
+        """关闭并移除服务器的连接, 下次获取时重新建立"""
+        key = self.server_key(server)
+        with self._lock_for(key):
+            client = self._clients.pop(key, None)
+        if client is not None:
+            client.close()
+
+    def close_idle(self, max_idle):
+        """关闭空闲超过max_idle秒的连接
+
+        Returns:
+            关闭的连接数
+        """
+        now = time.time()
+        with self._guard:
+            keys = [key for key in self._clients if now - self._last_used.get(key, 0) > max_idle]
+        closed = 0
+        for key in keys:
+            with self._lock_for(key):
+                client = self._clients.get(key)
+                if client is None or now - self._last_used.get(key, 0) <= max_idle:
+                    continue
+                del self._clients[key]
+            client.close()
+            closed += 1
+        return closed
+
+    def close_all(self):
+        """关闭连接池中的所有连接"""
+        with self._guard:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+class BusinessInfoExtractor(object):
+    """业务信息提取器 - 单次扫描完成日志行分类
+
+    所有关键字和用户标识字段名合并为一个预编译的字面量正则, 在转为小写的
+    文本上只扫描一次(比逐行多次IGNORECASE匹配快得多): 没有命中的行不会进入
+    Python层处理, 命中的行按类别各记录一次, 字段值和TraceId使用预编译的分组提取。
+    """
+
+    CATEGORIES = (
+        ('sql_queries', ('select', 'insert', 'update', 'delete')),
+        ('exceptions', ('exception', 'error')),
+        ('api_calls', ('http://', 'https://', 'api')),
+    )
+    DEFAULT_USER_FIELDS = ('custNo',)
+
+    def __init__(self, trace_id_patterns=None, user_id_fields=None):
+        """初始化提取器
+
+        Args:
+            trace_id_patterns: 额外的TraceId正则(第一个分组为TraceId),
+                如ProjectAnalyzer生成的 extractionPatterns.traceIdPatterns
+            user_id_fields: 额外的用户标识字段,
+                如ProjectAnalyzer生成的 extractionPatterns.userIdFields
+        """
+        # 字面量 -> (所属类别, 用户标识字段名)
+        self._tokens = {}
+        for key, keywords in self.CATEGORIES:
+            for keyword in keywords:
+                self._tokens[keyword] = ((key,), None)
+        
+        keyword_scan = re.compile('|'.join(re.escape(k) for k, v in self._tokens.items()))
+        for field in list(self.DEFAULT_USER_FIELDS) + list(user_id_fields or []):
+            token = field.lower()
+            if token in self._tokens:
+                continue
+            # 字段名中包含的关键字同样参与分类
+            categories = tuple(self._tokens[m.group()][0][0] for m in keyword_scan.finditer(token))
+            self._tokens[token] = (categories, field)
+        
+        literals = sorted(self._tokens, key=len, reverse=True)
+        alternation = '|'.join(re.escape(literal) for literal in literals)
+        self._scan = re.compile(alternation)
+        self._scan_ci = re.compile(alternation, re.IGNORECASE)
+        self._field_value = re.compile(r'[=:]?\s*(\d+)')
+        
+        # 所有TraceId模式合并为一个正则, 记录每个捕获分组对应的TraceId分组编号
+        self._trace = None
+        self._trace_groups = {}
+        if trace_id_patterns:
+            branches = []
+            offset = 0
+            for pattern in trace_id_patterns:
+                groups = re.compile(pattern).groups
+                if not groups:
+                    pattern, groups = '({0})'.format(pattern), 1
+                branches.append('(?:{0})'.format(pattern))
+                for index in range(offset + 1, offset + groups + 1):
+                    self._trace_groups[index] = offset + 1
+                offset += groups
+            self._trace = re.compile('|'.join(branches))
+        
+        self.reset()
+    
+    @classmethod
+    def from_config(cls, extraction_patterns):
+        """根据 extractionPatterns 配置节点创建提取器"""
+        extraction_patterns = extraction_patterns or {}
+        return cls(trace_id_patterns=extraction_patterns.get('traceIdPatterns'),
+                   user_id_fields=extraction_patterns.get('userIdFields'))
+    
+    def reset(self):
+        """清空已提取的结果"""
+        self._info = {
+            'sql_queries': [],
+            'exceptions': [],
+            'api_calls': [],
+            'user_params': OrderedDict(),
+            'user_ids': [],
+            'trace_ids': []
+        }
+    
+    def feed(self, line):
+        """提取单行日志"""
+        self.feed_text(line)
+    
+    def feed_text(self, text):
+        """提取一段日志文本 (可包含多行)
+
+        Args:
+            text: 日志文本
+        """
+        info = self._info
+        tokens = self._tokens
+        
+        lowered = text.lower()
+        if len(lowered) == len(text):
+            matches = self._scan.finditer(lowered)
+        else:
+            # 个别Unicode字符转小写后长度变化, 无法按位置对应原文
+            matches = self._scan_ci.finditer(text)
+        
+        line_start = line_end = -1
+        line = None
+        recorded = {}
+        for match in matches:
+            pos = match.start()
+            if pos > line_end:
+                line_start = text.rfind('\n', 0, pos) + 1
+                line_end = text.find('\n', pos)
+                if line_end < 0:
+                    line_end = len(text)
+                line = None
+            
+            categories, field = tokens[match.group().lower()]
+            if field is not None:
+                value = self._field_value.match(text, match.end())
+                if value is not None:
+                    info['user_params'].setdefault(field, []).append(value.group(1))
+                    if field == 'custNo':
+                        info['user_ids'].append(value.group(1))
+            
+            for key in categories:
+                if recorded.get(key) != line_start:
+                    recorded[key] = line_start
+                    if line is None:
+                        line = text[line_start:line_end].strip()
+                    info[key].append(line)
+        
+        if self._trace is not None:
+            for match in self._trace.finditer(text):
+                info['trace_ids'].append(match.group(self._trace_groups[match.lastindex]))
+    
+    def result(self):
+        """返回提取结果 (用户ID、TraceId去重)"""
+        info = dict(self._info)
+        info['user_ids'] = list(OrderedDict.fromkeys(info['user_ids']))
+        info['trace_ids'] = list(OrderedDict.fromkeys(info['trace_ids']))
+        info['user_params'] = dict((field, list(OrderedDict.fromkeys(values)))
+                                   for field, values in info['user_params'].items())
+        return info
+
 
 class LogSearcher:
     """日志搜索器 - 自动化SSH连接和日志搜索"""
 
-    def __init__(self, config_path=".github/chatmodes/bugfix.config.json"):
+    def __init__(self, config_path=".github/chatmodes/bugfix.config.json", client_factory=None):
         """初始化日志搜索器
         
         Args:
             config_path: 配置文件路径
+            client_factory: SSH客户端工厂, 透传给连接池
         """
+        self.config_path = config_path
         self.config = self._load_config(config_path)
+        self.servers = self._load_servers()
+        self.extraction_patterns = self._load_extraction_patterns(config_path)
+        # 首次标注SQL时根据项目映射构建, False表示没有可用的项目配置
+        self._table_matcher = None
+        self.cache = self._create_cache()
+        self.pool = SSHConnectionPool(client_factory)
         self.ssh = None
+        self.metrics_hooks = []
+        self._metrics_lock = threading.Lock()
+        self._connect_ms = None
     
     def _load_config(self, config_path):
         """加载配置文件"""
@@ -31,6 +435,60 @@ class LogSearcher:
         except ValueError:
             raise ValueError("配置文件 {0} 格式错误".format(config_path))
     
+    def _load_extraction_patterns(self, config_path):
+        """读取提取模式
+
+        优先使用配置文件中的 `extractionPatterns`, 否则读取同目录下
+        ProjectAnalyzer 生成的 bugfix.project.auto.json (或按节拆分的 bugfix.project.auto/)。
+
+        Returns:
+            extractionPatterns 字典
+        """
+        if 'extractionPatterns' in self.config:
+            return self.config['extractionPatterns']
+        
+        try:
+            return load_section(self._auto_config_path(config_path), 'extractionPatterns', {})
+        except ValueError:
+            return {}
+    
+    @staticmethod
+    def _auto_config_path(config_path):
+        """与配置文件同目录的 bugfix.project.auto.json"""
+        return os.path.join(os.path.dirname(config_path), 'bugfix.project.auto.json')
+    
+    def _create_cache(self):
+        """创建结果缓存, searchOptions.cache 为 false 时不使用缓存"""
+        search_config = self.config.get('searchOptions', {})
+        if str(search_config.get('cache', True)).lower() != 'true':
+            return None
+        return ResultCache(search_config.get('cacheDir'), search_config.get('cacheMaxBytes'))
+    
+    def _load_servers(self):
+        """读取日志服务器列表
+
+        `logServers` 中的每一项继承 `logServer` 的字段(如用户名、日志目录),
+        未配置 `logServers` 时只使用 `logServer` 一台服务器。
+
+        Returns:
+            服务器配置列表
+        """
+        base = self.config.get('logServer', {})
+        servers = self.config.get('logServers')
+        if not servers:
+            return [base]
+        return [dict(base, **server) for server in servers]
+    
+    @staticmethod
+    def _server_name(server):
+        """服务器在结果中的显示名称"""
+        return server.get('name') or server.get('host') or server.get('baseDirectory')
+    
+    @staticmethod
+    def _is_local(server):
+        """是否为本地(或NFS挂载的)日志目录"""
+        return server.get('type') == 'local'
+    
     def connect(self):
         """连接到日志服务器
         
@@ -38,187 +496,1897 @@ class LogSearcher:
             连接是否成功
         """
         try:
-            log_config = self.config.get('logServer', {})
-            
-            self.ssh = paramiko.SSHClient()
-            self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            log_config = self.servers[0]
             
-            self.ssh.connect(
-                hostname=log_config.get('host'),
-                port=int(log_config.get('port', 22)),
-                username=log_config.get('username'),
-                password=log_config.get('password'),
-                timeout=int(log_config.get('timeout', 30))
-            )
+            started = time.perf_counter()
+            self.ssh = self.pool.get(log_config)
+            self._connect_ms = self._elapsed_ms(started)
             
-            print("Successfully connected to log server: {0}".format(log_config.get('host')))
+            print("Successfully connected to log server: {0}".format(self._server_name(log_config)))
             return True
             
         except Exception as e:
             print("Failed to connect to log server: {0}".format(str(e)))
             return False
     
-    def search_by_traceid(self, trace_id):
-        """根据TraceId搜索日志
+    def _case_insensitive(self):
+        return str(self.config.get('searchOptions', {}).get('caseInsensitive', True)).lower() == 'true'
+    
+    def _grep_options(self):
+        """根据searchOptions生成grep选项 (忽略大小写、上下文行数)"""
+        search_config = self.config.get('searchOptions', {})
+        context_lines = int(search_config.get('contextLines', 3))
         
+        options = ""
+        if self._case_insensitive():
+            options += " -i"
+        if context_lines > 0:
+            options += " -A {0} -B {0}".format(context_lines)
+        return options
+    
+    @staticmethod
+    def _log_files(server):
+        """远程日志文件的通配路径"""
+        return "{0}*.log".format(server.get('baseDirectory', '/logs/'))
+    
+    # 轮转日志文件名中的日期/小时, 如 app.log.2024-05-01、app-20240501_13.log.gz
+    ROTATION_DATE = re.compile(r'(20\d{2})-?(0[1-9]|1[0-2])-?(0[1-9]|[12]\d|3[01])(?:[-_.T]?([01]\d|2[0-3])(?!\d))?')
+    # 压缩日志使用的解压grep命令
+    COMPRESSED_GREP = OrderedDict([('.gz', 'zgrep'), ('.bz2', 'bzgrep'), ('.xz', 'xzgrep')])
+    
+    @classmethod
+    def _file_in_window(cls, path, mtime, since, until):
+        """判断日志文件是否可能包含时间窗口内的日志
+
+        最后修改时间早于窗口起点的文件不再包含窗口内的日志; 文件名带日期
+        (或小时)的轮转文件, 其日期区间与窗口不重叠时也可以跳过。
+
         Args:
-            trace_id: 追踪ID
-            
+            path: 文件路径
+            mtime: 文件最后修改时间 (datetime)
+            since: 窗口起点, None表示不限制
+            until: 窗口终点, None表示不限制
+
         Returns:
-            搜索结果字典
+            是否需要搜索该文件
         """
-        if not self.ssh:
-            raise Exception("未连接到日志服务器")
-        
-        log_config = self.config.get('logServer', {})
-        search_config = self.config.get('searchOptions', {})
+        if since is not None and mtime < since:
+            return False
         
-        base_dir = log_config.get('baseDirectory', '/logs/')
-        max_lines = int(search_config.get('maxLines', 1000))
-        context_lines = int(search_config.get('contextLines', 3))
+        match = cls.ROTATION_DATE.search(os.path.basename(path))
+        if match:
+            year, month, day, hour = match.groups()
+            try:
+                start = datetime(int(year), int(month), int(day), int(hour or 0))
+            except ValueError:
+                return True
+            end = start + (timedelta(hours=1) if hour else timedelta(days=1))
+            if until is not None and start > until:
+                return False
+            if since is not None and end < since:
+                return False
+        return True
+    
+    def _select_log_files(self, client, server, since=None, until=None):
+        """列出与时间窗口重叠的日志文件 (包括轮转和压缩的历史日志)
+
+        Args:
+            client: 已连接的SSH客户端
+            server: 服务器配置
+            since: 窗口起点
+            until: 窗口终点
+
+        Returns:
+            文件路径列表; 未指定时间窗口时返回None, 表示搜索所有 *.log 文件
+        """
+        if since is None and until is None:
+            return None
+        if self._is_local(server):
+            return self._files_in_window(client.listing(), since, until)
         
-        # 构建搜索命令
-        search_cmd = "grep -r"
-        if search_config.get('caseInsensitive', True):
-            search_cmd += " -i"
-        if context_lines > 0:
-            search_cmd += " -A {0} -B {0}".format(context_lines)
+        stdin, stdout, stderr = client.exec_command(self._list_command(server))
+        return self._files_in_window(self._iter_channel_lines(stdout), since, until)
+    
+    @staticmethod
+    def _list_command(server):
+        """列出日志目录下所有日志文件及其修改时间的命令"""
+        base_dir = server.get('baseDirectory', '/logs/')
+        return "find {0} -maxdepth 1 -type f -name '*.log*' -printf '%T@ %p\\n'".format(shlex.quote(base_dir))
+    
+    def _files_in_window(self, listing, since, until):
+        """从 `修改时间 路径` 格式的文件列表中筛选与时间窗口重叠的文件"""
+        files = []
+        for line in listing:
+            mtime, _, path = line.partition(' ')
+            try:
+                modified = datetime.fromtimestamp(float(mtime))
+            except ValueError:
+                continue
+            if self._file_in_window(path, modified, since, until):
+                files.append(path)
+        return sorted(files)
+    
+    def _grep_command(self, pattern_args, server, files, limit=None):
+        """构建grep命令, 指定文件列表时压缩文件使用对应的解压grep; limit为None时不限制输出行数"""
+        options = self._grep_options()
+        head = " | head -{0}".format(limit) if limit else ""
+        if files is None:
+            return "{0}; grep -rH{1} {2} {3}{4}".format(
+                self._count_files_command(server), options, pattern_args, self._log_files(server), head)
         
-        search_cmd += " '{0}' {1}*.log | head -{2}".format(trace_id, base_dir, max_lines)
+        # 未压缩的文件由一个grep搜索; zgrep等逐个文件调用grep, 文件之间不输出 `--`, 每个文件单独执行
+        plain = []
+        commands = []
+        for path in files:
+            tool = next((tool for ext, tool in self.COMPRESSED_GREP.items() if path.endswith(ext)), 'grep')
+            if tool == 'grep':
+                plain.append(shlex.quote(path))
+            else:
+                commands.append((tool, shlex.quote(path)))
+        if plain:
+            commands.insert(0, ('grep', ' '.join(plain)))
+        commands = ["{0} -H{1} {2} {3}".format(tool, options, pattern_args, paths) for tool, paths in commands]
+        if int(self.config.get('searchOptions', {}).get('contextLines', 3)) <= 0:
+            return "{{ {0}; }}{1}".format('; '.join(commands), head)
+        # 带上下文时每个命令之后输出 `--`, 由awk只保留有输出的命令之间的分隔行, 与grep的分组格式一致
+        return "{{ {0}; }} | awk {1}{2}".format(
+            '; echo --; '.join(commands), shlex.quote(self.SEPARATOR_FILTER), head)
+    
+    # 去掉开头、末尾和连续的 `--` 行 (grep -H 的输出行都以文件名开头, 不会与分隔行混淆)
+    SEPARATOR_FILTER = '$0 == "--" { pending = printed; next } pending { print "--"; pending = 0 } { printed = 1; print }'
+    
+    # 搜索所有 *.log 文件时, 通配符展开的文件数随stderr返回 (见 _read_stderr)
+    FILES_MARKER = '#log-search-files '
+    
+    def _count_files_command(self, server):
+        """把日志目录下 *.log 文件数写入stderr的命令, 不需要为统计文件数单独执行一次远程命令"""
+        return 'echo "{0}$(ls -1d {1} 2>/dev/null | wc -l)" >&2'.format(self.FILES_MARKER, self._log_files(server))
+    
+    # 启用缓存时, 搜索之前读取的文件状态随stderr返回 (见 _read_stderr)
+    STAT_MARKER = '#log-search-stat '
+    
+    def _stat_files_command(self, server, files):
+        """把搜索会读取的文件的大小和修改时间写入stderr的命令, 缓存结果时不需要再执行一次stat
+
+        Args:
+            server: 服务器配置
+            files: _select_log_files 的结果, None表示所有 *.log 文件
+        """
+        paths = self._log_files(server) if files is None else ' '.join(shlex.quote(path) for path in files)
+        return "stat -c '{0}%s %Y %n' -- {1} >&2 2>/dev/null".format(self.STAT_MARKER, paths)
+    
+    def _read_stderr(self, stderr, details=None):
+        """读取远程搜索命令的stderr
+
+        Args:
+            stderr: 远程命令的stderr
+            details: 可选字典, 写入搜索命令统计的文件数 (files_count) 和文件状态 (file_stats)
+
+        Returns:
+            去掉文件数和文件状态标记后的警告内容
+        """
+        warnings = []
+        for line in stderr.read().decode('utf-8', errors='replace').splitlines():
+            if line.startswith(self.STAT_MARKER):
+                if details is not None:
+                    details.setdefault('file_stats', {}).update(
+                        self._parse_file_stats([line[len(self.STAT_MARKER):]]))
+            elif not line.startswith(self.FILES_MARKER):
+                warnings.append(line)
+            elif details is not None and line[len(self.FILES_MARKER):].strip().isdigit():
+                details['files_count'] = int(line[len(self.FILES_MARKER):])
+        return "\n".join(warnings)
+    
+    def _build_search_command(self, trace_id, server, files=None):
+        """构建远程grep命令
+
+        Args:
+            trace_id: 追踪ID
+            server: 服务器配置
+            files: 要搜索的文件列表, 默认为日志目录下所有 *.log 文件
+
+        Returns:
+            搜索命令
+        """
+        max_lines = int(self.config.get('searchOptions', {}).get('maxLines', 1000))
         
+        return self._grep_command(shlex.quote(trace_id), server, files, max_lines)
+    
+    def _build_batch_command(self, trace_ids, server, files=None):
+        """构建批量搜索命令: TraceId列表从标准输入读取, 按固定字符串一次匹配
+
+        Args:
+            trace_ids: 追踪ID列表
+            server: 服务器配置
+            files: 要搜索的文件列表, 默认为日志目录下所有 *.log 文件
+
+        Returns:
+            搜索命令
+
+        输出不用head截断: 共用的行数上限会被命中多的TraceId占满, 每个TraceId的
+        maxLines 由 _demux_batch 分别限制, 全部取满后关闭通道结束grep。
+        """
+        if files is None:
+            return self._grep_command("-F -f -", server, files)
+        # 多个grep命令共用TraceId列表, 先保存到远程临时文件
+        return 'ids=$(mktemp) && cat > "$ids" && {0}; rm -f "$ids"'.format(
+            self._grep_command('-F -f "$ids"', server, files))
+    
+    def _run_search(self, client, server, trace_id, since=None, until=None, connect_ms=None):
+        """在指定连接上执行搜索
+
+        Args:
+            client: 已连接的SSH客户端
+            server: 服务器配置
+            trace_id: 追踪ID
+            since: 时间窗口起点
+            until: 时间窗口终点
+            connect_ms: 获取连接的耗时, 写入结果的metrics
+
+        Returns:
+            搜索结果字典, `metrics` 中为各阶段的耗时和计数
+        """
+        started = time.perf_counter()
+        metrics = self._new_metrics('search', trace_id, server)
+        metrics['connect_ms'] = connect_ms
         try:
-            print("Searching TraceId: {0}".format(trace_id))
-            print("Search directory: {0}".format(base_dir))
-            
-            stdin, stdout, stderr = self.ssh.exec_command(search_cmd)
+            cache_key, result = self._cache_lookup(client, server, trace_id, since, until)
+            if result is not None:
+                return self._with_metrics(result, metrics, started)
             
-            output = stdout.read().decode('utf-8', errors='replace')
-            error = stderr.read().decode('utf-8', errors='replace')
-            
-            if error:
-                print("Search warning: {0}".format(error))
-            
-            return {
-                'trace_id': trace_id,
-                'command': search_cmd,
-                'output': output,
-                'lines_count': len(output.splitlines()) if output else 0,
-                'timestamp': datetime.now().isoformat()
-            }
+            details = {}
+            lines = list(self._iter_lines_on(client, server, trace_id, since, until, details))
+            result = self._search_result(trace_id, server, lines, details)
+            self._cache_store(cache_key, result, self._cache_files(lines, details))
+            return self._with_metrics(result, metrics, started, details)
             
         except Exception as e:
-            print("Search failed: {0}".format(str(e)))
-            return {
-                'trace_id': trace_id,
-                'error': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
+            print("Search failed ({0}): {1}".format(self._server_name(server), str(e)))
+            return self._error_result(trace_id, server, e)
     
-    def extract_business_info(self, log_content):
-        """从日志内容中提取业务信息
-        
+    def _search_result(self, trace_id, server, lines, details):
+        """构建单台服务器的搜索结果字典"""
+        return {
+            'trace_id': trace_id,
+            'host': self._server_name(server),
+            'command': details['command'],
+            'source': details['source'],
+            'output': "\n".join(lines) + "\n" if lines else "",
+            'lines_count': len(lines),
+            'files_count': details['files_count'],
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _with_metrics(self, result, metrics, started, details=None):
+        """把本次搜索的指标写入结果字典
+
         Args:
-            log_content: 日志内容
-            
+            result: _search_result 或缓存的结果
+            metrics: _new_metrics 创建的指标, 已记录连接耗时
+            started: 开始搜索的时间 (perf_counter)
+            details: _iter_lines_on 记录的传输信息, None表示结果来自缓存
+
         Returns:
-            提取的业务信息
+            result
         """
-        business_info = {
-            'sql_queries': [],
-            'exceptions': [],
-            'api_calls': [],
-            'user_params': {},
-            'user_ids': []
+        if details is None:
+            metrics.update(cached=True, files=result['files_count'])
+        else:
+            self._record_transfer(metrics, details)
+        metrics.update(lines=result['lines_count'], total_ms=self._elapsed_ms(started))
+        result['metrics'] = metrics
+        return result
+    
+    def _error_result(self, trace_id, server, error):
+        return {
+            'trace_id': trace_id,
+            'host': self._server_name(server),
+            'error': str(error),
+            'timestamp': datetime.now().isoformat()
         }
+    
+    def _new_metrics(self, operation, trace_id, server=None):
+        """一次搜索的指标: 各阶段耗时(毫秒)和计数, 未经历的阶段为None"""
+        return OrderedDict([
+            ('operation', operation),
+            ('trace_id', trace_id),
+            ('host', self._server_name(server) if server is not None else None),
+            ('connect_ms', None),
+            ('first_byte_ms', None),
+            ('transfer_ms', None),
+            ('bytes', 0),
+            ('lines', 0),
+            ('files', None),
+            ('extract_ms', None),
+            ('matches', None),
+            ('total_ms', None)
+        ])
+    
+    @staticmethod
+    def _elapsed_ms(start, end=None):
+        return round(((end if end is not None else time.perf_counter()) - start) * 1000, 3)
+    
+    def _record_transfer(self, metrics, details):
+        """把 _iter_lines_on 记录的时间点和字节数写入指标
+
+        first_byte_ms 为开始执行远程命令到收到第一个字节的时间,
+        transfer_ms 为收到第一个字节到最后一个字节的时间。
+        """
+        if details.get('exec_start') is not None and 'first_byte' in details:
+            metrics['first_byte_ms'] = self._elapsed_ms(details['exec_start'], details['first_byte'])
+            metrics['transfer_ms'] = self._elapsed_ms(details['first_byte'], details['last_byte'])
+        metrics['bytes'] = details.get('bytes', 0)
+        metrics['files'] = details.get('files_count')
+    
+    @staticmethod
+    def _match_counts(business_info):
+        """各类别的匹配数"""
+        return OrderedDict((key, len(business_info[key])) for key in
+                           ('sql_queries', 'exceptions', 'api_calls', 'user_ids', 'trace_ids'))
+    
+    def _aggregate_metrics(self, operation, trace_id, host_metrics, started):
+        """合并多台服务器的指标: 耗时取最慢的服务器, 字节数、行数和文件数求和"""
+        def slowest(key):
+            values = [m[key] for m in host_metrics if m[key] is not None]
+            return max(values) if values else None
         
-        lines = log_content.splitlines()
+        files = [m['files'] for m in host_metrics]
+        metrics = self._new_metrics(operation, trace_id)
+        metrics.update(
+            connect_ms=slowest('connect_ms'),
+            first_byte_ms=slowest('first_byte_ms'),
+            transfer_ms=slowest('transfer_ms'),
+            bytes=sum(m['bytes'] for m in host_metrics),
+            lines=sum(m['lines'] for m in host_metrics),
+            files=sum(files) if files and None not in files else None,
+            total_ms=self._elapsed_ms(started),
+            hosts=host_metrics)
+        return metrics
+    
+    def add_metrics_hook(self, callback):
+        """注册指标回调
+
+        每次搜索完成后以指标字典调用 (多台服务器时为合并后的指标, `hosts` 中为各服务器的指标),
+        MCP服务等调用方可据此汇总。回调在搜索线程中执行, 应尽快返回。
+
+        Args:
+            callback: 接收指标字典的函数
+        """
+        self.metrics_hooks.append(callback)
+    
+    def notify_metrics_hooks(self, metrics):
+        """调用指标回调, 单个回调失败不影响搜索结果; metrics为None(如守护进程未返回指标)时不调用"""
+        if metrics is None:
+            return
+        for hook in list(self.metrics_hooks):
+            try:
+                hook(metrics)
+            except Exception as e:
+                print("Metrics hook failed: {0}".format(str(e)))
+    
+    def _emit_metrics(self, metrics):
+        """调用指标回调, 并在配置了 searchOptions.metricsLog 时追加一行JSON日志"""
+        self.notify_metrics_hooks(metrics)
         
+        path = self.config.get('searchOptions', {}).get('metricsLog')
+        if path:
+            record = OrderedDict([('timestamp', datetime.now().isoformat())])
+            record.update(metrics)
+            with self._metrics_lock:
+                with open(path, 'a') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    
+    def _cache_key(self, server, trace_id, since=None, until=None):
+        """缓存键: TraceId、服务器和影响结果的搜索选项"""
+        search_config = self.config.get('searchOptions', {})
+        return ResultCache.make_key(
+            trace_id=trace_id,
+            server=SSHConnectionPool.server_key(server),
+            base_dir=server.get('baseDirectory', '/logs/'),
+            max_lines=search_config.get('maxLines', 1000),
+            context_lines=search_config.get('contextLines', 3),
+            case_insensitive=self._case_insensitive(),
+            since=since,
+            until=until)
+    
+    def _cache_lookup(self, client, server, trace_id, since=None, until=None):
+        """查询结果缓存
+
+        没有缓存条目时不访问服务器 (搜索命令自己在stderr中返回文件状态, 见 _stat_files_command);
+        有缓存条目时用一次 `stat` 校验, 当前日志有新追加的内容时只搜索追加的部分并入缓存的结果。
+
+        Args:
+            client: 已连接的SSH客户端
+            server: 服务器配置
+            trace_id: 追踪ID
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Returns:
+            (缓存键, 缓存的结果): 缓存关闭时均为None, 未命中或缓存已失效时结果为None
+        """
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(server, trace_id, since, until)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        result, files = cached
+        stats = self._validation_stats(client, server, files)
+        grown = self._appended_files(files, stats, since, until)
+        if grown is None:
+            self.cache.invalidate(cache_key)
+            return cache_key, None
+        lines = list(self._iter_appended_lines(client, server, trace_id, grown)) if grown else []
+        return cache_key, self._refresh_cached(cache_key, result, files, stats, grown, lines)
+    
+    def _cache_store(self, cache_key, result, files):
+        """缓存搜索结果 (_cache_lookup 未返回缓存键或没有文件状态时不缓存)"""
+        if cache_key is not None and files is not None:
+            self.cache.put(cache_key, result, files)
+    
+    @staticmethod
+    def _line_file(line, paths):
+        """grep输出行所属的文件: 以 `文件路径:` 或 `文件路径-` 开头的路径, paths按长度从长到短排列"""
+        return next((path for path in paths
+                     if line.startswith(path) and line[len(path):len(path) + 1] in (':', '-')), None)
+    
+    def _cache_files(self, lines, details):
+        """缓存条目需要校验的文件
+
+        只追加写入的当前日志 (*.log) 全部记录, 大小为搜索开始时的字节数, 修改时间为None,
+        再次搜索时只搜索之后追加的内容; 轮转和压缩的历史日志不再变化, 只记录产生了结果的文件。
+
+        Args:
+            lines: 搜索结果的行
+            details: _iter_lines_on 记录的搜索信息, file_stats 为搜索开始时读取的文件状态
+
+        Returns:
+            {文件路径: [大小, 修改时间]}, 没有文件状态时为None (结果不缓存)
+        """
+        stats = details.get('file_stats')
+        if stats is None:
+            return None
+        files = dict((path, [stat[0], None]) for path, stat in stats.items() if path.endswith('.log'))
+        rotated = sorted((path for path in stats if path not in files), key=len, reverse=True)
         for line in lines:
-            # 提取SQL查询
-            if re.search(r'(SELECT|INSERT|UPDATE|DELETE)', line, re.IGNORECASE):
-                business_info['sql_queries'].append(line.strip())
-            
-            # 提取异常信息
-            if re.search(r'(Exception|Error|ERROR)', line, re.IGNORECASE):
-                business_info['exceptions'].append(line.strip())
-            
-            # 提取API调用
-            if re.search(r'(http://|https://|API|api)', line, re.IGNORECASE):
-                business_info['api_calls'].append(line.strip())
-            
-            # 提取用户ID
-            user_ids = re.findall(r'custNo[=:]?\s*(\d+)', line, re.IGNORECASE)
-            business_info['user_ids'].extend(user_ids)
-        
-        # 去重
-        for key in ['user_ids']:
-            business_info[key] = list(set(business_info[key]))
-        
-        return business_info
+            if not rotated:
+                break
+            path = self._line_file(line, rotated)
+            if path is not None:
+                files[path] = stats[path]
+                rotated.remove(path)
+        return files
     
-    def disconnect(self):
-        """断开SSH连接"""
-        if self.ssh:
-            self.ssh.close()
-            self.ssh = None
-            print("SSH connection closed")
+    def _validation_stats(self, client, server, files):
+        """一次 `stat` 获取校验缓存需要的文件状态: 所有当前日志和缓存记录的历史日志
+
+        Returns:
+            {文件路径: [大小, 修改时间]}
+        """
+        if self._is_local(server):
+            rotated = [path for path, stat in files.items() if stat[1] is not None]
+            return client.file_stats(client.log_files() + rotated)
+        stdin, stdout, stderr = client.exec_command(self._validation_command(server, files))
+        return self._parse_file_stats(self._iter_channel_lines(stdout))
     
-    def __enter__(self):
-        """上下文管理器入口"""
-        self.connect()
-        return self
+    def _validation_command(self, server, files):
+        """获取所有 *.log 文件和缓存记录的历史日志大小和修改时间的命令"""
+        rotated = sorted(path for path, stat in files.items() if stat[1] is not None)
+        return "stat -c '%s %Y %n' -- {0} 2>/dev/null".format(
+            ' '.join([self._log_files(server)] + [shlex.quote(path) for path in rotated]))
     
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """上下文管理器出口"""
-        self.disconnect()
+    def _appended_files(self, files, stats, since=None, until=None):
+        """根据文件的当前状态判断缓存的结果是否仍然可用
 
+        Args:
+            files: 缓存记录的文件 (见 _cache_files)
+            stats: _validation_stats 的结果
+            since: 时间窗口起点
+            until: 时间窗口终点
 
-def main():
-    """主函数 - 命令行使用示例"""
-    if len(sys.argv) < 2:
-        print("Usage: python log_search.py <trace_id>")
-        sys.exit(1)
+        Returns:
+            {文件路径: 开始搜索的偏移}: 有新追加内容的当前日志从上次搜索的位置向前 APPEND_OVERLAP_BYTES
+            开始, 新出现的当前日志从0开始; 为空时缓存的结果可直接使用。历史日志有变化、
+            当前日志变小 (轮转或截断) 或文件被删除时返回None, 需要重新搜索
+        """
+        grown = {}
+        for path, (size, mtime) in files.items():
+            stat = stats.get(path)
+            if stat is None or stat[0] < size or (mtime is not None and stat != [size, mtime]):
+                return None
+            if stat[0] > size:
+                grown[path] = max(size - APPEND_OVERLAP_BYTES, 0)
+        added = dict((path, stat) for path, stat in stats.items() if path not in files and path.endswith('.log'))
+        for path in self._searched_files(added, since, until):
+            grown[path] = 0
+        return grown
+    
+    def _append_command(self, trace_id, server, grown):
+        """只搜索当前日志新追加内容的命令, 输出格式与 _grep_command 相同
+
+        从开始搜索的偏移之前的一个字节开始读取并丢掉第一行 (偏移之前那一行的剩余部分, 或只有换行符),
+        与 LocalLogBackend.search_appended 相同。
+        """
+        options = self._grep_options()
+        pattern = shlex.quote(trace_id)
+        commands = []
+        for path in sorted(grown):
+            if grown[path]:
+                commands.append("tail -c +{0} {1} | tail -n +2 | grep -H --label={1}{2} {3}".format(
+                    grown[path], shlex.quote(path), options, pattern))
+            else:
+                commands.append("grep -H{0} {1} {2}".format(options, pattern, shlex.quote(path)))
+        if int(self.config.get('searchOptions', {}).get('contextLines', 3)) <= 0:
+            return "{{ {0}; }}".format('; '.join(commands))
+        return "{{ {0}; }} | awk {1}".format('; echo --; '.join(commands), shlex.quote(self.SEPARATOR_FILTER))
     
-    trace_id = sys.argv[1]
+    def _iter_appended_lines(self, client, server, trace_id, grown):
+        """搜索当前日志新追加的内容 (grown见 _appended_files)"""
+        if self._is_local(server):
+            for line in client.search_appended([trace_id], grown,
+                                               int(self.config.get('searchOptions', {}).get('contextLines', 3)),
+                                               self._case_insensitive()):
+                yield line
+            return
+        stdin, stdout, stderr = client.exec_command(self._append_command(trace_id, server, grown))
+        for line in self._iter_channel_lines(stdout):
+            yield line
+        self._warn(server, self._read_stderr(stderr))
     
-    try:
-        searcher = LogSearcher()
-        if searcher.connect():
-            # 搜索日志
-            result = searcher.search_by_traceid(trace_id)
-            
-            if 'error' in result:
-                print("Search failed: {0}".format(result['error']))
-                return
-            
-            print("Search result: Found {0} lines of logs".format(result['lines_count']))
-            
-            if result['output']:
-                # 保存完整日志到文件
-                output_file = "logs_{0}_{1}.txt".format(trace_id, datetime.now().strftime('%Y%m%d_%H%M%S'))
-                with open(output_file, 'wb') as f:
-                    f.write(result['output'].encode('utf-8'))
-                print("Complete log saved to: {0}".format(output_file))
-                
-                # 显示前5行日志内容作为预览
-                try:
-                    lines = result['output'].splitlines()
-                    print("\nLog content preview (first 5 lines):")
-                    for i, line in enumerate(lines[:5]):
-                        print("  {0}: {1}".format(i+1, line[:150]))
-                    
-                    # 提取业务信息
-                    business_info = searcher.extract_business_info(result['output'])
-                    
-                    print("\nExtracted business information:")
-                    print("  User IDs: {0}".format(business_info['user_ids']))
-                    print("  SQL queries: {0}".format(len(business_info['sql_queries'])))
-                    print("  Exceptions: {0}".format(len(business_info['exceptions'])))
-                    print("  API calls: {0}".format(len(business_info['api_calls'])))
-                except Exception as e:
-                    print("Error processing log content: {0}".format(str(e)))
+    def _refresh_cached(self, cache_key, result, files, stats, grown, lines):
+        """返回缓存的结果; 当前日志有新追加的内容时先并入其搜索结果 (lines), 并更新缓存条目"""
+        if grown:
+            for path in grown:
+                files[path] = [stats[path][0], None]
+            self._merge_appended(result, files, lines)
+            self.cache.put(cache_key, result, files)
+        result['cached'] = True
+        return result
+    
+    def _merge_appended(self, result, files, lines):
+        """把新追加内容的搜索结果并入缓存的结果
+
+        缓存的输出按文件分组, 每个文件新的行组接在该文件已有的行之后, 新出现的当前日志
+        按文件名排在其他未压缩的文件之间。重叠读取的部分只会与该文件已有的行的末尾重复,
+        这些行每行只去掉一次 (内容相同的新行仍然保留), 开头与已有的行重叠的行组与该文件
+        最后一组相连, 不插入 `--`; 上次搜索时只写了一半的最后一行由完整的行代替。
+        合并后与grep相同按 maxLines 截断。
+
+        Args:
+            result: 缓存的结果, 原地修改output和lines_count
+            files: 缓存记录的文件, 包括有新追加内容的文件
+            lines: _iter_appended_lines 的输出
+        """
+        search_config = self.config.get('searchOptions', {})
+        context_lines = int(search_config.get('contextLines', 3))
+        paths = sorted(files, key=len, reverse=True)
+        
+        def unseen(line, seen):
+            if seen[line] > 0:
+                seen[line] -= 1
+                return False
+            return True
+        
+        def file_groups(output):
+            groups = OrderedDict()
+            current = None
+            for line in output:
+                if line == '--':
+                    current = None
+                    continue
+                path = self._line_file(line, paths) or ''
+                if current is None or current[0] != path:
+                    current = (path, [])
+                    groups.setdefault(path, []).append(current[1])
+                current[1].append(line)
+            return groups
+        
+        blocks = file_groups(result['output'].split('\n')[:-1])
+        for path, groups in file_groups(lines).items():
+            block = blocks.setdefault(path, [])
+            appended = [line for group in groups for line in group]
+            seen = Counter([line for group in block for line in group][-(len(appended) + context_lines):])
+            probe = Counter(seen)
+            fresh = next((line for line in appended if unseen(line, probe)), None)
+            partial = block[-1][-1][len(path) + 1:] if block else ''
+            if partial and fresh is not None and fresh[len(path) + 1:].startswith(partial):
+                # 上次搜索时文件末尾的行只写了一半, 由重新读到的完整的行代替
+                seen[block[-1].pop()] -= 1
+                if not block[-1]:
+                    block.pop()
+            for group in groups:
+                new = [unseen(line, seen) for line in group]
+                added = [line for line, is_new in zip(group, new) if is_new]
+                if not added:
+                    continue
+                if block and not new[0]:
+                    block[-1].extend(added)
+                else:
+                    block.append(added)
+            if not block:
+                del blocks[path]
+        
+        # 未压缩的文件按文件名排在前面, 压缩文件保持原有顺序 (与 _grep_command 相同)
+        def compressed(path):
+            return any(path.endswith(ext) for ext in self.COMPRESSED_GREP)
+        
+        output = []
+        for path in sorted(blocks, key=lambda path: (compressed(path), '' if compressed(path) else path)):
+            for group in blocks[path]:
+                if context_lines > 0 and output:
+                    output.append('--')
+                output.extend(group)
+        del output[int(search_config.get('maxLines', 1000)):]
+        result['output'] = "\n".join(output) + "\n" if output else ""
+        result['lines_count'] = len(output)
+    
+    def _searched_files(self, stats, since=None, until=None):
+        """从文件状态中筛选搜索会读取的文件, 与 _select_log_files 相同:
+        未指定时间窗口时为所有 *.log 文件, 否则为与窗口重叠的文件"""
+        if since is None and until is None:
+            return dict((path, stat) for path, stat in stats.items() if path.endswith('.log'))
+        return dict((path, stat) for path, stat in stats.items()
+                    if self._file_in_window(path, datetime.fromtimestamp(stat[1]), since, until))
+    
+    @staticmethod
+    def _parse_file_stats(lines):
+        stats = {}
+        for line in lines:
+            parts = line.split(' ', 2)
+            if len(parts) == 3 and parts[0].isdigit() and parts[1].isdigit():
+                stats[parts[2]] = [int(parts[0]), int(parts[1])]
+        return stats
+    
+    def search_by_traceid(self, trace_id, since=None, until=None):
+        """根据TraceId搜索日志
+        
+        指定时间窗口时只搜索与窗口重叠的日志文件(按轮转文件名中的日期和
+        最后修改时间判断), 并包括 .gz/.bz2/.xz 压缩的历史日志。
+        
+        Args:
+            trace_id: 追踪ID
+            since: 时间窗口起点 (datetime), 可选
+            until: 时间窗口终点 (datetime), 可选
+            
+        Returns:
+            搜索结果字典
+        """
+        if not self.ssh:
+            raise Exception("未连接到日志服务器")
+        
+        log_config = self.servers[0]
+        
+        print("Searching TraceId: {0}".format(trace_id))
+        print("Search directory: {0}".format(log_config.get('baseDirectory', '/logs/')))
+        
+        result = self._run_search(self.ssh, log_config, trace_id, since, until, self._connect_ms)
+        if 'metrics' in result:
+            self._emit_metrics(result['metrics'])
+        return result
+    
+    def search(self, trace_id, since=None, until=None):
+        """搜索TraceId: 单台服务器时直接搜索, 多台服务器时并行搜索并合并
+
+        与 search_by_traceid 不同, 连接从连接池按需获取, 无需先调用connect。
+
+        Args:
+            trace_id: 追踪ID
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Returns:
+            搜索结果字典
+        """
+        if len(self.servers) > 1:
+            return self.search_all_hosts(trace_id, since=since, until=until)
+        result = self._search_host(self.servers[0], trace_id, since, until)
+        if 'metrics' in result:
+            self._emit_metrics(result['metrics'])
+        return result
+    
+    def _search_host(self, server, trace_id, since=None, until=None):
+        """在单台服务器上搜索, 连接从连接池获取"""
+        started = time.perf_counter()
+        try:
+            client = self.pool.get(server)
+        except Exception as e:
+            return self._error_result(trace_id, server, e)
+        return self._run_search(client, server, trace_id, since, until, self._elapsed_ms(started))
+    
+    def search_all_hosts(self, trace_id, max_workers=None, since=None, until=None):
+        """在所有日志服务器上并行搜索TraceId
+
+        每台服务器使用连接池中的长连接, 由有界线程池同时执行grep,
+        总耗时取决于最慢的一台服务器而不是所有服务器之和。
+
+        Args:
+            trace_id: 追踪ID
+            max_workers: 最大并发数, 默认读取 searchOptions.maxWorkers (8)
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Returns:
+            合并后的搜索结果字典, `hosts` 中保存每台服务器的结果
+        """
+        print("Searching TraceId: {0} on {1} hosts".format(trace_id, len(self.servers)))
+        started = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=self._max_workers(max_workers)) as executor:
+            futures = [executor.submit(self._search_host, server, trace_id, since, until) for server in self.servers]
+            host_results = [future.result() for future in futures]
+        
+        result = self._merge_host_results(trace_id, host_results)
+        result['metrics'] = self._aggregate_metrics(
+            'search', trace_id, [r['metrics'] for r in host_results if 'metrics' in r], started)
+        self._emit_metrics(result['metrics'])
+        return result
+    
+    def _merge_host_results(self, trace_id, host_results):
+        """按服务器合并搜索结果, 输出的每一行以 `服务器名:` 开头"""
+        hosts = OrderedDict()
+        errors = {}
+        merged = []
+        
+        for result in host_results:
+            host = result['host']
+            hosts[host] = result
+            if 'error' in result:
+                errors[host] = result['error']
+                continue
+            merged.extend("{0}:{1}".format(host, line) for line in result['output'].splitlines())
+        
+        return {
+            'trace_id': trace_id,
+            'hosts': hosts,
+            'errors': errors,
+            'output': "\n".join(merged) + "\n" if merged else "",
+            'lines_count': len(merged),
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def _max_workers(self, max_workers=None):
+        if max_workers is None:
+            max_workers = int(self.config.get('searchOptions', {}).get('maxWorkers', 8))
+        return max(1, min(int(max_workers), len(self.servers)))
+    
+    @staticmethod
+    def _iter_channel_lines(stdout, chunk_size=65536, stats=None):
+        """按块读取远程命令输出并逐行解码
+
+        Args:
+            stdout: exec_command返回的标准输出
+            chunk_size: 每次从通道读取的字节数
+            stats: 可选字典, 累加接收的字节数到 stats['bytes'],
+                并记录收到第一块和最后一块数据的时间 (first_byte / last_byte, perf_counter)
+
+        Yields:
+            去掉换行符的日志行
+        """
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        channel = stdout.channel
+        pending = ''
+        while True:
+            chunk = channel.recv(chunk_size)
+            if not chunk:
+                break
+            if stats is not None:
+                now = time.perf_counter()
+                stats.setdefault('first_byte', now)
+                stats['last_byte'] = now
+                stats['bytes'] = stats.get('bytes', 0) + len(chunk)
+            pending += decoder.decode(chunk)
+            lines = pending.split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+    
+    def iter_search_lines(self, trace_id, server=None, since=None, until=None):
+        """流式搜索TraceId, 边接收边返回日志行
+
+        Args:
+            trace_id: 追踪ID
+            server: 服务器配置, 默认为第一台服务器
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Yields:
+            日志行
+        """
+        server = server or self.servers[0]
+        client = self.pool.get(server)
+        for line in self._iter_lines_on(client, server, trace_id, since, until):
+            yield line
+    
+    def _iter_host_lines(self, server, trace_id, since=None, until=None, metrics=None):
+        """从连接池获取连接并搜索, metrics不为None时记录连接耗时、传输指标和行数"""
+        started = time.perf_counter()
+        client = self.pool.get(server)
+        if metrics is not None:
+            metrics['connect_ms'] = self._elapsed_ms(started)
+        cache_key, result = self._cache_lookup(client, server, trace_id, since, until)
+        if result is not None:
+            lines = result['output'].split('\n')[:-1]
+            for line in lines:
+                yield line
+            if metrics is not None:
+                metrics.update(cached=True, lines=len(lines), files=result['files_count'],
+                               total_ms=self._elapsed_ms(started))
+            return
+        
+        details = {}
+        # 未命中缓存时保留输出的行用于构建缓存的结果, 超过 CACHE_STREAM_BYTES 后不再保留, 内存占用不随结果增长
+        lines = [] if cache_key is not None else None
+        buffered = 0
+        count = 0
+        for line in self._iter_lines_on(client, server, trace_id, since, until, details):
+            count += 1
+            if lines is not None:
+                lines.append(line)
+                buffered += len(line) + 1
+                if buffered > CACHE_STREAM_BYTES:
+                    lines = None
+            yield line
+        if lines is not None:
+            self._cache_store(cache_key, self._search_result(trace_id, server, lines, details),
+                              self._cache_files(lines, details))
+        if metrics is not None:
+            self._record_transfer(metrics, details)
+            metrics.update(lines=count, total_ms=self._elapsed_ms(started))
+    
+    def _build_index_command(self, trace_id, server):
+        """构建TraceId索引查询命令 (见 log_index.py fetch)
+
+        候选文件与grep相同 (由远程shell展开 `*.log`), 索引没有覆盖的文件和字节区间由fetch直接扫描;
+        TraceId不是索引记录的格式时fetch以 EXIT_MISS 退出, 回退到grep。
+        """
+        search_config = self.config.get('searchOptions', {})
+        return "{0} fetch --context {1} --max-lines {2}{3} -- {4} {5}".format(
+            server['indexCommand'], int(search_config.get('contextLines', 3)),
+            int(search_config.get('maxLines', 1000)), '' if self._case_insensitive() else ' --case-sensitive',
+            shlex.quote(trace_id), self._log_files(server))
+    
+    def _iter_lines_on(self, client, server, trace_id, since=None, until=None, details=None):
+        """在指定连接上搜索TraceId并逐行返回
+
+        服务器配置了 `indexCommand` 且未指定时间窗口时, 先查询日志服务器上的
+        TraceId索引, 只读取索引记录的字节区间; TraceId不是索引记录的格式或索引不可用时回退到grep。
+
+        Args:
+            client: 已连接的SSH客户端
+            server: 服务器配置
+            trace_id: 追踪ID
+            since: 时间窗口起点
+            until: 时间窗口终点
+            details: 可选字典, 写入实际执行的命令、数据来源、搜索的文件数,
+                以及开始执行、收到第一个和最后一个字节的时间和接收的字节数
+
+        Yields:
+            日志行
+        """
+        details = details if details is not None else {}
+        
+        if self._is_local(server):
+            for line in self._iter_local_lines(client, server, [trace_id], since, until, details):
+                yield line
+            return
+        
+        index_cmd = self._index_step(trace_id, server, since, until, details)
+        if index_cmd is not None:
+            stdin, stdout, stderr = client.exec_command(index_cmd)
+            count = 0
+            for line in self._iter_channel_lines(stdout, stats=details):
+                count += 1
+                yield line
+            if count or stdout.channel.recv_exit_status() == 0:
+                # stderr中只有查询之前记录的文件状态 (见 _index_step)
+                self._read_stderr(stderr, details)
+                return
+            # TraceId不是索引记录的格式(或索引不可用), 回退到grep
+        
+        files = self._select_log_files(client, server, since, until)
+        search_cmd = self._grep_step(trace_id, server, files, details)
+        if search_cmd is None:
+            return
+        
+        stdin, stdout, stderr = client.exec_command(search_cmd)
+        for line in self._iter_channel_lines(stdout, stats=details):
+            yield line
+        self._warn(server, self._read_stderr(stderr, details))
+    
+    def _index_step(self, trace_id, server, since=None, until=None, details=None):
+        """索引查询命令: 服务器配置了 `indexCommand` 且未指定时间窗口时返回命令并写入details, 否则返回None"""
+        if not server.get('indexCommand') or since is not None or until is not None:
+            return None
+        index_cmd = self._build_index_command(trace_id, server)
+        details.update(command=index_cmd, source='index', files_count=None, exec_start=time.perf_counter())
+        return self._with_file_stats(index_cmd, server, None, details)
+    
+    def _grep_step(self, trace_id, server, files, details):
+        """grep命令: 写入details后返回, 时间窗口内没有日志文件时返回None
+
+        Args:
+            trace_id: 追踪ID
+            server: 服务器配置
+            files: _select_log_files 的结果
+            details: 写入命令、数据来源、文件数和开始执行的时间
+        """
+        search_cmd = self._build_search_command(trace_id, server, files)
+        details.update(command=search_cmd, source='grep', files_count=len(files) if files is not None else None)
+        if files == []:
+            return None
+        details['exec_start'] = time.perf_counter()
+        return self._with_file_stats(search_cmd, server, files, details)
+    
+    def _with_file_stats(self, command, server, files, details):
+        """启用缓存时在命令之前记录要读取的文件状态, 随stderr返回并由 _read_stderr 写入 details['file_stats']"""
+        if self.cache is None:
+            return command
+        details['file_stats'] = {}
+        return "{0}; {1}".format(self._stat_files_command(server, files), command)
+    
+    def _warn(self, server, error):
+        """输出远程命令的警告 (_read_stderr 的结果)"""
+        if error:
+            print("Search warning ({0}): {1}".format(self._server_name(server), error))
+    
+    def _build_follow_command(self, trace_id, server, path):
+        """构建单个日志文件的实时跟踪命令 (见 _REMOTE_FOLLOW_SCRIPT)"""
+        interval = float(self.config.get('searchOptions', {}).get('followInterval', 0.5))
+        return "{0} -u -c {1} {2} {3} {4} {5}".format(
+            server.get('python', 'python3'), shlex.quote(_REMOTE_FOLLOW_SCRIPT), shlex.quote(path),
+            shlex.quote(trace_id), '1' if self._case_insensitive() else '0', interval)
+    
+    def _list_log_files(self, client, server):
+        """列出当前的 *.log 文件"""
+        stdin, stdout, stderr = client.exec_command("ls -1d {0} 2>/dev/null".format(self._log_files(server)))
+        return [line for line in self._iter_channel_lines(stdout) if line]
+    
+    def follow(self, trace_id, stop_event=None):
+        """实时跟踪TraceId, 只返回开始跟踪之后新写入的匹配行
+
+        在已有的SSH连接上为每台服务器的每个 *.log 文件打开一个常驻通道, 由远程脚本
+        记录inode和字节偏移持续读取新内容(跨轮转和截断), 本地用select等待所有通道,
+        不会重复grep整个目录。开始跟踪之后新创建的文件名不在跟踪范围内。
+
+        Args:
+            trace_id: 追踪ID
+            stop_event: 可选的threading.Event, 设置后停止跟踪
+
+        Yields:
+            新的日志行 (`文件路径:日志行`, 多台服务器时以 `服务器名:` 开头)
+        """
+        multi_host = len(self.servers) > 1
+        streams = OrderedDict()
+        try:
+            for server in self.servers:
+                name = self._server_name(server)
+                if self._is_local(server):
+                    print("Follow mode is not supported for local log directories, skipping {0}".format(name))
+                    continue
+                client = self.pool.get(server)
+                for path in self._list_log_files(client, server):
+                    stdin, stdout, stderr = client.exec_command(self._build_follow_command(trace_id, server, path))
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                    streams[stdout.channel] = [name + ':' if multi_host else '', decoder, '', stdin]
+            
+            open_channels = list(streams)
+            while open_channels and not (stop_event is not None and stop_event.is_set()):
+                readable, _, _ = select.select(open_channels, [], [], 1.0)
+                for channel in readable:
+                    state = streams[channel]
+                    chunk = channel.recv(65536)
+                    if not chunk:
+                        open_channels.remove(channel)
+                        continue
+                    lines = (state[2] + state[1].decode(chunk)).split('\n')
+                    state[2] = lines.pop()
+                    for line in lines:
+                        yield state[0] + line.rstrip('\r')
+        finally:
+            for channel in streams:
+                channel.close()
+    
+    def _iter_local_lines(self, backend, server, trace_ids, since=None, until=None, details=None, limited=True):
+        """在本地日志目录中搜索 (mmap + 进程池), 输出与远程grep相同; limited为False时不限制行数 (批量搜索)"""
+        search_config = self.config.get('searchOptions', {})
+        files = self._select_log_files(backend, server, since, until)
+        if files is None:
+            files = backend.log_files()
+        else:
+            # 与 _grep_command 相同: 先搜索未压缩的文件, 再按压缩格式分组
+            extensions = list(self.COMPRESSED_GREP)
+            files = sorted(files, key=lambda path: next(
+                (index + 1 for index, ext in enumerate(extensions) if path.endswith(ext)), 0))
+        if details is not None and self.cache is not None:
+            details['file_stats'] = backend.file_stats(files)
+        max_lines = int(search_config.get('maxLines', 1000)) if limited else None
+        lines = backend.search(trace_ids, int(search_config.get('contextLines', 3)), max_lines,
+                               self._case_insensitive(), files)
+        if details is None:
+            return lines
+        details.update(command="local search {0}".format(server.get('baseDirectory', '/logs/')),
+                       source='local', files_count=len(files), exec_start=time.perf_counter())
+        return self._metered(lines, details)
+    
+    @staticmethod
+    def _metered(lines, stats):
+        """记录本地搜索结果的字节数和首末行时间, 与 _iter_channel_lines 的stats相同"""
+        for line in lines:
+            now = time.perf_counter()
+            stats.setdefault('first_byte', now)
+            stats['last_byte'] = now
+            stats['bytes'] = stats.get('bytes', 0) + len(line.encode('utf-8')) + 1
+            yield line
+    
+    def _demux_batch(self, trace_ids, lines, host=None):
+        """把批量搜索的输出按TraceId拆分
+
+        grep输出中 `--` 分隔的每一组是同一文件中连续的若干行, 组内某个TraceId的
+        匹配行及其前后 contextLines 行归属于该TraceId, 不连续的行之间同样插入 `--`,
+        与单独搜索的结果一致。每个TraceId分别保留前 maxLines 行, 所有TraceId
+        都取满后不再读取剩余的输出。
+
+        Args:
+            trace_ids: 追踪ID列表
+            lines: 批量搜索返回的日志行
+            host: 服务器名, 指定时每行以 `服务器名:` 开头
+
+        Returns:
+            {trace_id: 日志行列表}
+        """
+        search_config = self.config.get('searchOptions', {})
+        max_lines = int(search_config.get('maxLines', 1000))
+        context_lines = int(search_config.get('contextLines', 3))
+        flags = re.IGNORECASE if self._case_insensitive() else 0
+        canonical = dict((trace_id.lower() if flags else trace_id, trace_id) for trace_id in trace_ids)
+        matcher = re.compile('|'.join(re.escape(trace_id) for trace_id in
+                                      sorted(trace_ids, key=len, reverse=True)), flags)
+        
+        demuxed = OrderedDict((trace_id, []) for trace_id in trace_ids)
+        separator = "{0}:--".format(host) if host else "--"
+        prefix_length = len(host) + 1 if host else 0
+        
+        def as_context(line):
+            # 其他TraceId的匹配行在本TraceId的结果中是上下文行: grep输出 `文件名-` 而不是 `文件名:`
+            end = line.find(':', prefix_length)
+            return line[:end] + '-' + line[end + 1:] if end > 0 else line
+        
+        def flush(group):
+            hits = OrderedDict()
+            for index, line in enumerate(group):
+                for match in matcher.finditer(line):
+                    text = match.group()
+                    hits.setdefault(canonical[text.lower() if flags else text], []).append(index)
+            matched = set(index for indexes in hits.values() for index in indexes)
+            for trace_id, indexes in hits.items():
+                if len(demuxed[trace_id]) >= max_lines:
+                    continue
+                own = set(indexes)
+                selected = set()
+                for index in indexes:
+                    selected.update(range(max(0, index - context_lines),
+                                          min(len(group), index + context_lines + 1)))
+                target = demuxed[trace_id]
+                previous = None
+                for i in sorted(selected):
+                    starts_run = previous is None or i != previous + 1
+                    if context_lines > 0 and target and starts_run:
+                        target.append(separator)
+                    target.append(as_context(group[i]) if i in matched and i not in own else group[i])
+                    previous = i
+                del target[max_lines:]
+        
+        def full():
+            return all(len(target) >= max_lines for target in demuxed.values())
+        
+        group = []
+        for line in lines:
+            if line == '--':
+                flush(group)
+                group = []
+                if full():
+                    break
+                continue
+            group.append("{0}:{1}".format(host, line) if host else line)
+            # 没有上下文时不输出 `--`, 每行单独成组
+            if context_lines <= 0:
+                flush(group)
+                group = []
+                if full():
+                    break
+        flush(group)
+        return demuxed
+    
+    def _search_batch_host(self, server, trace_ids, prefix_host, since=None, until=None):
+        """在单台服务器上执行批量搜索并拆分结果"""
+        name = self._server_name(server)
+        client = self.pool.get(server)
+        if self._is_local(server):
+            lines = self._iter_local_lines(client, server, trace_ids, since, until, limited=False)
+            return name, self._demux_batch(trace_ids, lines, name if prefix_host else None)
+        files = self._select_log_files(client, server, since, until)
+        if files == []:
+            return name, OrderedDict((trace_id, []) for trace_id in trace_ids)
+        stdin, stdout, stderr = client.exec_command(self._build_batch_command(trace_ids, server, files))
+        stdin.write("\n".join(trace_ids) + "\n")
+        stdin.flush()
+        stdin.channel.shutdown_write()
+        
+        lines = self._iter_channel_lines(stdout)
+        demuxed = self._demux_batch(trace_ids, lines, name if prefix_host else None)
+        
+        if next(lines, None) is not None:
+            # 每个TraceId都已取满, 关闭通道使远程grep停止, 不再接收剩余的输出
+            stdout.channel.close()
+        else:
+            self._warn(server, self._read_stderr(stderr))
+        return name, demuxed
+    
+    def search_by_traceids(self, trace_ids, max_workers=None, since=None, until=None):
+        """批量搜索多个TraceId
+
+        所有TraceId通过一次固定字符串多模式grep完成(每台服务器只扫描一遍日志目录),
+        再在本地按TraceId拆分结果。配置了多台服务器时并行搜索。
+
+        Args:
+            trace_ids: 追踪ID列表
+            max_workers: 最大并发数
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Returns:
+            {trace_id: 搜索结果字典}
+        """
+        trace_ids = list(OrderedDict.fromkeys(t.strip() for t in trace_ids if t.strip()))
+        results = OrderedDict((trace_id, {
+            'trace_id': trace_id,
+            'output': '',
+            'lines_count': 0,
+            'hosts': OrderedDict(),
+            'timestamp': datetime.now().isoformat()
+        }) for trace_id in trace_ids)
+        if not trace_ids:
+            return results
+        
+        print("Searching {0} TraceIds on {1} hosts".format(len(trace_ids), len(self.servers)))
+        
+        multi_host = len(self.servers) > 1
+        errors = {}
+        
+        def search(server):
+            try:
+                return self._search_batch_host(server, trace_ids, multi_host, since, until)
+            except Exception as e:
+                print("Search failed ({0}): {1}".format(self._server_name(server), str(e)))
+                errors[self._server_name(server)] = str(e)
+                return self._server_name(server), None
+        
+        with ThreadPoolExecutor(max_workers=self._max_workers(max_workers)) as executor:
+            host_results = list(executor.map(search, self.servers))
+        
+        for name, demuxed in host_results:
+            if demuxed is None:
+                continue
+            for trace_id, lines in demuxed.items():
+                result = results[trace_id]
+                result['hosts'][name] = len(lines)
+                if lines:
+                    result['output'] += "\n".join(lines) + "\n"
+                    result['lines_count'] += len(lines)
+        
+        for result in results.values():
+            if errors:
+                result['errors'] = errors
+                if len(errors) == len(self.servers):
+                    result['error'] = "; ".join("{0}: {1}".format(k, v) for k, v in errors.items())
+        return results
+    
+    @staticmethod
+    def _spool_runs(lines):
+        """把行流按来源切分为时间戳递增的有序段并暂存
+
+        grep输出的行以 `[服务器名:]文件路径:` (上下文行为 `-`) 开头, 时间戳之前的前缀即行的来源,
+        同一来源的行本身基本有序。各来源的行先在内存中缓存, 合计超过 MERGE_SPOOL_BYTES 时
+        逐个来源排序后写出: 接在该来源上一段末尾之后仍然有序时追加到同一段, 否则开始新的一段。
+        小范围的时间戳抖动在缓存内排好, 段数约为来源数, 不随行数增长。
+        没有时间戳的行(异常堆栈等)沿用上一行的键和来源, 与所属的日志行保持相邻。
+
+        Args:
+            lines: 日志行迭代器 (不含grep的 `--` 分隔行)
+
+        Returns:
+            (有序段列表, 行数), 每段为已回到开头的临时文件 (超过 MERGE_RUN_BYTES 后转存到磁盘),
+            每行为 `键\t日志行`
+        """
+        runs = []
+        tails = {}
+        chunks = OrderedDict()
+        
+        def spill():
+            for source, chunk in chunks.items():
+                # 只按键排序, 时间相同的行保持原有顺序
+                chunk.sort(key=lambda item: item[0])
+                tail = tails.get(source)
+                if tail is None or chunk[0][0] < tail[1]:
+                    tail = tails[source] = [tempfile.SpooledTemporaryFile(
+                        max_size=MERGE_RUN_BYTES, mode='w+', encoding='utf-8', newline='\n'), '']
+                    runs.append(tail[0])
+                tail[0].writelines(key + '\t' + line + '\n' for key, line in chunk)
+                tail[1] = chunk[-1][0]
+            chunks.clear()
+        
+        last_key = ''
+        source = ''
+        buffered = 0
+        count = 0
+        for line in lines:
+            match = LOG_TIMESTAMP.search(line)
+            if match is not None:
+                # 只在有时间戳的行之前写出, 异常堆栈不会与所属的日志行分到两段
+                if buffered > MERGE_SPOOL_BYTES:
+                    spill()
+                    buffered = 0
+                last_key = match.group(1) + ' ' + match.group(2) + '.' + (match.group(3) or '').ljust(6, '0')
+                source = line[:match.start()]
+            chunks.setdefault(source, []).append((last_key, line))
+            buffered += len(line) + len(last_key)
+            count += 1
+        spill()
+        for run in runs:
+            run.seek(0)
+        return runs, count
+    
+    @staticmethod
+    def _iter_run(run):
+        for record in run:
+            key, line = record[:-1].split('\t', 1)
+            yield key, line
+    
+    @classmethod
+    def _merge_runs(cls, runs):
+        """堆式多路归并: 按时间戳输出所有有序段的行, 时间相同时保持服务器和文件的原有顺序
+
+        每段同时只读取一行, 内存占用与段数成正比, 与结果大小无关。
+        """
+        for key, line in heapq.merge(*[cls._iter_run(run) for run in runs], key=lambda item: item[0]):
+            yield line
+    
+    def _collect_runs(self, trace_id, max_workers=None, since=None, until=None, errors=None, host_metrics=None):
+        """并行搜索所有服务器, 各服务器的结果切分为有序段
+
+        host_metrics 为 {服务器名: 指标字典} 时记录各服务器的连接和传输指标。
+
+        Returns:
+            OrderedDict {服务器名: (有序段列表, 行数)}, 顺序与配置一致
+        """
+        errors = errors if errors is not None else {}
+        multi_host = len(self.servers) > 1
+        host_runs = OrderedDict((self._server_name(server), ([], 0)) for server in self.servers)
+        
+        def collect(server):
+            name = self._server_name(server)
+            try:
+                metrics = host_metrics.get(name) if host_metrics is not None else None
+                lines = (line for line in self._iter_host_lines(server, trace_id, since, until, metrics)
+                         if line != '--')
+                if multi_host:
+                    lines = ("{0}:{1}".format(name, line) for line in lines)
+                host_runs[name] = self._spool_runs(lines)
+            except Exception as e:
+                print("Search failed ({0}): {1}".format(name, str(e)))
+                errors[name] = str(e)
+        
+        with ThreadPoolExecutor(max_workers=self._max_workers(max_workers)) as executor:
+            list(executor.map(collect, self.servers))
+        return host_runs
+    
+    def iter_timeline(self, trace_id, max_workers=None, since=None, until=None, errors=None):
+        """按日志时间戳合并所有文件、所有服务器的搜索结果
+
+        Args:
+            trace_id: 追踪ID
+            max_workers: 最大并发数
+            since: 时间窗口起点
+            until: 时间窗口终点
+            errors: 可选字典, 写入失败的服务器及错误信息
+
+        Yields:
+            按时间排序的日志行 (多台服务器时以 `服务器名:` 开头, 不含grep的 `--` 分隔行)
+        """
+        runs = [run for host_runs, count in self._collect_runs(trace_id, max_workers, since, until, errors).values()
+                for run in host_runs]
+        try:
+            for line in self._merge_runs(runs):
+                yield line
+        finally:
+            for run in runs:
+                run.close()
+    
+    def order_timeline(self, result):
+        """把搜索结果的output按日志时间戳合并为一条时间线 (与 search_to_file(ordered=True) 的输出相同)
+
+        不含grep的 `--` 分隔行, lines_count 相应更新。守护进程用它按客户端的要求排序结果。
+
+        Args:
+            result: search 的结果字典, 原地修改
+
+        Returns:
+            result
+        """
+        if not result.get('output'):
+            return result
+        # 多台服务器合并的结果中分隔行以 `服务器名:` 开头
+        separators = set(['--'] + ["{0}:--".format(self._server_name(server)) for server in self.servers])
+        runs, count = self._spool_runs(line for line in result['output'].split('\n')[:-1] if line not in separators)
+        try:
+            lines = list(self._merge_runs(runs))
+        finally:
+            for run in runs:
+                run.close()
+        result['output'] = "\n".join(lines) + "\n" if lines else ""
+        result['lines_count'] = count
+        return result
+    
+    def search_to_file(self, trace_id, output_file, on_line=None, max_workers=None, since=None, until=None,
+                       ordered=False):
+        """流式搜索TraceId, 结果边接收边写入文件并提取业务信息
+
+        搜索结果不会整体保存在内存中, 内存占用与结果大小无关。
+        配置了多台服务器时并行搜索, 每行以 `服务器名:` 开头。
+        ordered为True时各文件、各服务器的结果按日志时间戳合并为一条时间线后写入。
+
+        Args:
+            trace_id: 追踪ID
+            output_file: 输出文件路径, 没有结果时不保留该文件
+            on_line: 每收到一行时的回调
+            max_workers: 最大并发数
+            since: 时间窗口起点
+            until: 时间窗口终点
+            ordered: 是否按时间戳排序输出
+
+        Returns:
+            搜索结果字典 (不包含output, 包含business_info)
+        """
+        started = time.perf_counter()
+        multi_host = len(self.servers) > 1
+        lock = threading.Lock()
+        extractor = self.create_extractor()
+        extract_time = [0.0]
+        host_lines = OrderedDict((self._server_name(server), 0) for server in self.servers)
+        host_metrics = OrderedDict((self._server_name(server), self._new_metrics('search_to_file', trace_id, server))
+                                   for server in self.servers)
+        errors = {}
+        merge_ms = None
+        
+        with open(output_file, 'wb') as f:
+            def emit(line):
+                f.write((line + '\n').encode('utf-8'))
+                extract_started = time.perf_counter()
+                extractor.feed(line)
+                extract_time[0] += time.perf_counter() - extract_started
+                if on_line:
+                    on_line(line)
+            
+            def consume(server):
+                name = self._server_name(server)
+                try:
+                    for line in self._iter_host_lines(server, trace_id, since, until, host_metrics[name]):
+                        if multi_host:
+                            line = "{0}:{1}".format(name, line)
+                        with lock:
+                            emit(line)
+                            host_lines[name] += 1
+                except Exception as e:
+                    print("Search failed ({0}): {1}".format(name, str(e)))
+                    errors[name] = str(e)
+            
+            if ordered:
+                runs = []
+                for name, (host_runs, count) in self._collect_runs(trace_id, max_workers, since, until, errors,
+                                                                   host_metrics).items():
+                    host_lines[name] = count
+                    runs.extend(host_runs)
+                merge_started = time.perf_counter()
+                try:
+                    for line in self._merge_runs(runs):
+                        emit(line)
+                finally:
+                    for run in runs:
+                        run.close()
+                merge_ms = self._elapsed_ms(merge_started)
+            elif multi_host:
+                with ThreadPoolExecutor(max_workers=self._max_workers(max_workers)) as executor:
+                    list(executor.map(consume, self.servers))
+            else:
+                consume(self.servers[0])
+        
+        lines_count = sum(host_lines.values())
+        if not lines_count:
+            os.remove(output_file)
+        
+        business_info = self.tag_sql_tables(extractor.result())
+        metrics = self._aggregate_metrics('search_to_file', trace_id, list(host_metrics.values()), started)
+        metrics.update(extract_ms=round(extract_time[0] * 1000, 3), matches=self._match_counts(business_info))
+        if merge_ms is not None:
+            metrics['merge_ms'] = merge_ms
+        
+        result = {
+            'trace_id': trace_id,
+            'output_file': output_file if lines_count else None,
+            'lines_count': lines_count,
+            'hosts': host_lines,
+            'business_info': business_info,
+            'metrics': metrics,
+            'timestamp': datetime.now().isoformat()
+        }
+        if errors:
+            result['errors'] = errors
+            if len(errors) == len(self.servers):
+                result['error'] = "; ".join("{0}: {1}".format(k, v) for k, v in errors.items())
+        self._emit_metrics(metrics)
+        return result
+    
+    _remote_extract_source = None
+    _remote_extract_lock = threading.Lock()
+    
+    @classmethod
+    def _extract_source(cls):
+        """远程提取脚本的源码, 每个进程只生成一次
+
+        inspect.getsource 每次都要解析整个模块, 且多个线程(守护进程、多台服务器)
+        同时解析在部分Python版本上会失败, 因此加锁生成后复用。
+        """
+        with cls._remote_extract_lock:
+            if cls._remote_extract_source is None:
+                cls._remote_extract_source = (
+                    "import json, re, sys, zlib\nfrom collections import OrderedDict\n\n{0}\n{1}".format(
+                        inspect.getsource(BusinessInfoExtractor), _REMOTE_EXTRACT_DRIVER))
+            return cls._remote_extract_source
+    
+    def _build_remote_extract_command(self, search_cmd, server):
+        """构建远程提取命令: grep的输出在日志服务器上交给同一个提取器处理
+
+        提取器的源码(BusinessInfoExtractor)随命令发送, 保证两种模式的结果一致,
+        远程只返回zlib压缩的JSON提取结果。
+        """
+        return "{0} | {1} -c {2} {3}".format(
+            search_cmd, server.get('python', 'python3'), shlex.quote(self._extract_source()),
+            shlex.quote(json.dumps(self.extraction_patterns or {})))
+    
+    def _extract_on(self, client, server, trace_id, remote=True, since=None, until=None, connect_ms=None):
+        """在单台服务器上搜索并提取业务信息
+
+        Args:
+            client: 已连接的SSH客户端
+            server: 服务器配置
+            trace_id: 追踪ID
+            remote: True时在日志服务器上提取, False时传回日志后在本地提取
+            since: 时间窗口起点
+            until: 时间窗口终点
+            connect_ms: 获取连接的耗时
+
+        Returns:
+            单台服务器的提取结果字典
+        """
+        started = time.perf_counter()
+        metrics = self._new_metrics('business_info', trace_id, server)
+        metrics['connect_ms'] = connect_ms
+        stats = {'bytes': 0}
+        files = self._select_log_files(client, server, since, until)
+        extract_time = 0.0
+        
+        if files == []:
+            business_info, lines_count = self.create_extractor().result(), 0
+        elif remote and not self._is_local(server):
+            search_cmd = self._build_search_command(trace_id, server, files)
+            stats['exec_start'] = time.perf_counter()
+            stdin, stdout, stderr = client.exec_command(self._build_remote_extract_command(search_cmd, server))
+            chunks = []
+            for chunk in iter(lambda: stdout.channel.recv(65536), b''):
+                stats.setdefault('first_byte', time.perf_counter())
+                chunks.append(chunk)
+            stats['last_byte'] = time.perf_counter()
+            payload = b''.join(chunks)
+            stats['bytes'] = len(payload)
+            error = self._read_stderr(stderr, stats)
+            try:
+                business_info = json.loads(zlib.decompress(payload).decode('utf-8'))
+            except (zlib.error, ValueError):
+                raise Exception("远程提取失败: {0}".format(error))
+            self._warn(server, error)
+            lines_count = business_info.pop('lines_count')
+        else:
+            # 本地日志目录没有传输开销, 两种模式都在本地提取
+            if self._is_local(server):
+                lines = self._iter_local_lines(client, server, [trace_id], since, until, stats)
+            else:
+                stats['exec_start'] = time.perf_counter()
+                stdin, stdout, stderr = client.exec_command(self._build_search_command(trace_id, server, files))
+                lines = self._iter_channel_lines(stdout, stats=stats)
+            extractor = self.create_extractor()
+            lines_count = 0
+            for line in lines:
+                extract_started = time.perf_counter()
+                extractor.feed(line)
+                extract_time += time.perf_counter() - extract_started
+                lines_count += 1
+            if not self._is_local(server):
+                self._warn(server, self._read_stderr(stderr, stats))
+            business_info = extractor.result()
+            metrics['extract_ms'] = round(extract_time * 1000, 3)
+        
+        self._record_transfer(metrics, stats)
+        metrics.update(lines=lines_count, files=len(files) if files is not None else stats.get('files_count'),
+                       matches=self._match_counts(business_info), total_ms=self._elapsed_ms(started))
+        return {
+            'trace_id': trace_id,
+            'host': self._server_name(server),
+            'business_info': business_info,
+            'lines_count': lines_count,
+            'bytes_received': stats['bytes'],
+            'metrics': metrics
+        }
+    
+    def search_business_info(self, trace_id, remote=True, since=None, until=None, max_workers=None):
+        """搜索TraceId并只返回提取的业务信息
+
+        远程模式在日志服务器上完成分类, 只传回压缩后的SQL、异常、接口调用、
+        用户标识等结构化信息, 不再传回所有匹配行及其上下文。两种模式结果相同。
+
+        Args:
+            trace_id: 追踪ID
+            remote: 是否在日志服务器上提取 (需要服务器上有python3, 可用 `python` 字段指定)
+            since: 时间窗口起点
+            until: 时间窗口终点
+            max_workers: 最大并发数
+
+        Returns:
+            结果字典: business_info为合并后的提取结果, counts为各类别数量,
+            bytes_received为通过SSH接收的字节数
+        """
+        started = time.perf_counter()
+        errors = {}
+        
+        def extract(server):
+            try:
+                connect_started = time.perf_counter()
+                client = self.pool.get(server)
+                return self._extract_on(client, server, trace_id, remote, since, until,
+                                        self._elapsed_ms(connect_started))
+            except Exception as e:
+                print("Extraction failed ({0}): {1}".format(self._server_name(server), str(e)))
+                errors[self._server_name(server)] = str(e)
+                return None
+        
+        with ThreadPoolExecutor(max_workers=self._max_workers(max_workers)) as executor:
+            host_results = [r for r in executor.map(extract, self.servers) if r is not None]
+        
+        business_info = self.tag_sql_tables(self._merge_business_info([r['business_info'] for r in host_results]))
+        result = {
+            'trace_id': trace_id,
+            'mode': 'remote' if remote else 'local',
+            'hosts': OrderedDict((r['host'], r) for r in host_results),
+            'business_info': business_info,
+            'counts': self._match_counts(business_info),
+            'lines_count': sum(r['lines_count'] for r in host_results),
+            'bytes_received': sum(r['bytes_received'] for r in host_results),
+            'timestamp': datetime.now().isoformat()
+        }
+        metrics = self._aggregate_metrics('business_info', trace_id, [r['metrics'] for r in host_results], started)
+        extract_times = [r['metrics']['extract_ms'] for r in host_results if r['metrics']['extract_ms'] is not None]
+        metrics.update(extract_ms=sum(extract_times) if extract_times else None, matches=result['counts'])
+        result['metrics'] = metrics
+        if errors:
+            result['errors'] = errors
+            if len(errors) == len(self.servers):
+                result['error'] = "; ".join("{0}: {1}".format(k, v) for k, v in errors.items())
+        self._emit_metrics(metrics)
+        return result
+    
+    @staticmethod
+    def _merge_business_info(infos):
+        """合并多台服务器的提取结果"""
+        if len(infos) == 1:
+            return infos[0]
+        merged = BusinessInfoExtractor().result()
+        for info in infos:
+            for key in ('sql_queries', 'exceptions', 'api_calls', 'user_ids', 'trace_ids'):
+                merged[key].extend(info.get(key, []))
+            for field, values in info.get('user_params', {}).items():
+                merged['user_params'].setdefault(field, []).extend(values)
+        for key in ('user_ids', 'trace_ids'):
+            merged[key] = list(OrderedDict.fromkeys(merged[key]))
+        for field, values in merged['user_params'].items():
+            merged['user_params'][field] = list(OrderedDict.fromkeys(values))
+        return merged
+    
+    def create_extractor(self):
+        """创建使用当前提取模式的业务信息提取器"""
+        return BusinessInfoExtractor.from_config(self.extraction_patterns)
+    
+    def extract_business_info(self, log_content):
+        """从日志内容中提取业务信息
+        
+        Args:
+            log_content: 日志内容
+            
+        Returns:
+            提取的业务信息 (有项目配置时包含SQL行涉及的表和Service, 见 tag_sql_tables)
+        """
+        extractor = self.create_extractor()
+        extractor.feed_text(log_content)
+        return self.tag_sql_tables(extractor.result())
+    
+    def tag_sql_tables(self, business_info):
+        """为提取结果中的SQL行标注涉及的表和使用这些表的Service (见 TableMatcher.annotate)
+
+        匹配器在首次调用时根据 ProjectAnalyzer 生成的 repositoryMapping/serviceMapping 构建一次,
+        没有项目配置时不做标注。
+
+        Args:
+            business_info: 提取结果, 原地修改
+
+        Returns:
+            business_info
+        """
+        if self._table_matcher is None:
+            self._table_matcher = TableMatcher.load(self._auto_config_path(self.config_path)) or False
+        if self._table_matcher:
+            self._table_matcher.annotate(business_info)
+        return business_info
+    
+    def disconnect(self):
+        """断开SSH连接"""
+        if self.ssh:
+            self.ssh = None
+            print("SSH connection closed")
+        self.pool.close_all()
+    
+    def __enter__(self):
+        """上下文管理器入口"""
+        self.connect()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """上下文管理器出口"""
+        self.disconnect()
+
+
+def _search_single(searcher, trace_id, since=None, until=None, ordered=False):
+    """搜索单个TraceId并输出结果"""
+    print("Searching TraceId: {0}".format(trace_id))
+    
+    # 流式搜索: 日志边接收边写入文件, 同时提取业务信息
+    output_file = "logs_{0}_{1}.txt".format(trace_id, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    preview = []
+    
+    def show_preview(line):
+        # 显示前5行日志内容作为预览
+        if len(preview) < 5:
+            if not preview:
+                print("\nLog {0} preview (first 5 lines):".format("timeline" if ordered else "content"))
+            preview.append(line)
+            print("  {0}: {1}".format(len(preview), line[:150]))
+    
+    result = searcher.search_to_file(trace_id, output_file, on_line=show_preview, since=since, until=until,
+                                     ordered=ordered)
+    
+    if 'error' in result:
+        print("Search failed: {0}".format(result['error']))
+        return
+    
+    if len(searcher.servers) > 1:
+        for host, lines_count in result['hosts'].items():
+            if host in result.get('errors', {}):
+                print("  {0}: failed ({1})".format(host, result['errors'][host]))
+            else:
+                print("  {0}: {1} lines".format(host, lines_count))
+    
+    print("Search result: Found {0} lines of logs".format(result['lines_count']))
+    
+    if result['output_file']:
+        print("Complete log saved to: {0}".format(output_file))
+        _print_business_info(result['business_info'])
+    else:
+        print("No relevant logs found")
+
+
+def _print_metrics(metrics):
+    """--metrics 使用的指标回调"""
+    print("\nSearch metrics:")
+    print(json.dumps(metrics, ensure_ascii=False, indent=2))
+
+
+def _print_business_info(business_info):
+    print("\nExtracted business information:")
+    print("  User IDs: {0}".format(business_info['user_ids']))
+    print("  SQL queries: {0}".format(len(business_info['sql_queries'])))
+    print("  Exceptions: {0}".format(len(business_info['exceptions'])))
+    print("  API calls: {0}".format(len(business_info['api_calls'])))
+    for table, entry in business_info.get('tables', {}).items():
+        print("  Table {0}: {1} SQL lines, services: {2}".format(
+            table, entry['queries'], ", ".join(entry['services']) or '-'))
+
+
+def _search_via_daemon(searcher, client, trace_id, since=None, until=None, ordered=False):
+    """通过守护进程搜索单个TraceId (复用守护进程中已建立的SSH连接)"""
+    print("Searching TraceId: {0} (via daemon)".format(trace_id))
+    
+    result = client.search(trace_id, _format_time(since), _format_time(until), ordered)
+    if 'error' in result:
+        print("Search failed: {0}".format(result['error']))
+        return
+    # 指标已由守护进程写入metricsLog, 这里只通知本进程注册的回调
+    searcher.notify_metrics_hooks(result.get('metrics'))
+    
+    print("Search result: Found {0} lines of logs".format(result['lines_count']))
+    if not result['output']:
+        print("No relevant logs found")
+        return
+    
+    output_file = "logs_{0}_{1}.txt".format(trace_id, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    with open(output_file, 'wb') as f:
+        f.write(result['output'].encode('utf-8'))
+    print("Complete log saved to: {0}".format(output_file))
+    
+    print("\nLog {0} preview (first 5 lines):".format("timeline" if ordered else "content"))
+    for i, line in enumerate(result['output'].splitlines()[:5]):
+        print("  {0}: {1}".format(i + 1, line[:150]))
+    
+    _print_business_info(searcher.extract_business_info(result['output']))
+
+
+def _search_remote_extract(searcher, trace_id, since=None, until=None, client=None):
+    """在日志服务器上提取业务信息, 只保存结构化结果 (client为守护进程客户端时由守护进程执行)"""
+    print("Searching TraceId: {0} (remote extraction{1})".format(trace_id, ", via daemon" if client else ""))
+    
+    if client is not None:
+        result = client.search_business_info(trace_id, True, _format_time(since), _format_time(until))
+    else:
+        result = searcher.search_business_info(trace_id, remote=True, since=since, until=until)
+    if 'error' in result:
+        print("Search failed: {0}".format(result['error']))
+        return
+    if client is not None:
+        searcher.notify_metrics_hooks(result.get('metrics'))
+    
+    print("Search result: {0} lines classified on the log server, {1} bytes transferred".format(
+        result['lines_count'], result['bytes_received']))
+    if not result['lines_count']:
+        print("No relevant logs found")
+        return
+    
+    output_file = "business_{0}_{1}.json".format(trace_id, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    with open(output_file, 'w') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print("Business information saved to: {0}".format(output_file))
+    _print_business_info(result['business_info'])
+
+
+def _search_batch(searcher, ids_file, since=None, until=None, client=None):
+    """批量搜索文件中的TraceId (每行一个), 每个TraceId的日志分别保存"""
+    with open(ids_file, 'r') as f:
+        trace_ids = [line.strip() for line in f if line.strip()]
+    
+    if client is not None:
+        results = client.search_batch(trace_ids, _format_time(since), _format_time(until))
+    else:
+        results = searcher.search_by_traceids(trace_ids, since=since, until=until)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
+    found = 0
+    for trace_id, result in results.items():
+        if 'error' in result:
+            print("Search failed: {0}".format(result['error']))
+            return
+        if not result['output']:
+            print("  {0}: no relevant logs found".format(trace_id))
+            continue
+        
+        found += 1
+        output_file = "logs_{0}_{1}.txt".format(trace_id, timestamp)
+        with open(output_file, 'wb') as f:
+            f.write(result['output'].encode('utf-8'))
+        
+        business_info = searcher.extract_business_info(result['output'])
+        print("  {0}: {1} lines -> {2} (SQL {3}, exceptions {4}, user IDs {5})".format(
+            trace_id, result['lines_count'], output_file, len(business_info['sql_queries']),
+            len(business_info['exceptions']), business_info['user_ids']))
+    
+    print("Search result: {0} of {1} TraceIds found".format(found, len(results)))
+
+
+def _follow(searcher, trace_id):
+    """实时输出TraceId的新日志行, 直到按下Ctrl+C"""
+    print("Following TraceId: {0} (Ctrl+C to stop)".format(trace_id))
+    try:
+        for line in searcher.follow(trace_id):
+            print(line)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+
+
+def _parse_time(value):
+    """解析命令行中的时间参数"""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError("invalid time: {0}".format(value))
+
+
+def _format_time(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+
+def main():
+    """主函数 - 命令行使用示例"""
+    parser = argparse.ArgumentParser(description="Search logs by TraceId")
+    parser.add_argument('trace_id', nargs='?', help="TraceId to search")
+    parser.add_argument('--ids-file', help="file with one TraceId per line, resolved in a single remote scan")
+    parser.add_argument('--since', type=_parse_time, help="only search log files overlapping this start time")
+    parser.add_argument('--until', type=_parse_time, help="only search log files overlapping this end time")
+    parser.add_argument('--daemon', action='store_true', help="run as a daemon that keeps SSH connections warm")
+    parser.add_argument('--no-daemon', action='store_true', help="do not use a running daemon")
+    parser.add_argument('--socket', help="daemon unix socket path")
+    parser.add_argument('--no-cache', action='store_true', help="bypass the local result cache")
+    parser.add_argument('--follow', action='store_true', help="stream new log lines for the TraceId as they are written")
+    parser.add_argument('--ordered', action='store_true',
+                        help="merge lines from all files and hosts into one timeline (written once the search ends)")
+    parser.add_argument('--metrics', action='store_true', help="print per-phase timings and counters")
+    parser.add_argument('--remote-extract', action='store_true',
+                        help="classify log lines on the log host and transfer only the business info")
+    args = parser.parse_args()
+    
+    if args.daemon:
+        SearchDaemon(LogSearcher(), args.socket).serve_forever()
+        return
+    
+    if not args.trace_id and not args.ids_file:
+        print("Usage: python log_search.py <trace_id> | --ids-file <ids.txt>")
+        sys.exit(1)
+    
+    try:
+        searcher = LogSearcher()
+        if args.no_cache:
+            searcher.cache = None
+        if args.metrics:
+            searcher.add_metrics_hook(_print_metrics)
+        
+        # 实时跟踪需要常驻通道, 不经过守护进程
+        if args.follow and args.trace_id:
+            _follow(searcher, args.trace_id)
+            searcher.disconnect()
+            return
+        
+        # 守护进程在运行时复用其SSH连接 (守护进程使用自己的缓存设置)
+        client = None if args.no_daemon or args.no_cache else DaemonClient(args.socket)
+        if client is not None and client.available():
+            if args.ids_file:
+                _search_batch(searcher, args.ids_file, args.since, args.until, client)
+            elif args.remote_extract:
+                _search_remote_extract(searcher, args.trace_id, args.since, args.until, client)
+            else:
+                _search_via_daemon(searcher, client, args.trace_id, args.since, args.until, args.ordered)
+            return
+        
+        if args.remote_extract and args.trace_id:
+            _search_remote_extract(searcher, args.trace_id, args.since, args.until)
+            searcher.disconnect()
+            return
+        
+        # 配置了多台服务器时并行搜索, 各服务器的连接由连接池按需建立
+        if len(searcher.servers) > 1 or searcher.connect():
+            if args.ids_file:
+                _search_batch(searcher, args.ids_file, args.since, args.until)
             else:
-                print("No relevant logs found")
+                _search_single(searcher, args.trace_id, args.since, args.until, args.ordered)
             
             searcher.disconnect()
     
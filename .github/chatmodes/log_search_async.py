@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - 日志搜索异步接口
+
+多个搜索、多台服务器共用一个事件循环: SSH握手和打开通道(各一次往返)交给线程池,
+远程命令的输出通过 `loop.add_reader(channel.fileno())` 在数据到达时读取, 等待输出期间
+不占用线程。命令构建、结果格式和缓存与 LogSearcher 相同:
+
+    searcher = AsyncLogSearcher(LogSearcher(config_path))
+    result = await searcher.search("<trace_id>")
+"""
+import argparse
+import asyncio
+import codecs
+import json
+import time
+
+from log_search import LogSearcher
+
+
+class AsyncLogSearcher(object):
+    """日志搜索器的asyncio接口, 共享LogSearcher的配置、连接池和缓存"""
+
+    def __init__(self, searcher=None, config_path=".github/chatmodes/bugfix.config.json", executor=None):
+        """初始化异步搜索器
+
+        Args:
+            searcher: LogSearcher实例, 默认按config_path创建
+            config_path: 配置文件路径
+            executor: 执行SSH握手等阻塞调用的线程池, 默认使用事件循环的默认线程池
+        """
+        self.searcher = searcher or LogSearcher(config_path)
+        self.executor = executor
+
+    def _run_blocking(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self.executor, func, *args)
+
+    async def connect(self, server=None):
+        """连接日志服务器 (已有活动连接时直接复用)
+
+        Args:
+            server: 服务器配置, 默认为第一台服务器
+
+        Returns:
+            已连接的SSH客户端
+        """
+        return await self._run_blocking(self.searcher.pool.get, server or self.searcher.servers[0])
+
+    async def _exec(self, client, command):
+        stdin, stdout, stderr = await self._run_blocking(client.exec_command, command)
+        return stdout, stderr
+
+    @staticmethod
+    async def _recv(channel, chunk_size=65536):
+        """等待通道可读后读取一块数据, 读到末尾时返回空字节串"""
+        loop = asyncio.get_event_loop()
+        while not (channel.recv_ready() or channel.eof_received or channel.closed):
+            readable = loop.create_future()
+            fd = channel.fileno()
+            loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(fd)
+        return channel.recv(chunk_size)
+
+    async def _iter_channel_lines(self, stdout, stats=None):
+        """逐行返回远程命令的输出, 解码方式和stats与 LogSearcher._iter_channel_lines 相同"""
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        pending = ''
+        while True:
+            chunk = await self._recv(stdout.channel)
+            if not chunk:
+                break
+            if stats is not None:
+                now = time.perf_counter()
+                stats.setdefault('first_byte', now)
+                stats['last_byte'] = now
+                stats['bytes'] = stats.get('bytes', 0) + len(chunk)
+            lines = (pending + decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            for line in lines:
+                yield line.rstrip('\r')
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending.rstrip('\r')
+
+    async def _read_lines(self, client, command):
+        stdout, stderr = await self._exec(client, command)
+        return [line async for line in self._iter_channel_lines(stdout)]
+
+    async def _select_log_files(self, client, server, since=None, until=None):
+        if since is None and until is None:
+            return None
+        listing = await self._read_lines(client, self.searcher._list_command(server))
+        return self.searcher._files_in_window(listing, since, until)
+
+    async def _cache_lookup(self, client, server, trace_id, since=None, until=None):
+        """与 LogSearcher._cache_lookup 相同: 有缓存条目时一次 `stat` 校验, 当前日志有新追加的内容时只搜索追加的部分
+
+        缓存的读写是磁盘I/O, 在线程池中执行。
+        """
+        searcher = self.searcher
+        if searcher.cache is None:
+            return None, None
+        cache_key = searcher._cache_key(server, trace_id, since, until)
+        cached = await self._run_blocking(searcher.cache.get, cache_key)
+        if cached is None:
+            return cache_key, None
+        result, files = cached
+        local = searcher._is_local(server)
+        if local:
+            stats = await self._run_blocking(searcher._validation_stats, client, server, files)
+        else:
+            stats = searcher._parse_file_stats(
+                await self._read_lines(client, searcher._validation_command(server, files)))
+        grown = searcher._appended_files(files, stats, since, until)
+        if grown is None:
+            await self._run_blocking(searcher.cache.invalidate, cache_key)
+            return cache_key, None
+        lines = []
+        if grown and local:
+            lines = await self._run_blocking(
+                lambda: list(searcher._iter_appended_lines(client, server, trace_id, grown)))
+        elif grown:
+            lines = await self._read_lines(client, searcher._append_command(trace_id, server, grown))
+        return cache_key, await self._run_blocking(searcher._refresh_cached, cache_key, result, files, stats,
+                                                   grown, lines)
+
+    async def _iter_lines_on(self, client, server, trace_id, since=None, until=None, details=None):
+        """在指定连接上搜索TraceId并逐行返回 (索引优先, 未命中时回退到grep)"""
+        searcher = self.searcher
+        details = details if details is not None else {}
+
+        if searcher._is_local(server):
+            # 本地日志目录由进程池搜索, 在线程池中等待结果
+            lines = await self._run_blocking(
+                lambda: list(searcher._iter_lines_on(client, server, trace_id, since, until, details)))
+            for line in lines:
+                yield line
+            return
+
+        index_cmd = searcher._index_step(trace_id, server, since, until, details)
+        if index_cmd is not None:
+            stdout, stderr = await self._exec(client, index_cmd)
+            count = 0
+            async for line in self._iter_channel_lines(stdout, details):
+                count += 1
+                yield line
+            if count or await self._run_blocking(stdout.channel.recv_exit_status) == 0:
+                await self._run_blocking(searcher._read_stderr, stderr, details)
+                return
+
+        files = await self._select_log_files(client, server, since, until)
+        search_cmd = searcher._grep_step(trace_id, server, files, details)
+        if search_cmd is None:
+            return
+
+        stdout, stderr = await self._exec(client, search_cmd)
+        async for line in self._iter_channel_lines(stdout, details):
+            yield line
+        # stdout结束后stderr中只剩已到达的数据, 在线程池中读取
+        searcher._warn(server, await self._run_blocking(searcher._read_stderr, stderr, details))
+
+    async def iter_search_lines(self, trace_id, server=None, since=None, until=None):
+        """流式搜索TraceId, 边接收边返回日志行
+
+        Args:
+            trace_id: 追踪ID
+            server: 服务器配置, 默认为第一台服务器
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Yields:
+            日志行
+        """
+        server = server or self.searcher.servers[0]
+        client = await self.connect(server)
+        async for line in self._iter_lines_on(client, server, trace_id, since, until):
+            yield line
+
+    async def search_by_traceid(self, trace_id, server=None, since=None, until=None):
+        """在单台服务器上搜索TraceId, 返回值与 LogSearcher.search_by_traceid 相同
+
+        Args:
+            trace_id: 追踪ID
+            server: 服务器配置, 默认为第一台服务器
+            since: 时间窗口起点
+            until: 时间窗口终点
+
+        Returns:
+            搜索结果字典, `metrics` 与同步接口相同 (不调用指标回调, 由 search 统一调用)
+        """
+        searcher = self.searcher
+        server = server or searcher.servers[0]
+        started = time.perf_counter()
+        metrics = searcher._new_metrics('search', trace_id, server)
+        try:
+            client = await self.connect(server)
+            metrics['connect_ms'] = searcher._elapsed_ms(started)
+
+            cache_key, result = await self._cache_lookup(client, server, trace_id, since, until)
+            if result is not None:
+                return searcher._with_metrics(result, metrics, started)
+
+            details = {}
+            lines = [line async for line in self._iter_lines_on(client, server, trace_id, since, until, details)]
+            result = searcher._search_result(trace_id, server, lines, details)
+            if cache_key is not None:
+                await self._run_blocking(searcher._cache_store, cache_key, result,
+                                         searcher._cache_files(lines, details))
+            return searcher._with_metrics(result, metrics, started, details)
+
+        except Exception as e:
+            print("Search failed ({0}): {1}".format(searcher._server_name(server), str(e)))
+            return searcher._error_result(trace_id, server, e)
+
+    async def search(self, trace_id, since=None, until=None):
+        """搜索TraceId: 多台服务器时并发搜索并合并, 返回值与 LogSearcher.search 相同"""
+        searcher = self.searcher
+        if len(searcher.servers) == 1:
+            result = await self.search_by_traceid(trace_id, searcher.servers[0], since, until)
+        else:
+            started = time.perf_counter()
+            host_results = await asyncio.gather(*[self.search_by_traceid(trace_id, server, since, until)
+                                                  for server in searcher.servers])
+            result = searcher._merge_host_results(trace_id, host_results)
+            result['metrics'] = searcher._aggregate_metrics(
+                'search', trace_id, [r['metrics'] for r in host_results if 'metrics' in r], started)
+        if 'metrics' in result:
+            await self._run_blocking(searcher._emit_metrics, result['metrics'])
+        return result
+
+    def disconnect(self):
+        """关闭所有连接"""
+        self.searcher.disconnect()
+
+
+def run(coroutine):
+    """在新的事件循环中运行协程 (供同步代码调用)"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def main():
+    """主函数 - 并发搜索多个TraceId"""
+    parser = argparse.ArgumentParser(description="Search logs for several TraceIds concurrently")
+    parser.add_argument('trace_ids', nargs='+')
+    parser.add_argument('--config', default=".github/chatmodes/bugfix.config.json")
+    args = parser.parse_args()
+
+    async def search_all():
+        searcher = AsyncLogSearcher(config_path=args.config)
+        try:
+            return await asyncio.gather(*[searcher.search(trace_id) for trace_id in args.trace_ids])
+        finally:
+            searcher.disconnect()
+
+    started = time.perf_counter()
+    for result in run(search_all()):
+        print(json.dumps(dict((k, v) for k, v in result.items() if k != 'output'), ensure_ascii=False, indent=2))
+    print("Finished in {0:.3f}s".format(time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,656 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - 日志搜索性能测试脚本
+
+生成可配置大小和命中密度的模拟日志, 测试提取、SQL行的表标注、main()的结果处理和本地日志目录的
+端到端搜索, 结果可保存为JSON并与之前的结果对比:
+
+    python log_search_bench.py --output bench.json
+    python log_search_bench.py --output bench-new.json --compare bench.json
+"""
+import argparse
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import os
+import platform
+import random
+import re
+import select
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import log_search
+from log_search import BusinessInfoExtractor, LogSearcher
+from log_search_async import AsyncLogSearcher, run
+from log_tables import TableMatcher
+
+# 模拟日志中要搜索的TraceId
+BENCH_TRACE_ID = "5f0c9e2d7b3a41c6a8e4d2b1c0f9e8d7"
+
+
+def legacy_extract_business_info(log_content):
+    """逐行多次正则匹配的旧版提取实现, 作为性能对比基准"""
+    business_info = {
+        'sql_queries': [],
+        'exceptions': [],
+        'api_calls': [],
+        'user_params': {},
+        'user_ids': []
+    }
+
+    for line in log_content.splitlines():
+        if re.search(r'(SELECT|INSERT|UPDATE|DELETE)', line, re.IGNORECASE):
+            business_info['sql_queries'].append(line.strip())
+        if re.search(r'(Exception|Error|ERROR)', line, re.IGNORECASE):
+            business_info['exceptions'].append(line.strip())
+        if re.search(r'(http://|https://|API|api)', line, re.IGNORECASE):
+            business_info['api_calls'].append(line.strip())
+        user_ids = re.findall(r'custNo[=:]?\s*(\d+)', line, re.IGNORECASE)
+        business_info['user_ids'].extend(user_ids)
+
+    business_info['user_ids'] = list(set(business_info['user_ids']))
+    return business_info
+
+
+def generate_log_text(size_bytes, seed=42, trace_id=None, hit_density=0.0, start=None):
+    """生成指定大小的模拟日志文本
+
+    Args:
+        size_bytes: 目标字节数
+        seed: 随机种子
+        trace_id: 要注入的TraceId
+        hit_density: 包含trace_id的行的比例 (0~1)
+        start: 第一行的时间, 之后的时间戳递增
+
+    Returns:
+        日志文本
+    """
+    rnd = random.Random(seed)
+    moment = start or datetime(2024, 5, 1, 10, 0, 0)
+    templates = [
+        "{ts} INFO  [http-nio-8080-exec-{n}] c.e.o.OrderController - traceId={tid} handling request",
+        "{ts} DEBUG [http-nio-8080-exec-{n}] c.e.o.TpDealRepository - SELECT id, amount FROM tp_deal WHERE cust_no = {cust}",
+        "{ts} INFO  [http-nio-8080-exec-{n}] c.e.o.PaymentService - traceId={tid} custNo={cust} amount={n}.00",
+        "{ts} ERROR [http-nio-8080-exec-{n}] c.e.o.PaymentService - traceId={tid} payment failed",
+        "java.lang.IllegalStateException: balance not enough for custNo: {cust}",
+        "{ts} INFO  [http-nio-8080-exec-{n}] c.e.o.GatewayClient - call https://gateway.example.com/api/v1/pay cost={n}ms",
+        "{ts} INFO  [scheduler-{n}] c.e.o.HoldingsJob - refreshed {n} holdings",
+        "{ts} WARN  [scheduler-{n}] c.e.o.HoldingsJob - slow batch {n}",
+    ]
+    weights = [20, 10, 10, 2, 2, 6, 30, 20]
+    traced = [template for template in templates if '{tid}' in template]
+
+    lines = []
+    total = 0
+    while total < size_bytes:
+        moment += timedelta(microseconds=rnd.randint(0, 20000))
+        hit = trace_id is not None and rnd.random() < hit_density
+        template = rnd.choice(traced) if hit else rnd.choices(templates, weights)[0]
+        line = template.format(
+            ts=moment.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            n=rnd.randint(1, 200),
+            tid=trace_id if hit else "%032x" % rnd.getrandbits(128),
+            cust=rnd.randint(10000000, 10000100))
+        lines.append(line)
+        total += len(line) + 1
+    return "\n".join(lines) + "\n"
+
+
+def generate_log_dir(directory, size_mb, trace_id=BENCH_TRACE_ID, hit_density=0.001,
+                     names=('app', 'sql', 'error'), rotated=1, seed=42):
+    """生成模拟日志目录: 每个名称一个 .log 文件, 以及gzip压缩的轮转历史日志
+
+    Args:
+        directory: 输出目录
+        size_mb: 所有文件合计的大小 (MB, 未压缩)
+        trace_id: 要注入的TraceId
+        hit_density: 包含trace_id的行的比例
+        names: 日志文件名
+        rotated: 每个日志文件的压缩历史文件数
+        seed: 随机种子
+
+    Returns:
+        生成的文件路径列表
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    per_file = int(size_mb * 1024 * 1024 / (len(names) * (rotated + 1)))
+    paths = []
+    for index, name in enumerate(names):
+        for age in range(rotated, -1, -1):
+            day = datetime(2024, 5, 10) - timedelta(days=age)
+            text = generate_log_text(per_file, seed + index * 100 + age, trace_id, hit_density, day)
+            if age:
+                path = os.path.join(directory, "{0}.log.{1}.gz".format(name, day.strftime('%Y-%m-%d')))
+                with gzip.open(path, 'wb') as f:
+                    f.write(text.encode('utf-8'))
+                stamp = time.mktime((day + timedelta(hours=23)).timetuple())
+                os.utime(path, (stamp, stamp))
+            else:
+                path = os.path.join(directory, "{0}.log".format(name))
+                with open(path, 'w') as f:
+                    f.write(text)
+            paths.append(path)
+    return paths
+
+
+def _best_of(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _record(name, seconds, **metrics):
+    """一条基准测试结果"""
+    record = {'name': name, 'seconds': round(seconds, 6)}
+    record.update(metrics)
+    return record
+
+
+def bench_extraction(size_mb=8, repeat=3):
+    """对比旧版逐行提取和单次扫描提取器的耗时
+
+    Args:
+        size_mb: 模拟日志大小 (MB)
+        repeat: 每种实现的重复次数, 取最好成绩
+
+    Returns:
+        结果记录列表
+    """
+    text = generate_log_text(int(size_mb * 1024 * 1024))
+
+    def run_extractor():
+        extractor = BusinessInfoExtractor()
+        extractor.feed_text(text)
+        return extractor.result()
+
+    legacy_time, legacy = _best_of(lambda: legacy_extract_business_info(text), repeat)
+    engine_time, engine = _best_of(run_extractor, repeat)
+
+    for key in ('sql_queries', 'exceptions', 'api_calls'):
+        if legacy[key] != engine[key]:
+            raise AssertionError("Result mismatch in {0}".format(key))
+    if set(legacy['user_ids']) != set(engine['user_ids']):
+        raise AssertionError("Result mismatch in user_ids")
+
+    print("extract_business_info on {0:.1f} MB ({1} lines):".format(size_mb, text.count("\n")))
+    print("  legacy:    {0:.3f}s ({1:.1f} MB/s)".format(legacy_time, size_mb / legacy_time))
+    print("  extractor: {0:.3f}s ({1:.1f} MB/s)".format(engine_time, size_mb / engine_time))
+    print("  speedup:   {0:.1f}x".format(legacy_time / engine_time))
+    return [_record('extract.legacy', legacy_time, mb_per_s=round(size_mb / legacy_time, 2)),
+            _record('extract.extractor', engine_time, mb_per_s=round(size_mb / engine_time, 2))]
+
+
+def generate_table_mapping(tables, seed=42):
+    """生成模拟的 repositoryMapping / serviceMapping (每个Service使用1到3张表)"""
+    rng = random.Random(seed)
+    repository_mapping = OrderedDict()
+    for i in range(tables):
+        repository_mapping["Table{0}Repository".format(i)] = "t_{0}_{1}".format(
+            rng.choice(('order', 'pay', 'trade', 'fund', 'cust', 'acct')), i)
+    names = list(repository_mapping.values())
+    service_mapping = OrderedDict()
+    for i in range(max(1, tables // 2)):
+        service_mapping["Biz{0}Service".format(i)] = {'tables': rng.sample(names, min(len(names), rng.randint(1, 3)))}
+    return repository_mapping, service_mapping
+
+
+def generate_sql_lines(tables, count, seed=42):
+    """生成SQL日志行: MyBatis的Preparing语句(重复出现)和带参数值的语句, 少量行不涉及已知表"""
+    rng = random.Random(seed)
+    templates = [
+        "==>  Preparing: SELECT id, cust_no, status FROM {0} WHERE cust_no = ? AND status = ? ORDER BY id DESC",
+        "==>  Preparing: UPDATE {0} SET status = ?, update_time = now() WHERE id = ?",
+        "==>  Preparing: SELECT a.* FROM {0} a LEFT JOIN {1} b ON a.id = b.ref_id WHERE b.cust_no = ?",
+        "execute sql: insert into {0} (id, cust_no, amount) values ({2}, 'C{2}', {3}.50)",
+        "execute sql: delete from db.{0} where id = {2}",
+        "select count(*) from t_not_mapped where id = {2}",
+    ]
+    lines = []
+    for _ in range(count):
+        lines.append("2024-05-01 10:00:00.000 [main] DEBUG c.e.Mapper - " + rng.choice(templates).format(
+            rng.choice(tables), rng.choice(tables), rng.randint(1, 10 ** 9), rng.randint(1, 999)))
+    return lines
+
+
+def naive_tag_sql(lines, repository_mapping, service_mapping):
+    """参照实现: 每行SQL对每张表做一次正则匹配"""
+    patterns = [(table, re.compile(r'(?<![\w$]){0}(?![\w$])'.format(re.escape(table)), re.IGNORECASE))
+                for table in OrderedDict.fromkeys(repository_mapping.values())]
+    owners = {}
+    for service, info in service_mapping.items():
+        for table in info['tables']:
+            owners.setdefault(table, []).append(service)
+    tags = []
+    for line in lines:
+        tables = [table for table, pattern in patterns if pattern.search(line)]
+        services = []
+        for table in tables:
+            services.extend(service for service in owners.get(table, []) if service not in services)
+        tags.append({'tables': tables, 'services': services})
+    return tags
+
+
+def bench_table_matcher(tables=2000, lines=200000, naive_lines=1000, repeat=3):
+    """对比逐表正则匹配和 TableMatcher 标注SQL行的耗时
+
+    逐表匹配的耗时与表数和行数的乘积成正比, 只在前 naive_lines 行上测试, 按每秒行数比较。
+
+    Args:
+        tables: 已知表数
+        lines: SQL行数
+        naive_lines: 逐表匹配测试的行数
+        repeat: 每种实现的重复次数, 取最好成绩
+
+    Returns:
+        结果记录列表
+    """
+    repository_mapping, service_mapping = generate_table_mapping(tables)
+    sql_lines = generate_sql_lines(list(repository_mapping.values()), lines)
+    sample = sql_lines[:naive_lines]
+
+    build_time, matcher = _best_of(lambda: TableMatcher(repository_mapping, service_mapping), repeat)
+    matcher_time, tags = _best_of(lambda: matcher.tag(sql_lines), repeat)
+    naive_time, naive_tags = _best_of(lambda: naive_tag_sql(sample, repository_mapping, service_mapping), 1)
+
+    for tag, naive in zip(tags, naive_tags):
+        if set(tag['tables']) != set(naive['tables']) or set(tag['services']) != set(naive['services']):
+            raise AssertionError("Result mismatch: {0} != {1}".format(tag, naive))
+
+    matcher_rate = lines / matcher_time
+    naive_rate = len(sample) / naive_time
+    print("SQL table tagging with {0} tables:".format(tables))
+    print("  naive:   {0:.3f}s for {1} lines ({2:.0f} lines/s)".format(naive_time, len(sample), naive_rate))
+    print("  matcher: {0:.3f}s for {1} lines ({2:.0f} lines/s, built in {3:.3f}s)".format(
+        matcher_time, lines, matcher_rate, build_time))
+    print("  speedup: {0:.0f}x per line".format(matcher_rate / naive_rate))
+    return [_record('tables.naive', naive_time, lines=len(sample), lines_per_s=round(naive_rate, 1)),
+            _record('tables.matcher', matcher_time, lines=lines, lines_per_s=round(matcher_rate, 1)),
+            _record('tables.matcher_build', build_time, tables=tables)]
+
+
+def _local_searcher(directory, context_lines=3, max_lines=100000):
+    """创建搜索本地日志目录的LogSearcher (不需要SSH)"""
+    fd, config_path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'logServer': {'type': 'local', 'name': 'bench', 'baseDirectory': directory.rstrip('/') + '/'},
+                   'searchOptions': {'cache': 'false', 'maxLines': max_lines, 'contextLines': context_lines}}, f)
+    try:
+        return LogSearcher(config_path)
+    finally:
+        os.remove(config_path)
+
+
+def bench_local_search(directory, size_mb, repeat=3):
+    """本地日志目录的端到端搜索: 全部 *.log 文件, 以及包含压缩历史日志的时间窗口搜索
+
+    Returns:
+        结果记录列表
+    """
+    searcher = _local_searcher(directory)
+    window = (datetime(2024, 5, 1), datetime(2024, 5, 11))
+    try:
+        search_time, result = _best_of(lambda: searcher.search(BENCH_TRACE_ID), repeat)
+        window_time, window_result = _best_of(lambda: searcher.search(BENCH_TRACE_ID, *window), repeat)
+        batch_ids = [BENCH_TRACE_ID] + ["%032x" % i for i in range(99)]
+        batch_time, batch = _best_of(lambda: searcher.search_by_traceids(batch_ids), repeat)
+    finally:
+        searcher.disconnect()
+    if 'error' in result or 'error' in window_result:
+        raise AssertionError("Search failed: {0}".format(result.get('error') or window_result.get('error')))
+    if batch[BENCH_TRACE_ID]['output'] != result['output']:
+        raise AssertionError("Result mismatch between single and batch search")
+
+    current_mb = sum(os.path.getsize(os.path.join(directory, name))
+                     for name in os.listdir(directory) if name.endswith('.log')) / 1048576.0
+    print("Local backend search ({0} lines found):".format(result['lines_count']))
+    print("  *.log files:     {0:.3f}s ({1:.1f} MB/s)".format(search_time, current_mb / search_time))
+    print("  window with .gz: {0:.3f}s ({1} files, {2} lines)".format(
+        window_time, window_result['files_count'], window_result['lines_count']))
+    print("  batch of 100:    {0:.3f}s".format(batch_time))
+    return [_record('search.local', search_time, lines=result['lines_count'],
+                    mb_per_s=round(current_mb / search_time, 2)),
+            _record('search.local_window', window_time, lines=window_result['lines_count'],
+                    files=window_result['files_count']),
+            _record('search.local_batch100', batch_time, lines=batch[BENCH_TRACE_ID]['lines_count'])]
+
+
+def bench_batch_consistency(trace_ids=5, size_mb=1, hit_density=0.02, repeat=3):
+    """批量搜索与逐个单独搜索的结果必须一致: 多个TraceId交错出现, 上下文窗口互相重叠;
+    maxLines较小时, 命中多的TraceId也不能挤掉其他TraceId的结果
+
+    Args:
+        trace_ids: TraceId个数
+        size_mb: 模拟日志大小 (MB)
+        hit_density: 每个TraceId所在行的比例
+
+    Returns:
+        结果记录列表
+    """
+    rnd = random.Random(7)
+    ids = ["%032x" % rnd.getrandbits(128) for _ in range(trace_ids)]
+    directory = tempfile.mkdtemp(prefix='log-bench-batch-')
+    try:
+        for index, name in enumerate(('app', 'sql')):
+            text = generate_log_text(int(size_mb * 1024 * 1024 / 2), seed=index)
+            # 随机把一部分traceId替换为要搜索的TraceId, 使不同TraceId的行相邻
+            text = re.sub(r'traceId=[0-9a-f]{32}', lambda m: "traceId=" + rnd.choice(ids)
+                          if rnd.random() < hit_density * trace_ids else m.group(), text)
+            if index == 0:
+                # 文件开头是第一个TraceId的大量连续命中
+                text = "".join("2024-05-01 00:00:00.000 INFO [main] c.e.Busy - busy {0} traceId={1}\n".format(
+                    line, ids[0]) for line in range(1000)) + text
+            with open(os.path.join(directory, "{0}.log".format(name)), 'w') as f:
+                f.write(text)
+        searcher = _local_searcher(directory)
+        limited = _local_searcher(directory, max_lines=100)
+        try:
+            batch_time, batch = _best_of(lambda: searcher.search_by_traceids(ids), repeat)
+            singles = dict((trace_id, searcher.search(trace_id)) for trace_id in ids)
+            limited_batch = limited.search_by_traceids(ids)
+            limited_singles = dict((trace_id, limited.search(trace_id)) for trace_id in ids)
+        finally:
+            searcher.disconnect()
+            limited.disconnect()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for trace_id in ids:
+        if batch[trace_id]['output'] != singles[trace_id]['output']:
+            raise AssertionError("Result mismatch between single and batch search for {0}".format(trace_id))
+        if limited_batch[trace_id]['output'] != limited_singles[trace_id]['output']:
+            raise AssertionError("Result mismatch between single and batch search for {0} (maxLines=100)".format(
+                trace_id))
+    lines = sum(batch[trace_id]['lines_count'] for trace_id in ids)
+    print("  batch of {0} interleaved: {1:.3f}s ({2} lines, identical to single searches)".format(
+        trace_ids, batch_time, lines))
+    return [_record('search.local_batch_interleaved', batch_time, lines=lines)]
+
+
+def bench_result_handling(directory, repeat=3):
+    """main()的结果处理: 搜索结果写入文件、预览、提取业务信息 (原始顺序和时间线)
+
+    Returns:
+        结果记录列表
+    """
+    searcher = _local_searcher(directory)
+    workdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    records = []
+    try:
+        os.chdir(workdir)
+        for name, ordered in (('main.raw_order', False), ('main.timeline', True)):
+            def handle():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    log_search._search_single(searcher, BENCH_TRACE_ID, ordered=ordered)
+                for entry in os.listdir(workdir):
+                    os.remove(os.path.join(workdir, entry))
+            elapsed, _ = _best_of(handle, repeat)
+            records.append(_record(name, elapsed))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        searcher.disconnect()
+
+    print("main() result handling:")
+    for record in records:
+        print("  {0:<15} {1:.3f}s".format(record['name'][5:] + ':', record['seconds']))
+    return records
+
+
+def bench_remote_extraction(config_path, trace_id, repeat=3):
+    """对比传回日志后本地提取与在日志服务器上提取的传输字节数和耗时
+
+    Args:
+        config_path: bugfix.config.json 路径
+        trace_id: 用于测试的TraceId
+        repeat: 每种模式的重复次数, 取最好成绩
+    """
+    searcher = LogSearcher(config_path)
+    try:
+        local_time, local = _best_of(lambda: searcher.search_business_info(trace_id, remote=False), repeat)
+        remote_time, remote = _best_of(lambda: searcher.search_business_info(trace_id, remote=True), repeat)
+    finally:
+        searcher.disconnect()
+
+    for result in (local, remote):
+        if 'error' in result:
+            raise AssertionError("Search failed: {0}".format(result['error']))
+    if local['business_info'] != remote['business_info']:
+        raise AssertionError("Result mismatch between local and remote extraction")
+
+    print("search_business_info for {0} ({1} lines on {2} hosts):".format(
+        trace_id, local['lines_count'], len(local['hosts'])))
+    print("  local:     {0:.3f}s, {1} bytes on the wire".format(local_time, local['bytes_received']))
+    print("  remote:    {0:.3f}s, {1} bytes on the wire".format(remote_time, remote['bytes_received']))
+    print("  reduction: {0:.1f}x fewer bytes".format(
+        float(local['bytes_received']) / max(1, remote['bytes_received'])))
+    return [_record('ssh.extract_local', local_time, bytes=local['bytes_received']),
+            _record('ssh.extract_remote', remote_time, bytes=remote['bytes_received'])]
+
+
+class _StandInChannel(object):
+    """替身SSH通道: 经过固定延迟后从socket输出预设的grep结果"""
+
+    def __init__(self, payload, latency):
+        self._local, remote = socket.socketpair()
+        self.eof_received = False
+        self.closed = False
+
+        def respond():
+            remote.sendall(payload)
+            remote.close()
+        threading.Timer(latency, respond).start()
+
+    def fileno(self):
+        return self._local.fileno()
+
+    def recv_ready(self):
+        return bool(select.select([self._local], [], [], 0)[0])
+
+    def recv(self, size):
+        data = self._local.recv(size)
+        if not data:
+            self.eof_received = True
+            self._local.close()
+        return data
+
+    def recv_exit_status(self):
+        return 0
+
+
+class _StandInStream(object):
+    def __init__(self, channel):
+        self.channel = channel
+
+    def read(self):
+        return b''
+
+
+class _StandInClient(object):
+    """进程内替身SSH客户端, 每条命令模拟一次有网络和grep耗时的远程执行"""
+
+    latency = 0.05
+    payload = b''
+
+    def set_missing_host_key_policy(self, policy):
+        pass
+
+    def connect(self, **kwargs):
+        pass
+
+    def get_transport(self):
+        return self
+
+    def is_active(self):
+        return True
+
+    def exec_command(self, command):
+        return None, _StandInStream(_StandInChannel(self.payload, self.latency)), _StandInStream(None)
+
+    def close(self):
+        pass
+
+
+def bench_concurrency(levels=(1, 10, 100), latency=0.05, lines=200):
+    """对比线程池与asyncio接口在不同并发数下的搜索吞吐量 (替身服务器, 不需要网络)
+
+    Args:
+        levels: 并发搜索数
+        latency: 每条远程命令的模拟耗时 (秒)
+        lines: 每次搜索返回的行数
+    """
+    _StandInClient.latency = latency
+    _StandInClient.payload = generate_log_text(lines * 120).encode('utf-8')
+
+    fd, config_path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'logServer': {'host': 'stand-in', 'username': 'bench', 'baseDirectory': '/logs/'},
+                   'searchOptions': {'cache': 'false'}}, f)
+    try:
+        searcher = LogSearcher(config_path, client_factory=_StandInClient)
+    finally:
+        os.remove(config_path)
+    async_searcher = AsyncLogSearcher(searcher)
+
+    print("Concurrent searches against a stand-in server ({0:.0f} ms per command):".format(latency * 1000))
+    records = []
+    for level in levels:
+        trace_ids = ["%032x" % i for i in range(level)]
+
+        def threaded():
+            with ThreadPoolExecutor(max_workers=min(level, 8)) as executor:
+                return list(executor.map(searcher.search, trace_ids))
+
+        async def concurrent():
+            return await asyncio.gather(*[async_searcher.search(trace_id) for trace_id in trace_ids])
+
+        thread_time, thread_results = _best_of(threaded, 1)
+        async_time, async_results = _best_of(lambda: run(concurrent()), 1)
+        for result in thread_results + list(async_results):
+            if 'error' in result:
+                raise AssertionError("Search failed: {0}".format(result['error']))
+
+        print("  {0:>3} searches: threads(8) {1:.3f}s ({2:.1f}/s), asyncio {3:.3f}s ({4:.1f}/s)".format(
+            level, thread_time, level / thread_time, async_time, level / async_time))
+        records.append(_record('concurrency.threads_{0}'.format(level), thread_time,
+                               searches_per_s=round(level / thread_time, 1)))
+        records.append(_record('concurrency.asyncio_{0}'.format(level), async_time,
+                               searches_per_s=round(level / async_time, 1)))
+    searcher.disconnect()
+    return records
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(path, records, options):
+    """保存结果文件 (包含提交、环境和参数, 便于在不同提交之间对比)"""
+    with open(path, 'w') as f:
+        json.dump({
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': options,
+            'results': records
+        }, f, indent=2)
+    print("Results saved to: {0}".format(path))
+
+
+def compare_results(path, records, threshold=0.1):
+    """与之前保存的结果对比, 耗时增加超过threshold的测试标记为变慢
+
+    Returns:
+        变慢的测试数
+    """
+    with open(path, 'r') as f:
+        baseline = json.load(f)
+    previous = dict((record['name'], record) for record in baseline['results'])
+
+    print("Compared with {0} (commit {1}):".format(path, baseline.get('commit')))
+    slower = 0
+    for record in records:
+        old = previous.get(record['name'])
+        if old is None or not old['seconds']:
+            continue
+        ratio = record['seconds'] / old['seconds']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  SLOWER'
+            slower += 1
+        print("  {0:<28} {1:.3f}s -> {2:.3f}s ({3:+.0f}%){4}".format(
+            record['name'], old['seconds'], record['seconds'], (ratio - 1) * 100, flag))
+    return slower
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="Log search benchmarks")
+    parser.add_argument('--size-mb', type=float, default=8, help="synthetic log size in MB")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per implementation (best is reported)")
+    parser.add_argument('--hit-density', type=float, default=0.001,
+                        help="fraction of synthetic log lines containing the searched TraceId")
+    parser.add_argument('--log-dir', help="keep the generated log directory here instead of a temp dir")
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    parser.add_argument('--config', default=".github/chatmodes/bugfix.config.json",
+                        help="config used by the remote extraction benchmark")
+    parser.add_argument('--trace-id', help="also benchmark remote extraction against the configured log servers")
+    parser.add_argument('--tables', type=int, default=2000, help="known tables in the SQL tagging benchmark")
+    parser.add_argument('--sql-lines', type=int, default=200000, help="SQL lines in the SQL tagging benchmark")
+    parser.add_argument('--concurrency', action='store_true',
+                        help="also benchmark concurrent searches (threads vs asyncio) at 1, 10 and 100")
+    args = parser.parse_args()
+
+    records = bench_extraction(args.size_mb, args.repeat)
+    records += bench_table_matcher(args.tables, args.sql_lines, repeat=args.repeat)
+
+    directory = args.log_dir or tempfile.mkdtemp(prefix='log-bench-')
+    try:
+        generate_log_dir(directory, args.size_mb, hit_density=args.hit_density)
+        records += bench_local_search(directory, args.size_mb, args.repeat)
+        records += bench_batch_consistency(repeat=args.repeat)
+        records += bench_result_handling(directory, args.repeat)
+    finally:
+        if not args.log_dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if args.concurrency:
+        records += bench_concurrency()
+    if args.trace_id:
+        records += bench_remote_extraction(args.config, args.trace_id, args.repeat)
+
+    if args.output:
+        save_results(args.output, records, {'size_mb': args.size_mb, 'repeat': args.repeat,
+                                            'hit_density': args.hit_density, 'tables': args.tables,
+                                            'sql_lines': args.sql_lines})
+    if args.compare and compare_results(args.compare, records):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Bug分析 - SQL日志行的表和服务标注
+
+根据 ProjectAnalyzer 生成的 repositoryMapping / serviceMapping (以及符号索引中的注入关系) 一次构建表名字典:
+每行SQL只用一个预编译正则切分出标识符, 再逐个查字典, 耗时与已知表的数量无关,
+不需要对每张表分别做一次正则匹配。相同的SQL行(如MyBatis的 Preparing 语句)只分析一次。
+"""
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+
+from project_config import load_sections
+from project_index import SymbolIndex, index_path_for
+
+# SQL标识符: schema.table 按 . 切分, 反引号、双引号、方括号不属于标识符
+IDENTIFIER = re.compile(r'[^\W\d][\w$]*')
+
+# 与SQL关键字同名的表 (order、user...) 只在表名位置 (FROM、JOIN之后等) 才算命中
+SQL_KEYWORDS = frozenset((
+    'select', 'insert', 'update', 'delete', 'from', 'where', 'and', 'or', 'not', 'in', 'into', 'values',
+    'set', 'join', 'on', 'as', 'by', 'order', 'group', 'having', 'limit', 'offset', 'union', 'all',
+    'distinct', 'case', 'when', 'then', 'else', 'end', 'is', 'null', 'like', 'between', 'exists',
+    'table', 'user', 'key', 'index', 'desc', 'asc', 'left', 'right', 'inner', 'outer', 'count'
+))
+TABLE_CONTEXT = frozenset(('from', 'join', 'update', 'into', 'table'))
+
+
+class TableMatcher(object):
+    """SQL日志行 -> 涉及的表及使用这些表的Service"""
+
+    def __init__(self, repository_mapping=None, service_mapping=None, table_services=None):
+        """初始化匹配器
+
+        Args:
+            repository_mapping: Repository类 -> 表名 (ProjectAnalyzer 的 repositoryMapping)
+            service_mapping: Service类 -> {'tables': [...], ...} (ProjectAnalyzer 的 serviceMapping)
+            table_services: 额外的 (表名, Service) 对, 如符号索引的 SymbolIndex.table_services()
+        """
+        # 小写表名 -> (表名, 使用该表的Service)
+        owners = OrderedDict()
+        for table in (repository_mapping or {}).values():
+            owners.setdefault(table, [])
+        pairs = [(table, service) for service, info in (service_mapping or {}).items()
+                 for table in info.get('tables', [])]
+        for table, service in pairs + list(table_services or []):
+            services = owners.setdefault(table, [])
+            if service not in services:
+                services.append(service)
+        self._tables = {}
+        for table, services in owners.items():
+            self._tables.setdefault(table.lower(), (table, tuple(services)))
+        self._keys = frozenset(self._tables)
+        self._keyword_tables = self._keys & SQL_KEYWORDS
+
+    @classmethod
+    def from_config(cls, config):
+        """根据项目配置 (bugfix.project.auto.json 的内容) 创建匹配器"""
+        return cls(config.get('repositoryMapping'), config.get('serviceMapping'))
+
+    @classmethod
+    def load(cls, auto_path):
+        """读取 bugfix.project.auto.json (或按节拆分的目录) 中的映射创建匹配器
+
+        同目录下有符号索引 (bugfix.project.index.db) 时, 同时合并索引中的注入关系
+        (字段、构造器和Lombok注入), 与 project_index.py services-for-table 的结果一致。
+
+        Returns:
+            匹配器, 没有项目配置或其中没有表时为None
+        """
+        table_services = []
+        index_path = index_path_for(auto_path)
+        if os.path.exists(index_path):
+            index = SymbolIndex(index_path)
+            try:
+                table_services = index.table_services()
+            except (sqlite3.Error, IOError):
+                pass
+            finally:
+                index.close()
+        try:
+            repository_mapping, service_mapping = load_sections(auto_path, ['repositoryMapping', 'serviceMapping'])
+            matcher = cls(repository_mapping, service_mapping, table_services)
+        except ValueError:
+            return None
+        return matcher if matcher else None
+
+    def __len__(self):
+        return len(self._tables)
+
+    def match(self, sql):
+        """找出一行SQL涉及的表
+
+        Args:
+            sql: SQL日志行
+
+        Returns:
+            {'tables': 表名列表, 'services': 使用这些表的Service列表}, 均按出现顺序去重
+        """
+        tokens = IDENTIFIER.findall(sql.lower())
+        keys = self._keys
+        if keys.isdisjoint(tokens):
+            return {'tables': [], 'services': []}
+
+        hits = [token for token in tokens if token in keys]
+        if not self._keyword_tables.isdisjoint(hits):
+            hits = [token for index, token in enumerate(tokens) if token in keys and (
+                token not in self._keyword_tables or (index > 0 and tokens[index - 1] in TABLE_CONTEXT))]
+        tables = []
+        services = []
+        for token in OrderedDict.fromkeys(hits):
+            table, owners = self._tables[token]
+            tables.append(table)
+            services.extend(owners)
+        if len(tables) > 1:
+            services = list(OrderedDict.fromkeys(services))
+        return {'tables': tables, 'services': services}
+
+    def tag(self, lines):
+        """标注多行SQL, 相同的行只分析一次
+
+        Args:
+            lines: SQL日志行列表
+
+        Returns:
+            与lines一一对应的 match 结果列表 (相同的行共享同一结果, 不要修改)
+        """
+        seen = {}
+        tags = []
+        for line in lines:
+            tag = seen.get(line)
+            if tag is None:
+                tag = seen[line] = self.match(line)
+            tags.append(tag)
+        return tags
+
+    def annotate(self, business_info):
+        """为提取结果中的 sql_queries 添加表和服务标注
+
+        添加 `sql_tags` (与 sql_queries 一一对应) 和 `tables`
+        (表名 -> {'queries': 涉及该表的SQL行数, 'services': 使用该表的Service}, 按首次出现排序)。
+
+        Args:
+            business_info: BusinessInfoExtractor.result() 的结果, 原地修改
+
+        Returns:
+            business_info
+        """
+        tags = self.tag(business_info.get('sql_queries', []))
+        tables = OrderedDict()
+        for tag in tags:
+            for table in tag['tables']:
+                entry = tables.get(table)
+                if entry is None:
+                    entry = tables[table] = {'queries': 0, 'services': list(self._tables[table.lower()][1])}
+                entry['queries'] += 1
+        business_info['sql_tags'] = tags
+        business_info['tables'] = tables
+        return business_info
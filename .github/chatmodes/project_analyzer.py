@@ -5,26 +5,300 @@ Project Auto Analyzer - Auto identify project structure and business mappings
 """
 import os
 import re
-import json
-import sys
-import glob
+import argparse
+import hashlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from project_cache import MISS, ParseCache, file_stat
+from project_config import CONFIG_FORMATS, write_config
+from project_index import build_index
+from project_scanner import DEFAULT_IGNORES, ProjectScanner
+from project_watch import watch
+
+# Below this many source files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
+
+# Bump when a parse function changes its result, invalidating cached results
+PARSER_VERSION = 3
+
+TABLE_ANNOTATION = re.compile(r'@Table\s*\(\s*name\s*=\s*"([^"]+)"')
+SQL_TABLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'FROM\s+(\w+)',
+    r'UPDATE\s+(\w+)',
+    r'INSERT\s+INTO\s+(\w+)',
+    r'DELETE\s+FROM\s+(\w+)'
+)]
+REPOSITORY_CLASS = re.compile(r'class\s+(\w*Repository)')
+SERVICE_CLASS = re.compile(r'class\s+(\w*Service)')
+CLASS_COMMENT = re.compile(r'/\*\*\s*\n\s*\*\s*([^\n*]+)')
+FIELD_INJECTION = re.compile(
+    r'@(?:Autowired|Resource|Inject)\b(?:\s*\([^)]*\))?\s+(?:@\w+(?:\([^)]*\))?\s+)*'
+    r'(?:(?:private|protected|public|final)\s+)*([A-Z]\w*)(\s*<[^;=]*>)?\s+\w+\s*[;=]')
+LOMBOK_CONSTRUCTOR = re.compile(r'@(?:RequiredArgsConstructor|AllArgsConstructor)\b')
+FINAL_FIELD = re.compile(r'(?:private|protected|public)\s+final\s+([A-Z]\w*)(\s*<[^;=]*>)?\s+\w+\s*;')
+TYPE_NAME = re.compile(r'[A-Z]\w*')
+GENERIC_ARGUMENTS = re.compile(r'<[^<>]*>')
+PARAMETER_ANNOTATION = re.compile(r'@\w+')
+ANNOTATION_ARGUMENTS = re.compile(r'\([^()]*\)')
+PLACEHOLDER = re.compile(r'#\d+#')
+
+BUSINESS_KEYWORDS = OrderedDict([
+    ("Query", "query"),
+    ("Create", "create"),
+    ("Update", "update"),
+    ("Delete", "delete"),
+    ("Payment", "payment"),
+    ("Subs", "deposit"),
+    ("Holdings", "holdings"),
+    ("Trade", "trade"),
+    ("Order", "order"),
+    ("Validate", "validate"),
+    ("Migrate", "migrate")
+])
+
+
+def infer_table_name(class_name, content):
+    """Infer table name from Repository class
+    
+    Args:
+        class_name: Repository class name
+        content: File content
+        
+    Returns:
+        Inferred table name
+    """
+    # Method 1: Find @Table annotation
+    table_match = TABLE_ANNOTATION.search(content)
+    if table_match:
+        return table_match.group(1)
+    
+    # Method 2: Find table name in SQL
+    for pattern in SQL_TABLE_PATTERNS:
+        matches = pattern.findall(content)
+        if matches:
+            # Return most common table name (first seen on ties)
+            return Counter(matches).most_common(1)[0][0]
+    
+    # Method 3: Infer from class name (TpDealRepository -> tp_deal)
+    if class_name.endswith('Repository'):
+        base_name = class_name[:-10]  # Remove Repository suffix
+        # Convert camelCase to snake_case
+        table_name = re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', base_name).lower()
+        return table_name
+    
+    return None
+
+
+def infer_business_type(class_name):
+    """Infer business type from class name
+    
+    Args:
+        class_name: Service class name
+        
+    Returns:
+        Business type
+    """
+    for keyword, business_type in BUSINESS_KEYWORDS.items():
+        if keyword.lower() in class_name.lower():
+            return business_type
+    
+    return "unknown"
+
+
+def describe_service(class_name, content, injections=None):
+    """Extract the per-file part of a Service analysis
+    
+    Args:
+        class_name: Service class name
+        content: File content
+        injections: find_injections result for the content, found here if not given
+        
+    Returns:
+        (description, business type, injected Repository names)
+    """
+    # Extract class comment as description
+    comment_match = CLASS_COMMENT.search(content)
+    description = comment_match.group(1).strip() if comment_match else ""
+    
+    # Repositories injected through fields, constructors or Lombok, the same links as the symbol index
+    if injections is None:
+        injections = find_injections(class_name, content)
+    repositories = list(OrderedDict.fromkeys(target for target, via in injections if target.endswith('Repository')))
+    
+    return description, infer_business_type(class_name), repositories
+
+
+def _bean_type(type_name, generics):
+    """Injected bean type: the element type for collections of beans (List<XHandler>, Map<String, XHandler>)"""
+    arguments = TYPE_NAME.findall(generics or '')
+    return arguments[-1] if arguments else type_name
+
+
+def find_injections(class_name, content):
+    """Find the classes a bean gets injected, through annotated fields or its constructor
+    
+    Args:
+        class_name: Class name
+        content: File content
+        
+    Returns:
+        [injected class name, 'field' or 'constructor'] pairs in order of appearance
+    """
+    injections = [[_bean_type(target, generics), 'field'] for target, generics in FIELD_INJECTION.findall(content)]
+    
+    # Explicit constructors (a `new X(...)` call is not followed by a body)
+    constructor = re.compile(r'(?<!new )\b%s\s*\(((?:[^()]|\([^()]*\))*)\)\s*(?:throws\s+[\w.,\s]+)?\{'
+                             % re.escape(class_name))
+    for params in constructor.findall(content):
+        # Replace generic arguments so their commas do not split parameters, keep them for the element type
+        generics = {}
+        
+        def placeholder(match):
+            key = '#%d#' % len(generics)
+            generics[key] = PLACEHOLDER.sub(lambda inner: generics[inner.group(0)], match.group(0))
+            return key
+        
+        while GENERIC_ARGUMENTS.search(params):
+            params = GENERIC_ARGUMENTS.sub(placeholder, params)
+        for param in ANNOTATION_ARGUMENTS.sub('', params).split(','):
+            # @Value parameters are configuration values, not beans
+            if '@Value' in param:
+                continue
+            tokens = PARAMETER_ANNOTATION.sub('', param).replace('final ', '').split()
+            if len(tokens) >= 2:
+                generic = PLACEHOLDER.search(tokens[-2])
+                type_name = PLACEHOLDER.sub('', tokens[-2]).rsplit('.', 1)[-1]
+                if type_name[:1].isupper():
+                    injections.append([_bean_type(type_name, generics[generic.group(0)] if generic else ''), 'constructor'])
+    
+    # Lombok generated constructors inject the final fields
+    if LOMBOK_CONSTRUCTOR.search(content):
+        injections.extend([_bean_type(target, generics), 'constructor'] for target, generics in FINAL_FIELD.findall(content))
+    
+    unique = []
+    for injection in injections:
+        if injection not in unique:
+            unique.append(injection)
+    return unique
+
+
+def _read_source(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+
+def _digest(content):
+    return hashlib.sha1(content.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def source_digest(path):
+    """Content hash of a source file, as recorded by parse_source"""
+    return _digest(_read_source(path))
+
+
+def parse_repository(content):
+    """Parse a Repository source
+    
+    Returns:
+        (class name, table name), or None if the file declares no Repository class
+    """
+    class_match = REPOSITORY_CLASS.search(content)
+    if class_match:
+        class_name = class_match.group(1)
+        table_name = infer_table_name(class_name, content)
+        if table_name:
+            return class_name, table_name
+    return None
+
+
+def parse_service(content):
+    """Parse a Service source
+    
+    Returns:
+        (class name, description, business type, repositories, injections), or None if the file declares no Service class
+    """
+    class_match = SERVICE_CLASS.search(content)
+    if class_match:
+        class_name = class_match.group(1)
+        injections = find_injections(class_name, content)
+        return (class_name,) + describe_service(class_name, content, injections) + (injections,)
+    return None
+
+
+PARSERS = {
+    'repository': parse_repository,
+    'service': parse_service
+}
+
+
+def parse_source(task):
+    """Parse one source file (process pool task, depends only on the file)
+    
+    Args:
+        task: (kind, file path)
+        
+    Returns:
+        (kind, file path, parse result, content hash, error message or None)
+    """
+    kind, path = task
+    try:
+        content = _read_source(path)
+        return kind, path, PARSERS[kind](content), _digest(content), None
+    except Exception as e:
+        return kind, path, None, None, str(e)
+
+
+def default_output_path(project_root):
+    """Default location of bugfix.project.auto.json"""
+    return os.path.join(project_root, ".github", "chatmodes", "bugfix.project.auto.json")
+
+
+def default_index_path(project_root):
+    """Default location of the symbol index, next to bugfix.project.auto.json"""
+    return os.path.join(os.path.dirname(default_output_path(project_root)), "bugfix.project.index.db")
+
 
 class ProjectAnalyzer:
     """Project structure auto analyzer"""
     
-    def __init__(self, project_root):
+    def __init__(self, project_root, ignore_patterns=None, use_gitignore=True, workers=None, cache_path=None,
+                 config_format='pretty'):
         """Initialize project analyzer
         
         Args:
             project_root: Project root directory path
+            ignore_patterns: Ignore rules in .gitignore syntax, defaults to DEFAULT_IGNORES
+            use_gitignore: Whether to also apply the project's .gitignore files
+            workers: Processes used to parse source files, defaults to the CPU count (1 parses serially)
+            cache_path: Parse cache file, defaults to bugfix.project.cache.json next to the generated config
+            config_format: Output format of save_config, one of CONFIG_FORMATS
         """
         self.project_root = os.path.abspath(project_root)
+        self.workers = int(workers or os.cpu_count() or 1)
+        
+        # Per-file parse results of the previous run; set to None to parse everything
+        if cache_path is None:
+            cache_path = os.path.join(os.path.dirname(default_output_path(self.project_root)), "bugfix.project.cache.json")
+        self.cache = ParseCache(cache_path, self.project_root, PARSER_VERSION)
+        
+        # One walk feeds every classifier; register more kinds (Controller, Mapper...) here
+        self.scanner = ProjectScanner(self.project_root, ignore_patterns, use_gitignore)
+        self.scanner.register('repository', lambda name: name.endswith('Repository.java'))
+        self.scanner.register('service', lambda name: name.endswith('Service.java'))
+        self.project_files = {}
+        self.parsed = {}
+        
         self.repository_mapping = {}
         self.service_mapping = {}
         self.business_scenarios = []
         self.trace_id_patterns = []
         self.user_id_fields = []
         
+        # Built once per analysis, save_config writes it as is
+        self.config = None
+        self.config_format = config_format
+        
     def analyze_project(self):
         """Analyze entire project structure
         
@@ -33,10 +307,59 @@ class ProjectAnalyzer:
         """
         print("Starting project structure analysis...")
         
-        # 1. Scan Repository classes
+        # 1. Walk the project once and classify files
+        self._scan_files()
+        
+        # 2. Parse every source file (in parallel on large projects)
+        self._parse_sources()
+        
+        # 3. Link classes and derive the mappings
+        return self._link_project()
+    
+    def update_files(self, paths):
+        """Re-analyze after some files changed, were created or deleted, without walking the project
+        
+        Args:
+            paths: Changed file paths
+            
+        Returns:
+            Project analysis result dictionary
+        """
+        changed = {}
+        for path in set(os.path.abspath(path) for path in paths):
+            exists = os.path.isfile(path) and not self.scanner.ignored(path)
+            for kind in self.scanner.classify(os.path.basename(path)):
+                if kind in PARSERS:
+                    changed[(kind, path)] = exists
+        
+        for kind in PARSERS:
+            self.parsed[kind] = [entry for entry in self.parsed.get(kind, []) if (kind, entry[0]) not in changed]
+        tasks = [task for task, exists in changed.items() if exists]
+        if self.cache is not None:
+            self.cache.retain([(kind, entry[0]) for kind in PARSERS for entry in self.parsed[kind]] + tasks)
+        
+        for (kind, path), (parsed, error) in self._parse_files(tasks).items():
+            self.parsed[kind].append((path, parsed, error))
+        for kind in PARSERS:
+            self.parsed[kind].sort(key=lambda entry: self.scanner.walk_key(entry[0]))
+            self.project_files[kind] = [entry[0] for entry in self.parsed[kind]]
+        
+        return self._link_project()
+    
+    def _link_project(self):
+        """Rebuild every mapping from the parse results
+        
+        Returns:
+            Project analysis result dictionary
+        """
+        self.repository_mapping = {}
+        self.service_mapping = {}
+        self.business_scenarios = []
+        
+        # 1. Map Repository classes to tables (before Services, which resolve their tables)
         self._scan_repositories()
         
-        # 2. Scan Service classes
+        # 2. Link Service classes to Repositories and tables
         self._scan_services()
         
         # 3. Analyze business scenarios
@@ -48,169 +371,117 @@ class ProjectAnalyzer:
         # 5. Extract user identifier fields
         self._extract_user_fields()
         
-        return self._build_config()
+        self.config = self._build_config()
+        return self.config
     
-    def _scan_repositories(self):
-        """Scan Repository classes and infer table names"""
-        print("Scanning Repository classes...")
-        
-        # Find all Repository files
-        repo_files = []
-        for root, dirs, files in os.walk(self.project_root):
-            for file in files:
-                if file.endswith('Repository.java'):
-                    repo_files.append(os.path.join(root, file))
-        
-        for repo_file in repo_files:
-            try:
-                with open(repo_file, 'r') as f:
-                    content = f.read()
-                
-                # Extract class name
-                class_match = re.search(r'class\s+(\w*Repository)', content)
-                if class_match:
-                    class_name = class_match.group(1)
-                    
-                    # Infer table name
-                    table_name = self._infer_table_name(class_name, content)
-                    if table_name:
-                        self.repository_mapping[class_name] = table_name
-                        
-            except Exception as e:
-                print("Failed to process Repository file %s: %s" % (repo_file, str(e)))
-    
-    def _infer_table_name(self, class_name, content):
-        """Infer table name from Repository class
+    def _scan_files(self):
+        """Walk the project tree once, skipping ignored directories"""
+        print("Scanning project files...")
+        self.project_files = self.scanner.scan()
+    
+    def _parse_sources(self):
+        """Parse all classified files, results keep the walk order so linking matches a serial run"""
+        tasks = [(kind, path) for kind in PARSERS for path in self.project_files.get(kind, [])]
+        if self.cache is not None:
+            self.cache.load()
+            self.cache.retain(tasks)
+        
+        results = self._parse_files(tasks)
+        self.parsed = dict((kind, []) for kind in PARSERS)
+        for kind, path in tasks:
+            parsed, error = results[(kind, path)]
+            self.parsed[kind].append((path, parsed, error))
+    
+    def _parse_files(self, tasks):
+        """Parse source files, skipping files whose size and mtime (or content hash) match the parse cache
         
         Args:
-            class_name: Repository class name
-            content: File content
+            tasks: (kind, file path) list
             
         Returns:
-            Inferred table name
+            Dictionary of (kind, file path) -> (parse result, error message or None)
         """
-        # Method 1: Find @Table annotation
-        table_match = re.search(r'@Table\s*\(\s*name\s*=\s*"([^"]+)"', content)
-        if table_match:
-            return table_match.group(1)
-        
-        # Method 2: Find table name in SQL
-        sql_patterns = [
-            r'FROM\s+(\w+)',
-            r'UPDATE\s+(\w+)',
-            r'INSERT\s+INTO\s+(\w+)',
-            r'DELETE\s+FROM\s+(\w+)'
-        ]
-        
-        for pattern in sql_patterns:
-            matches = re.findall(pattern, content, re.IGNORECASE)
-            if matches:
-                # Return most common table name
-                return max(set(matches), key=matches.count)
-        
-        # Method 3: Infer from class name (TpDealRepository -> tp_deal)
-        if class_name.endswith('Repository'):
-            base_name = class_name[:-10]  # Remove Repository suffix
-            # Convert camelCase to snake_case
-            table_name = re.sub(r'([a-z0-9])([A-Z])', r'\1_\2', base_name).lower()
-            return table_name
+        results = {}
+        stats = {}
+        pending = tasks
+        if self.cache is not None:
+            pending = []
+            for task in tasks:
+                kind, path = task
+                try:
+                    stats[task] = file_stat(path)
+                except OSError:
+                    pending.append(task)
+                    continue
+                cached = self.cache.get(kind, path, stats[task], source_digest)
+                if cached is MISS:
+                    pending.append(task)
+                else:
+                    results[task] = (cached, None)
+        print("Parsing %d of %d source files..." % (len(pending), len(tasks)))
+        
+        if self.workers > 1 and len(pending) >= PARALLEL_MIN_FILES:
+            chunksize = max(1, len(pending) // (self.workers * 4))
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                parsed_files = list(executor.map(parse_source, pending, chunksize=chunksize))
+        else:
+            parsed_files = [parse_source(task) for task in pending]
+        
+        for kind, path, parsed, digest, error in parsed_files:
+            results[(kind, path)] = (parsed, error)
+            if self.cache is not None and error is None and (kind, path) in stats:
+                self.cache.put(kind, path, stats[(kind, path)], digest, parsed)
+        if self.cache is not None:
+            self.cache.save()
+        return results
+    
+    def _scan_repositories(self):
+        """Scan Repository classes and infer table names"""
+        print("Scanning Repository classes...")
         
-        return None
+        for repo_file, parsed, error in self.parsed.get('repository', []):
+            if error is not None:
+                print("Failed to process Repository file %s: %s" % (repo_file, error))
+            elif parsed:
+                class_name, table_name = parsed
+                self.repository_mapping[class_name] = table_name
     
     def _scan_services(self):
         """Scan Service classes and analyze business functions"""
         print("Scanning Service classes...")
         
-        # Find all Service files
-        service_files = []
-        for root, dirs, files in os.walk(self.project_root):
-            for file in files:
-                if file.endswith('Service.java'):
-                    service_files.append(os.path.join(root, file))
-        
-        for service_file in service_files:
-            try:
-                with open(service_file, 'r') as f:
-                    content = f.read()
-                
-                # Extract class name
-                class_match = re.search(r'class\s+(\w*Service)', content)
-                if class_match:
-                    class_name = class_match.group(1)
-                    
-                    # Analyze business function
-                    service_info = self._analyze_service(class_name, content)
-                    if service_info:
-                        self.service_mapping[class_name] = service_info
-                        
-            except Exception as e:
-                print("Failed to process Service file %s: %s" % (service_file, str(e)))
-    
-    def _analyze_service(self, class_name, content):
-        """Analyze Service class business function
+        for service_file, parsed, error in self.parsed.get('service', []):
+            if error is not None:
+                print("Failed to process Service file %s: %s" % (service_file, error))
+            elif parsed:
+                class_name, description, business_type, repositories = parsed[:4]
+                self.service_mapping[class_name] = self._link_service(description, business_type, repositories)
+    
+    def _link_service(self, description, business_type, repositories):
+        """Build the Service information, resolving tables through the Repository mapping
         
         Args:
-            class_name: Service class name
-            content: File content
+            description: Class comment
+            business_type: Business type
+            repositories: Injected Repository names
             
         Returns:
             Service information dictionary
         """
         service_info = {
-            "description": "",
+            "description": description,
             "tables": [],
-            "businessType": "",
-            "repositories": []
+            "businessType": business_type,
+            "repositories": repositories
         }
         
-        # Extract class comment as description
-        comment_match = re.search(r'/\*\*\s*\n\s*\*\s*([^\n*]+)', content)
-        if comment_match:
-            service_info["description"] = comment_match.group(1).strip()
-        
-        # Infer business type
-        service_info["businessType"] = self._infer_business_type(class_name)
-        
-        # Find used Repository
-        repo_matches = re.findall(r'@Autowired[^;]*?(\w*Repository)', content, re.DOTALL)
-        service_info["repositories"] = list(set(repo_matches))
-        
         # Infer related tables based on Repository
-        for repo in service_info["repositories"]:
+        for repo in repositories:
             if repo in self.repository_mapping:
                 service_info["tables"].append(self.repository_mapping[repo])
         
         return service_info
     
-    def _infer_business_type(self, class_name):
-        """Infer business type from class name
-        
-        Args:
-            class_name: Service class name
-            
-        Returns:
-            Business type
-        """
-        business_keywords = {
-            "Query": "query",
-            "Create": "create",
-            "Update": "update",
-            "Delete": "delete",
-            "Payment": "payment",
-            "Subs": "deposit",
-            "Holdings": "holdings",
-            "Trade": "trade",
-            "Order": "order",
-            "Validate": "validate",
-            "Migrate": "migrate"
-        }
-        
-        for keyword, chinese in business_keywords.items():
-            if keyword.lower() in class_name.lower():
-                return chinese
-        
-        return "unknown"
-    
     def _analyze_business_scenarios(self):
         """Analyze business scenarios"""
         print("Analyzing business scenarios...")
@@ -225,12 +496,12 @@ class ProjectAnalyzer:
                 scenario_groups[business_type] = {
                     "scenario": business_type,
                     "relatedServices": [],
-                    "coreTables": set(),
+                    "coreTables": OrderedDict(),
                     "commonIssues": []
                 }
             
             scenario_groups[business_type]["relatedServices"].append(service_name)
-            scenario_groups[business_type]["coreTables"].update(service_info["tables"])
+            scenario_groups[business_type]["coreTables"].update((table, None) for table in service_info["tables"])
         
         # Add common issues
         issue_mapping = {
@@ -320,38 +591,77 @@ class ProjectAnalyzer:
         
         return templates
     
-    def save_config(self, output_path=None):
-        """Save configuration to file
+    def save_config(self, output_path=None, sections=None):
+        """Save configuration to file in the analyzer's config format
         
         Args:
             output_path: Output file path
+            sections: Sections that changed; in the split format only their files are rewritten
+            
+        Returns:
+            Project configuration
         """
         if output_path is None:
-            output_path = os.path.join(self.project_root, ".github", "chatmodes", "bugfix.project.auto.json")
+            output_path = default_output_path(self.project_root)
         
-        config = self._build_config()
+        # Built by the last analysis, only a config that was never analyzed is built here
+        if self.config is None:
+            self.config = self._build_config()
         
-        # Create directory if not exists
-        output_dir = os.path.dirname(output_path)
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        with open(output_path, 'w') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        write_config(self.config, output_path, self.config_format, sections)
         
         print("Project configuration saved to: %s" % output_path)
-        return config
+        return self.config
+    
+    def save_index(self, index_path=None):
+        """Save the symbol index (classes, injections, tables) queried by project_index.py
+        
+        Args:
+            index_path: Index file path
+        """
+        if index_path is None:
+            index_path = default_index_path(self.project_root)
+        
+        classes = []
+        injections = []
+        for path, parsed, error in self.parsed.get('repository', []):
+            if parsed:
+                class_name, table_name = parsed
+                classes.append((class_name, 'repository', os.path.relpath(path, self.project_root), table_name, None, None))
+        for path, parsed, error in self.parsed.get('service', []):
+            if parsed:
+                class_name, description, business_type, repositories, service_injections = parsed
+                classes.append((class_name, 'service', os.path.relpath(path, self.project_root), None, business_type, description))
+                injections.extend((class_name, target, via) for target, via in service_injections)
+        
+        build_index(index_path, classes, injections)
+        print("Symbol index saved to: %s" % index_path)
 
 def main():
     """Main function"""
-    if len(sys.argv) < 2:
-        project_root = os.getcwd()
-    else:
-        project_root = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Auto-generate the project structure mapping")
+    parser.add_argument('project_root', nargs='?', default=os.getcwd())
+    parser.add_argument('--ignore', action='append', default=[], metavar='PATTERN',
+                        help="additional ignore rule in .gitignore syntax (repeatable)")
+    parser.add_argument('--no-gitignore', action='store_true', help="do not apply the project's .gitignore files")
+    parser.add_argument('--workers', type=int, help="processes used to parse source files (default: CPU count, 1 = serial)")
+    parser.add_argument('--no-cache', action='store_true', help="parse every file instead of reusing unchanged results")
+    parser.add_argument('--watch', action='store_true', help="keep the configuration up to date as files change")
+    parser.add_argument('--debounce', type=float, default=0.5, help="seconds of quiet before re-analyzing in --watch mode")
+    parser.add_argument('--format', choices=CONFIG_FORMATS, default='pretty',
+                        help="config output: indented, compact, or split into one file per section")
+    args = parser.parse_args()
     
-    analyzer = ProjectAnalyzer(project_root)
+    analyzer = ProjectAnalyzer(args.project_root, DEFAULT_IGNORES + args.ignore, not args.no_gitignore, args.workers,
+                               config_format=args.format)
+    if args.no_cache:
+        analyzer.cache = None
+    if args.watch:
+        watch(analyzer, debounce=args.debounce)
+        return
     config = analyzer.analyze_project()
     analyzer.save_config()
+    analyzer.save_index()
     
     print("\nAnalysis completed:")
     print("- Repository classes: %d" % len(config['repositoryMapping']))
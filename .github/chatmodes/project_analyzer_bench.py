@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Analyzer Benchmark - Per-phase timings of ProjectAnalyzer on a synthetic Java project
+
+Generates a Maven or Gradle style multi-module tree (Repository classes with @Table or inline
+SQL, Services with Javadoc and @Autowired/constructor injection, controllers and DTOs, plus
+target/, build/, node_modules/ and .git noise), then times each phase: walk, read, parse,
+link, serialize. Results can be saved as JSON and compared between commits:
+
+    python project_analyzer_bench.py --files 20000 --output bench.json
+    python project_analyzer_bench.py --files 20000 --output bench-new.json --compare bench.json
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+import project_analyzer
+from log_search_bench import compare_results, save_results
+from project_analyzer import PARSERS, ProjectAnalyzer
+from project_config import CONFIG_FORMATS, section_paths
+
+DOMAINS = ["Order", "Payment", "Trade", "Holdings", "Subs", "Account", "Customer", "Fund", "Deal", "Refund",
+           "Asset", "Bonus", "Coupon", "Invoice", "Ledger", "Quota", "Risk", "Settle", "Transfer", "Wallet"]
+ACTIONS = ["Query", "Create", "Update", "Delete", "Validate", "Migrate", "Payment", "Trade", "Sync", "Report"]
+
+# Source files generated per entity: Repository, Service, Controller, DTO, test
+FILES_PER_ENTITY = 5
+
+
+def _snake(name):
+    return "".join("_" + c.lower() if c.isupper() else c for c in name).lstrip("_")
+
+
+def _method_bodies(rng, count):
+    lines = []
+    for i in range(count):
+        lines.append("    public Object step%d(Long id, String custNo) {" % i)
+        for _ in range(rng.randint(3, 12)):
+            lines.append("        log.info(\"custNo={} id={} step=%d\", custNo, id);" % i)
+        lines.append("        return null;")
+        lines.append("    }")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _repository_source(rng, package, entity, flavor):
+    table = "t_" + _snake(entity)
+    header = "package %s.repository;\n\nimport org.springframework.stereotype.Repository;\n\n" % package
+    doc = "/**\n * %s data access\n */\n" % entity
+    if flavor == 0:
+        return header + doc + (
+            "@Repository\n@Table(name = \"%s\")\npublic class %sRepository extends BaseRepository<%s> {\n%s}\n"
+            % (table, entity, entity, _method_bodies(rng, rng.randint(2, 6))))
+    if flavor == 1:
+        queries = [
+            "    @Query(\"SELECT * FROM %s WHERE cust_no = :custNo AND status = 1\")" % table,
+            "    @Query(\"UPDATE %s SET status = :status WHERE id = :id\")" % table,
+            "    @Query(\"INSERT INTO %s (id, cust_no) VALUES (:id, :custNo)\")" % table,
+            "    @Query(\"SELECT COUNT(*) FROM %s\")" % table,
+        ]
+        return header + doc + "@Repository\npublic class %sRepository {\n%s\n\n%s}\n" % (
+            entity, "\n    Object q();\n".join(queries), _method_bodies(rng, rng.randint(1, 4)))
+    return header + doc + "@Repository\npublic class %sRepository extends BaseRepository<%s> {\n%s}\n" % (
+        entity, entity, _method_bodies(rng, rng.randint(1, 4)))
+
+
+def _service_source(rng, package, service, entity, others, constructor):
+    fields = [entity] + others
+    lines = ["package %s.service;" % package, "",
+             "import org.springframework.beans.factory.annotation.Autowired;", "",
+             "/**", " * %s business service" % service, " *", " * Handles %s requests." % entity.lower(), " */",
+             "@Service", "public class %sService {" % service, ""]
+    if constructor:
+        for name in fields:
+            lines.append("    private final %sRepository %sRepository;" % (name, name[0].lower() + name[1:]))
+        lines.append("")
+        params = ", ".join("%sRepository %sRepository" % (name, name[0].lower() + name[1:]) for name in fields)
+        lines.append("    public %sService(%s) {" % (service, params))
+        for name in fields:
+            lines.append("        this.%sRepository = %sRepository;" % ((name[0].lower() + name[1:],) * 2))
+        lines.append("    }")
+    else:
+        for name in fields:
+            lines.append("    @Autowired")
+            lines.append("    private %sRepository %sRepository;" % (name, name[0].lower() + name[1:]))
+    lines.append("")
+    lines.append(_method_bodies(rng, rng.randint(3, 10)))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def _write(path, content, mode='w'):
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    with open(path, mode) as f:
+        f.write(content)
+
+
+def generate_java_project(root, files=2000, modules=None, build='maven', noise=True, seed=42):
+    """Generate a synthetic multi-module Java project
+
+    Args:
+        root: Project directory
+        files: Approximate number of source files under src/
+        modules: Number of modules, defaults to one per 200 source files
+        build: 'maven' (pom.xml, target/) or 'gradle' (build.gradle, build/)
+        noise: Whether to add build output, node_modules and .git directories the analyzer must skip
+        seed: Random seed
+
+    Returns:
+        Dictionary of generated file counts (repositories, services, sources, noise)
+    """
+    rng = random.Random(seed)
+    entities = max(1, files // FILES_PER_ENTITY)
+    modules = modules or max(1, files // 200)
+    output_dir = 'target' if build == 'maven' else 'build'
+    counts = {'repositories': 0, 'services': 0, 'sources': 0, 'noise': 0}
+    names = []
+
+    for i in range(entities):
+        module = i % modules
+        entity = "%s%s%d" % (rng.choice(DOMAINS), rng.choice(DOMAINS), i)
+        names.append(entity)
+        package = "com.example.m%03d" % module
+        module_dir = os.path.join(root, "module-%03d" % module)
+        src = os.path.join(module_dir, "src", "main", "java", *package.split("."))
+
+        _write(os.path.join(src, "repository", entity + "Repository.java"),
+               _repository_source(rng, package, entity, i % 3))
+        others = rng.sample(names, min(len(names), rng.randint(0, 2)))
+        service = rng.choice(ACTIONS) + entity
+        _write(os.path.join(src, "service", service + "Service.java"),
+               _service_source(rng, package, service, entity, [o for o in others if o != entity], i % 4 == 0))
+        _write(os.path.join(src, "controller", entity + "Controller.java"),
+               "package %s.controller;\n\npublic class %sController {\n%s}\n" % (package, entity, _method_bodies(rng, 3)))
+        _write(os.path.join(src, "dto", entity + "DTO.java"),
+               "package %s.dto;\n\npublic class %sDTO {\n    private Long id;\n    private String custNo;\n}\n"
+               % (package, entity))
+        _write(os.path.join(module_dir, "src", "test", "java", *package.split(".") + [entity + "ServiceTest.java"]),
+               "class %sServiceTest {}\n" % entity)
+        counts['repositories'] += 1
+        counts['services'] += 1
+        counts['sources'] += FILES_PER_ENTITY
+
+        if noise:
+            # Build output mirrors the sources (generated copies would be double counted if not pruned)
+            out = os.path.join(module_dir, output_dir)
+            _write(os.path.join(out, "classes", *package.split(".") + ["repository", entity + "Repository.class"]),
+                   b"\xca\xfe\xba\xbe" + os.urandom(256), 'wb')
+            _write(os.path.join(out, "generated-sources", *package.split(".") + ["service", service + "Service.java"]),
+                   "class %sService {}\n" % service)
+            _write(os.path.join(root, ".git", "objects", "%02x" % (i % 256), "%038x" % i), os.urandom(64), 'wb')
+            counts['noise'] += 3
+
+    for module in range(modules):
+        module_dir = os.path.join(root, "module-%03d" % module)
+        if build == 'maven':
+            _write(os.path.join(module_dir, "pom.xml"), "<project><artifactId>module-%03d</artifactId></project>\n" % module)
+        else:
+            _write(os.path.join(module_dir, "build.gradle"), "apply plugin: 'java'\n")
+    if noise:
+        for i in range(max(1, files // 10)):
+            _write(os.path.join(root, "web", "node_modules", "pkg%d" % (i % 50), "index%d.js" % i), "module.exports = {}\n")
+            counts['noise'] += 1
+    return counts
+
+
+def _measure(func, repeat):
+    """Best wall time over repeat runs, then one run under tracemalloc for the peak memory
+
+    Returns:
+        (seconds, peak memory in MB, result of the last run)
+    """
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak / (1024.0 * 1024.0), result
+
+
+def _record(name, seconds, peak_mb, files=None, **metrics):
+    """One benchmark result (same layout as log_search_bench, so save/compare work the same)"""
+    record = {'name': name, 'seconds': round(seconds, 6), 'peak_mb': round(peak_mb, 2)}
+    if files is not None:
+        record['files'] = files
+        record['files_per_s'] = round(files / seconds, 1) if seconds else None
+    record.update(metrics)
+    print("  %-18s %8.3fs %10s files/s %8.1f MB peak" % (
+        name, seconds, record.get('files_per_s', '-'), peak_mb))
+    return record
+
+
+def bench_phases(root, repeat=3, workers=None):
+    """Time each ProjectAnalyzer phase on a project
+
+    Args:
+        root: Project directory
+        repeat: Runs per phase (best is reported)
+        workers: Processes for the parallel parse phase, defaults to the CPU count
+
+    Returns:
+        Result records
+    """
+    workers = workers or os.cpu_count() or 1
+    output_dir = tempfile.mkdtemp(prefix='analyzer-bench-out-')
+    quiet = contextlib.redirect_stdout(io.StringIO())
+    records = []
+    print("ProjectAnalyzer phases on %s:" % root)
+    try:
+        analyzer = ProjectAnalyzer(root, workers=1, cache_path=os.path.join(output_dir, 'cache.json'))
+        analyzer.cache = None
+
+        seconds, peak, found = _measure(analyzer.scanner.scan, repeat)
+        tasks = [(kind, path) for kind in PARSERS for path in found.get(kind, [])]
+        records.append(_record('walk', seconds, peak, len(tasks), directories=len(analyzer.scanner.directories)))
+
+        seconds, peak, contents = _measure(
+            lambda: [(kind, project_analyzer._read_source(path)) for kind, path in tasks], repeat)
+        records.append(_record('read', seconds, peak, len(tasks),
+                               mb=round(sum(len(content) for kind, content in contents) / 1048576.0, 2)))
+
+        seconds, peak, _ = _measure(lambda: [PARSERS[kind](content) for kind, content in contents], repeat)
+        records.append(_record('parse', seconds, peak, len(tasks)))
+
+        if workers > 1:
+            def parse_pool():
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    return list(executor.map(project_analyzer.parse_source, tasks,
+                                             chunksize=max(1, len(tasks) // (workers * 4))))
+            seconds, peak, _ = _measure(parse_pool, repeat)
+            records.append(_record('read+parse.pool', seconds, peak, len(tasks), workers=workers))
+
+        with quiet:
+            analyzer.project_files = found
+            analyzer._parse_sources()
+            seconds, peak, config = _measure(analyzer._link_project, repeat)
+        records.append(_record('link', seconds, peak, len(tasks)))
+        if len(config['repositoryMapping']) != len(found.get('repository', [])):
+            raise AssertionError("Repository count mismatch: %d mapped, %d files"
+                                 % (len(config['repositoryMapping']), len(found.get('repository', []))))
+
+        config_path = os.path.join(output_dir, 'bugfix.project.auto.json')
+        for config_format in CONFIG_FORMATS:
+            analyzer.config_format = config_format
+            with quiet:
+                seconds, peak, _ = _measure(lambda: analyzer.save_config(config_path), repeat)
+            written = [config_path] if config_format != 'split' else list(section_paths(config_path).values())
+            name = 'serialize' if config_format == 'pretty' else 'serialize.' + config_format
+            records.append(_record(name, seconds, peak, len(tasks),
+                                   mb=round(sum(os.path.getsize(path) for path in written) / 1048576.0, 2)))
+
+        index_path = os.path.join(output_dir, 'bugfix.project.index.db')
+        with quiet:
+            seconds, peak, _ = _measure(lambda: analyzer.save_index(index_path), repeat)
+        records.append(_record('index', seconds, peak, len(tasks)))
+
+        # End to end: every file parsed, then a rerun served from the parse cache
+        def analyze(cache):
+            full = ProjectAnalyzer(root, workers=workers, cache_path=os.path.join(output_dir, 'cache.json'))
+            if not cache:
+                full.cache = None
+            with quiet:
+                return full.analyze_project()
+        seconds, peak, _ = _measure(lambda: analyze(False), repeat)
+        records.append(_record('analyze.cold', seconds, peak, len(tasks), workers=workers))
+        with quiet:
+            analyze(True)
+        seconds, peak, _ = _measure(lambda: analyze(True), repeat)
+        records.append(_record('analyze.cached', seconds, peak, len(tasks)))
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return records
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="ProjectAnalyzer benchmarks on a synthetic Java project")
+    parser.add_argument('--files', type=int, default=2000, help="approximate number of generated source files")
+    parser.add_argument('--modules', type=int, help="number of modules (default: one per 200 files)")
+    parser.add_argument('--build', choices=['maven', 'gradle'], default='maven', help="project layout")
+    parser.add_argument('--no-noise', action='store_true', help="do not generate target/, node_modules/ and .git noise")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per phase (best is reported)")
+    parser.add_argument('--workers', type=int, help="processes for the parallel phases (default: CPU count)")
+    parser.add_argument('--project-dir', help="analyze this project instead of generating one, or keep the generated one here")
+    parser.add_argument('--output', help="write machine-readable results to this JSON file")
+    parser.add_argument('--compare', help="previous results file to compare against")
+    args = parser.parse_args()
+
+    root = args.project_dir or tempfile.mkdtemp(prefix='analyzer-bench-')
+    try:
+        if not os.path.isdir(root) or not os.listdir(root):
+            start = time.perf_counter()
+            counts = generate_java_project(root, args.files, args.modules, args.build, not args.no_noise)
+            print("Generated %d source files (%d repositories, %d services) and %d noise files in %.1fs" % (
+                counts['sources'], counts['repositories'], counts['services'], counts['noise'],
+                time.perf_counter() - start))
+        records = bench_phases(root, args.repeat, args.workers)
+    finally:
+        if not args.project_dir:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        save_results(args.output, records, {'files': args.files, 'modules': args.modules, 'build': args.build,
+                                            'noise': not args.no_noise, 'repeat': args.repeat})
+    if args.compare and compare_results(args.compare, records):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Parse Cache - Per-file parse results reused between analyzer runs
+"""
+import json
+import os
+
+# Returned by ParseCache.get on a miss (None is a valid cached result)
+MISS = object()
+
+
+def file_stat(path):
+    """Size and modification time (ns) used to detect unchanged files"""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+class ParseCache:
+    """Parse results keyed by file kind and path, validated by size and mtime with a content hash fallback"""
+
+    def __init__(self, cache_path, project_root, version):
+        """Initialize parse cache
+
+        Args:
+            cache_path: Cache file path
+            project_root: Project root, entries are keyed by `kind:path` relative to it
+            version: Parser version, a cache written by another version is discarded
+        """
+        self.cache_path = cache_path
+        self.project_root = project_root
+        self.version = version
+        self.entries = {}
+        self.dirty = False
+
+    def load(self):
+        """Load the cache file, a missing, corrupt or outdated cache starts empty"""
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.entries = data.get('files', {})
+
+    def _key(self, kind, path):
+        return '%s:%s' % (kind, os.path.relpath(path, self.project_root).replace(os.sep, '/'))
+
+    def get(self, kind, path, stat, digest):
+        """Look up the cached parse result of a file
+
+        Args:
+            kind: File kind
+            path: File path
+            stat: Current file_stat(path)
+            digest: Function returning the current content hash of a path, only called when the stat differs
+
+        Returns:
+            Cached result, or MISS if the file is new or changed
+        """
+        entry = self.entries.get(self._key(kind, path))
+        if entry is None:
+            return MISS
+        if entry['stat'] != stat:
+            # Touched but possibly unchanged (checkout, copy): compare content
+            try:
+                if digest(path) != entry['sha1']:
+                    return MISS
+            except (IOError, OSError, ValueError):
+                return MISS
+            entry['stat'] = stat
+            self.dirty = True
+        return entry['result']
+
+    def put(self, kind, path, stat, sha1, result):
+        """Store the parse result of a file
+
+        Args:
+            kind: File kind
+            path: File path
+            stat: file_stat(path) taken before the file was read
+            sha1: Content hash
+            result: Parse result (JSON serializable)
+        """
+        self.entries[self._key(kind, path)] = {'stat': stat, 'sha1': sha1, 'result': result}
+        self.dirty = True
+
+    def retain(self, files):
+        """Drop entries of files that no longer exist in the project
+
+        Args:
+            files: (kind, path) of every current file
+        """
+        keep = set(self._key(kind, path) for kind, path in files)
+        for key in [key for key in self.entries if key not in keep]:
+            del self.entries[key]
+            self.dirty = True
+
+    def save(self):
+        """Write the cache file atomically if anything changed"""
+        if not self.dirty:
+            return
+        cache_dir = os.path.dirname(self.cache_path)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': self.version, 'files': self.entries}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+        self.dirty = False
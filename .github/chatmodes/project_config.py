@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Config Writer - Section-by-section output of bugfix.project.auto.json
+
+Sections are encoded and written one at a time instead of building the whole document as one
+string. Besides the indented file, the config can be written compact (no whitespace) or split
+into one file per section (bugfix.project.auto/<section>.<generation>.json) so tools load only
+the sections they need. Every file is written to a temporary path and renamed, readers never see a
+half-written file. A split write creates new section files and then replaces manifest.json, which
+names the current file of every section; readers go through one manifest, so they never mix
+sections of two writes.
+"""
+import json
+import os
+import shutil
+
+CONFIG_FORMATS = ('pretty', 'compact', 'split')
+
+# Lists the current file of every section in the split directory, written last
+MANIFEST_NAME = 'manifest.json'
+
+
+def split_directory(output_path):
+    """Directory of the per-section files (bugfix.project.auto.json -> bugfix.project.auto/)"""
+    root, extension = os.path.splitext(output_path)
+    return root if extension else output_path + '.d'
+
+
+def _read_manifest(directory):
+    """Manifest of a split directory, None when there is none"""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def section_paths(output_path):
+    """Current file of every section in the split format
+
+    Returns:
+        {section: path}, empty when the configuration is not split
+    """
+    directory = split_directory(output_path)
+    manifest = _read_manifest(directory) or {'sections': {}}
+    return dict((section, os.path.join(directory, name)) for section, name in manifest['sections'].items())
+
+
+def dump_sections(sections, f, indent=None):
+    """Write a JSON object one section at a time
+
+    Args:
+        sections: (name, value) pairs in output order
+        f: Text file to write to
+        indent: Indentation as in json.dump, None writes compact JSON
+
+    The output is identical to json.dump(dict(sections), f, indent=indent) (compact separators
+    when indent is None). Values are written chunk by chunk as the encoder produces them, so
+    not even one section is held as a string.
+    """
+    if indent is None:
+        separator = ','
+        item = '%s:'
+        encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    else:
+        separator = ',\n' + ' ' * indent
+        item = '%s: '
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=indent)
+        # Literal newlines only occur between tokens, strings have them escaped
+        nested = '\n' + ' ' * indent
+
+    empty = True
+    for name, value in sections:
+        f.write(('{\n' + ' ' * indent if indent is not None else '{') if empty else separator)
+        f.write(item % json.dumps(name, ensure_ascii=False))
+        for chunk in encoder.iterencode(value):
+            f.write(chunk if indent is None else chunk.replace('\n', nested))
+        empty = False
+    f.write('{}' if empty else ('\n}' if indent is not None else '}'))
+
+
+def _write_atomic(path, sections, indent):
+    directory = os.path.dirname(path)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        dump_sections(sections, f, indent)
+    os.replace(tmp_path, path)
+
+
+def write_config(config, output_path, config_format='pretty', sections=None):
+    """Write the project configuration
+
+    Args:
+        config: Configuration dictionary
+        output_path: bugfix.project.auto.json path
+        config_format: 'pretty' (indented), 'compact' or 'split' (one compact {section: value} file per section)
+        sections: In the split format, only rewrite these sections (None rewrites all)
+
+    Returns:
+        Paths written
+    """
+    if config_format not in CONFIG_FORMATS:
+        raise ValueError("Unknown config format: %s (expected one of %s)" % (config_format, ", ".join(CONFIG_FORMATS)))
+
+    if config_format == 'split':
+        directory = split_directory(output_path)
+        previous = _read_manifest(directory) or {'generation': 0, 'sections': {}}
+        generation = previous['generation'] + 1
+        files = {}
+        written = []
+        for name in config:
+            if sections is None or name in sections or name not in previous['sections']:
+                files[name] = '%s.%d.json' % (name, generation)
+                path = os.path.join(directory, files[name])
+                _write_atomic(path, [(name, config[name])], None)
+                written.append(path)
+            else:
+                files[name] = previous['sections'][name]
+        _write_atomic(os.path.join(directory, MANIFEST_NAME),
+                      [('generation', generation), ('sections', files)], None)
+
+        # Files of the previous write stay for readers that loaded its manifest just before the swap
+        keep = set(files.values()) | set(previous['sections'].values()) | set([MANIFEST_NAME])
+        for name in os.listdir(directory):
+            if name.endswith('.json') and name not in keep:
+                os.remove(os.path.join(directory, name))
+        # A whole file left by another format would go stale next to the sections
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return written
+
+    _write_atomic(output_path, config.items(), 2 if config_format == 'pretty' else None)
+    if os.path.isdir(split_directory(output_path)):
+        shutil.rmtree(split_directory(output_path))
+    return [output_path]
+
+
+def load_sections(output_path, sections, default=None):
+    """Load several sections of the project configuration from the same write
+
+    Args:
+        output_path: bugfix.project.auto.json path
+        sections: Section names (repositoryMapping, extractionPatterns...)
+        default: Value of a section missing from the configuration
+
+    Returns:
+        Section values in the order of sections, all default when there is no configuration
+    """
+    directory = split_directory(output_path)
+    for _ in range(3):
+        manifest = _read_manifest(directory)
+        if manifest is None:
+            break
+        try:
+            values = []
+            for section in sections:
+                name = manifest['sections'].get(section)
+                if name is None:
+                    values.append(default)
+                    continue
+                with open(os.path.join(directory, name), 'r') as f:
+                    values.append(json.load(f).get(section, default))
+            return values
+        except (IOError, OSError):
+            # Removed by two later writes while it was being read, load the new manifest
+            continue
+
+    try:
+        with open(output_path, 'r') as f:
+            config = json.load(f)
+    except (IOError, OSError):
+        return [default] * len(sections)
+    return [config.get(section, default) for section in sections]
+
+
+def load_section(output_path, section, default=None):
+    """Load one section of the project configuration, whichever format it was written in
+
+    Args:
+        output_path: bugfix.project.auto.json path
+        section: Section name (repositoryMapping, extractionPatterns...)
+        default: Returned when the configuration or the section does not exist
+
+    Returns:
+        Section value
+    """
+    return load_sections(output_path, [section], default)[0]
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Symbol Index - SQLite index of classes, injections and tables
+
+ProjectAnalyzer writes bugfix.project.index.db next to bugfix.project.auto.json. Lookups go
+through indexed queries in both directions (services of a table, tables of a service...)
+instead of loading and scanning the whole JSON config. Cross-references are resolved by
+joins at query time, so they do not depend on the order classes were found in.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+
+DEFAULT_INDEX_PATH = os.path.join(".github", "chatmodes", "bugfix.project.index.db")
+
+
+def index_path_for(config_path):
+    """Index file written next to a bugfix.project.auto.json"""
+    return os.path.join(os.path.dirname(config_path), os.path.basename(DEFAULT_INDEX_PATH))
+
+SCHEMA = """
+CREATE TABLE classes (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    path TEXT NOT NULL,
+    table_name TEXT COLLATE NOCASE,
+    business_type TEXT,
+    description TEXT
+);
+CREATE TABLE injections (
+    class_name TEXT NOT NULL,
+    target TEXT NOT NULL,
+    via TEXT NOT NULL
+);
+"""
+
+INDEXES = """
+CREATE INDEX classes_name ON classes (name);
+CREATE INDEX classes_table ON classes (table_name);
+CREATE INDEX injections_class ON injections (class_name);
+CREATE INDEX injections_target ON injections (target);
+"""
+
+
+def build_index(index_path, classes, injections):
+    """Write a new index file atomically
+
+    Args:
+        index_path: Index file path
+        classes: (name, kind, path, table name, business type, description) rows
+        injections: (class name, injected class name, 'field' or 'constructor') rows
+    """
+    index_dir = os.path.dirname(index_path)
+    if index_dir and not os.path.exists(index_dir):
+        os.makedirs(index_dir)
+    tmp_path = index_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany("INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?)", classes)
+        conn.executemany("INSERT INTO injections VALUES (?, ?, ?)", injections)
+        # Indexes are cheaper to build once after the bulk insert
+        conn.executescript(INDEXES)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, index_path)
+
+
+class SymbolIndex:
+    """Query API over the symbol index, the database is opened on the first query"""
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        """Initialize symbol index
+
+        Args:
+            index_path: Index file path
+        """
+        self.index_path = index_path
+        self._conn = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            if not os.path.exists(self.index_path):
+                raise IOError("Symbol index not found: %s (run project_analyzer.py first)" % self.index_path)
+            self._conn = sqlite3.connect('file:%s?mode=ro' % self.index_path, uri=True)
+        return self._conn
+
+    def _column(self, sql, *params):
+        return [row[0] for row in self.conn.execute(sql, params)]
+
+    def find_class(self, name):
+        """Where a class is declared
+
+        Returns:
+            List of {name, kind, path, table, businessType, description} (one per declaring file)
+        """
+        rows = self.conn.execute(
+            "SELECT name, kind, path, table_name, business_type, description FROM classes WHERE name = ? ORDER BY path",
+            (name,))
+        return [dict(zip(('name', 'kind', 'path', 'table', 'businessType', 'description'), row)) for row in rows]
+
+    def table_for_repository(self, repository):
+        """Tables mapped by a Repository class"""
+        return self._column(
+            "SELECT DISTINCT table_name FROM classes WHERE name = ? AND table_name IS NOT NULL ORDER BY table_name",
+            repository)
+
+    def repositories_for_table(self, table):
+        """Repository classes mapped to a table (case-insensitive)"""
+        return self._column(
+            "SELECT DISTINCT name FROM classes WHERE table_name = ? ORDER BY name", table)
+
+    def services_for_table(self, table):
+        """Classes injecting a Repository of the table"""
+        return self._column(
+            "SELECT DISTINCT i.class_name FROM classes r JOIN injections i ON i.target = r.name "
+            "WHERE r.table_name = ? ORDER BY i.class_name", table)
+
+    def tables_for_service(self, service):
+        """Tables reached through the Repositories a class injects"""
+        return self._column(
+            "SELECT DISTINCT r.table_name FROM injections i JOIN classes r ON r.name = i.target "
+            "WHERE i.class_name = ? AND r.table_name IS NOT NULL ORDER BY r.table_name", service)
+
+    def table_services(self):
+        """Every (table, class injecting a Repository of the table) pair, for building lookups in one query"""
+        return self.conn.execute(
+            "SELECT DISTINCT r.table_name, i.class_name FROM classes r JOIN injections i ON i.target = r.name "
+            "WHERE r.table_name IS NOT NULL ORDER BY r.table_name, i.class_name").fetchall()
+
+    def dependencies(self, name):
+        """Classes injected into a class
+
+        Returns:
+            List of {target, via}
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT target, via FROM injections WHERE class_name = ? ORDER BY target, via", (name,))
+        return [{'target': target, 'via': via} for target, via in rows]
+
+    def dependents(self, name):
+        """Classes injecting a class
+
+        Returns:
+            List of {class, via}
+        """
+        rows = self.conn.execute(
+            "SELECT DISTINCT class_name, via FROM injections WHERE target = ? ORDER BY class_name, via", (name,))
+        return [{'class': class_name, 'via': via} for class_name, via in rows]
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+QUERIES = {
+    'services-for-table': SymbolIndex.services_for_table,
+    'tables-for-service': SymbolIndex.tables_for_service,
+    'repositories-for-table': SymbolIndex.repositories_for_table,
+    'table-for-repository': SymbolIndex.table_for_repository,
+    'dependencies': SymbolIndex.dependencies,
+    'dependents': SymbolIndex.dependents,
+    'class': SymbolIndex.find_class
+}
+
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description="Query the project symbol index")
+    parser.add_argument('query', choices=sorted(QUERIES))
+    parser.add_argument('name', help="table or class name")
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help="index file (default: %(default)s)")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args()
+
+    index = SymbolIndex(args.index)
+    try:
+        result = QUERIES[args.query](index, args.name)
+    except (IOError, sqlite3.Error) as e:
+        print("Query failed: %s" % str(e))
+        sys.exit(1)
+    finally:
+        index.close()
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    for item in result:
+        print(" ".join(str(value) for value in item.values()) if isinstance(item, dict) else item)
+
+
+if __name__ == "__main__":
+    main()
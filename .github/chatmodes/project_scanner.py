@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Scanner - Single-pass project walk shared by all source classifiers
+"""
+import os
+import re
+
+# VCS metadata, tool caches and IDE settings never contain sources to analyze
+DEFAULT_IGNORES = [
+    '.git/', '.svn/', '.hg/',
+    '.gradle/', 'node_modules/',
+    '.idea/', '.vscode/', '.settings/', '__pycache__/'
+]
+
+# Build output directory names. These are also valid package names (com/acme/build), so they are only
+# pruned where a build tool writes them: outside any src/ tree, or next to a build file
+BUILD_OUTPUT_DIRS = frozenset(['target', 'build', 'out'])
+BUILD_FILES = frozenset(['pom.xml', 'build.gradle', 'build.gradle.kts', 'build.xml'])
+
+
+def _pattern_regex(pattern):
+    """Translate a gitignore glob into a compiled regular expression
+
+    Args:
+        pattern: Glob without negation, leading or trailing slash
+
+    Returns:
+        Regular expression matching the whole relative path
+    """
+    parts = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            parts.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and pattern.find(']', i + 2) > 0:
+            end = pattern.find(']', i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            parts.append('[%s]' % chars.replace('\\', '\\\\'))
+            i = end + 1
+        elif pattern[i] == '\\' and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile('(?:%s)\\Z' % ''.join(parts))
+
+
+class IgnoreRules:
+    """Ordered gitignore-style rules for one directory, the last matching rule wins"""
+
+    def __init__(self, patterns=None, base=''):
+        """Initialize ignore rules
+
+        Args:
+            patterns: Lines in .gitignore syntax (comments, `!` negation, trailing `/` for directories)
+            base: Directory the patterns are relative to, relative to the project root ('' for the root)
+        """
+        self.base = base
+        self.rules = []
+        for line in patterns or []:
+            line = line.rstrip('\r\n')
+            if not line.endswith('\\ '):
+                line = line.rstrip(' ')
+            if not line or line.startswith('#'):
+                continue
+            negate = line.startswith('!')
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith('/')
+            line = line.rstrip('/')
+            if not line:
+                continue
+            # Patterns containing a slash are anchored to the base directory, others match any name
+            anchored = '/' in line
+            self.rules.append((_pattern_regex(line.lstrip('/')), anchored, dir_only, negate))
+
+    @classmethod
+    def from_file(cls, path, base=''):
+        """Load rules from a .gitignore file, unreadable files give no rules"""
+        try:
+            with open(path, 'r') as f:
+                return cls(f.readlines(), base)
+        except (IOError, OSError, UnicodeDecodeError):
+            return cls([], base)
+
+    def match(self, rel_path, is_dir):
+        """Check a path against these rules
+
+        Args:
+            rel_path: Path relative to the project root, '/' separated
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if ignored, False if re-included by a negation, None if no rule matches
+        """
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return None
+            rel_path = rel_path[len(self.base) + 1:]
+        name = rel_path.rsplit('/', 1)[-1]
+
+        decision = None
+        for regex, anchored, dir_only, negate in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path if anchored else name):
+                decision = not negate
+        return decision
+
+
+class ProjectScanner:
+    """Walks the project tree once and hands each file to every registered classifier"""
+
+    def __init__(self, project_root, ignore_patterns=None, use_gitignore=True):
+        """Initialize project scanner
+
+        Args:
+            project_root: Project root directory path
+            ignore_patterns: Ignore rules in .gitignore syntax, defaults to DEFAULT_IGNORES
+            use_gitignore: Whether to also apply the .gitignore files found in the tree
+        """
+        self.project_root = os.path.abspath(project_root)
+        self.rules = IgnoreRules(DEFAULT_IGNORES if ignore_patterns is None else ignore_patterns)
+        self.use_gitignore = use_gitignore
+        self.classifiers = []
+        # Directories visited by the last scan (what a file watcher has to watch)
+        self.directories = []
+
+    def register(self, kind, predicate):
+        """Register a file classifier
+
+        Args:
+            kind: Name the matching files are reported under
+            predicate: Function taking a file name and returning True for files of this kind
+        """
+        self.classifiers.append((kind, predicate))
+
+    def classify(self, name):
+        """Kinds a file name belongs to (a file may match several classifiers)"""
+        return [kind for kind, predicate in self.classifiers if predicate(name)]
+
+    @staticmethod
+    def _build_output(rel_path, parent, parent_names=None):
+        """Check whether a directory is build output (see BUILD_OUTPUT_DIRS)
+
+        Args:
+            rel_path: Directory path relative to the project root
+            parent: Absolute path of its parent directory
+            parent_names: Entry names of the parent directory if already listed
+
+        Returns:
+            True if the directory holds build output rather than sources
+        """
+        parts = rel_path.split('/')
+        if parts[-1] not in BUILD_OUTPUT_DIRS:
+            return False
+        if 'src' not in parts[:-1]:
+            return True
+        if parent_names is not None:
+            return not BUILD_FILES.isdisjoint(parent_names)
+        return any(os.path.isfile(os.path.join(parent, name)) for name in BUILD_FILES)
+
+    @classmethod
+    def _ignored(cls, chain, rel_path, is_dir, parent=None, parent_names=None):
+        # Build output is ignored unless a rule says otherwise (a `!build/` negation keeps it)
+        ignored = is_dir and parent is not None and cls._build_output(rel_path, parent, parent_names)
+        for rules in chain:
+            decision = rules.match(rel_path, is_dir)
+            if decision is not None:
+                ignored = decision
+        return ignored
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.project_root).replace(os.sep, '/')
+
+    def ignored(self, path, is_dir=False):
+        """Check a single path against the ignore rules of the directories above it
+
+        Args:
+            path: File or directory path inside the project
+            is_dir: Whether the path is a directory
+
+        Returns:
+            True if the path or one of its parent directories is ignored
+        """
+        parts = self._relative(path).split('/')
+        chain = (self.rules,)
+        directory = self.project_root
+        for depth, name in enumerate(parts):
+            if self.use_gitignore:
+                gitignore = os.path.join(directory, '.gitignore')
+                if os.path.isfile(gitignore):
+                    chain = chain + (IgnoreRules.from_file(gitignore, '/'.join(parts[:depth])),)
+            last = depth == len(parts) - 1
+            if self._ignored(chain, '/'.join(parts[:depth + 1]), is_dir or not last, directory):
+                return True
+            directory = os.path.join(directory, name)
+        return False
+
+    def walk_key(self, path):
+        """Sort key reproducing the scan order: a directory's files by name, then its subdirectories by name"""
+        parts = self._relative(path).split('/')
+        return [(1, name) for name in parts[:-1]] + [(0, parts[-1])]
+
+    def scan(self):
+        """Walk the project tree with os.scandir, pruning ignored directories
+
+        Returns:
+            Dictionary of kind -> file paths in walk order (every registered kind is present)
+        """
+        found = dict((kind, []) for kind, predicate in self.classifiers)
+        self.directories = []
+        stack = [(self.project_root, '', (self.rules,))]
+
+        while stack:
+            directory, rel_dir, chain = stack.pop()
+            self.directories.append(directory)
+            try:
+                entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+            except OSError:
+                continue
+
+            names = frozenset(entry.name for entry in entries)
+            if self.use_gitignore and '.gitignore' in names:
+                chain = chain + (IgnoreRules.from_file(os.path.join(directory, '.gitignore'), rel_dir),)
+
+            subdirs = []
+            for entry in entries:
+                rel_path = rel_dir + '/' + entry.name if rel_dir else entry.name
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    continue
+                if is_dir:
+                    # Symlinked directories are not followed, same as os.walk
+                    if not entry.is_symlink() and not self._ignored(chain, rel_path, True, directory, names):
+                        subdirs.append((entry.path, rel_path))
+                    continue
+
+                kinds = self.classify(entry.name)
+                if kinds and not self._ignored(chain, rel_path, False):
+                    for kind in kinds:
+                        found[kind].append(entry.path)
+
+            for path, rel_path in reversed(subdirs):
+                stack.append((path, rel_path, chain))
+
+        return found
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Project Watcher - Keep bugfix.project.auto.json up to date while the code changes
+
+On Linux the project directories are watched with inotify (through ctypes, no extra
+dependency), so an idle watcher sleeps in select(). Elsewhere, or when inotify is not
+available, the project is re-scanned periodically. Bursts of saves are debounced and only
+the affected files are parsed again.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from project_cache import file_stat
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """Directory watcher on Linux inotify"""
+
+    def __init__(self, scanner):
+        """Initialize inotify watcher
+
+        Args:
+            scanner: ProjectScanner deciding which directories and files matter
+        """
+        self.scanner = scanner
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+
+    def watch(self, directories):
+        """Add watches for directories not watched yet (the kernel drops watches of removed directories)"""
+        watched = set(self.watches.values())
+        for directory in directories:
+            if directory in watched:
+                continue
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "inotify watch limit reached (fs.inotify.max_user_watches)")
+                continue
+            self.watches[wd] = directory
+
+    def _read_events(self):
+        data = b''
+        while True:
+            try:
+                chunk = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            yield wd, mask, name
+
+    def wait(self, timeout=None):
+        """Wait for changes
+
+        Args:
+            timeout: Seconds to wait, None waits until something changes
+
+        Returns:
+            (changed file paths, whether the directory structure or ignore rules changed)
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        paths = set()
+        rescan = False
+        if not readable:
+            return paths, rescan
+
+        for wd, mask, name in self._read_events():
+            if mask & IN_Q_OVERFLOW:
+                rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                # A directory appeared, moved or disappeared: new watches and a re-scan are needed
+                if not self.scanner.ignored(path, True):
+                    rescan = True
+            elif name == '.gitignore':
+                rescan = True
+            elif self.scanner.classify(name):
+                paths.add(path)
+        return paths, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Fallback watcher comparing file sizes and modification times between periodic scans"""
+
+    def __init__(self, scanner, interval=2.0):
+        """Initialize polling watcher
+
+        Args:
+            scanner: ProjectScanner used for each scan
+            interval: Seconds between scans
+        """
+        self.scanner = scanner
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self):
+        snapshot = {}
+        for files in self.scanner.scan().values():
+            for path in files:
+                try:
+                    snapshot[path] = file_stat(path)
+                except OSError:
+                    pass
+        return snapshot
+
+    def watch(self, directories):
+        """Every scan covers the whole project, nothing to add"""
+
+    def wait(self, timeout=None):
+        """Wait for changes, same return value as InotifyWatcher.wait"""
+        while True:
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+            snapshot = self._snapshot()
+            paths = set(path for path in set(snapshot) | set(self.snapshot)
+                        if snapshot.get(path) != self.snapshot.get(path))
+            self.snapshot = snapshot
+            if paths or timeout is not None:
+                return paths, False
+
+    def close(self):
+        pass
+
+
+def create_watcher(scanner, poll_interval=2.0):
+    """inotify watcher on Linux, polling watcher elsewhere or when inotify is unavailable"""
+    if sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(scanner)
+            watcher.watch(scanner.directories)
+            return watcher
+        except (OSError, AttributeError) as e:
+            print("inotify unavailable (%s), polling every %.1fs" % (str(e), poll_interval))
+    return PollingWatcher(scanner, poll_interval)
+
+
+def watch(analyzer, output_path=None, debounce=0.5, poll_interval=2.0, index_path=None):
+    """Analyze the project, then re-analyze and rewrite the config and symbol index whenever sources change
+
+    Args:
+        analyzer: ProjectAnalyzer
+        output_path: Output file path, defaults to the analyzer's default location
+        debounce: Seconds without further changes before re-analyzing
+        poll_interval: Seconds between scans when inotify is unavailable
+        index_path: Symbol index path, defaults to the analyzer's default location
+    """
+    config = analyzer.analyze_project()
+    analyzer.save_config(output_path)
+    analyzer.save_index(index_path)
+    watcher = create_watcher(analyzer.scanner, poll_interval)
+    print("Watching %s for changes (Ctrl+C to stop)..." % analyzer.project_root)
+
+    try:
+        while True:
+            paths, rescan = watcher.wait()
+            # Collect the rest of the burst (save-all, checkout, formatter)
+            while True:
+                more_paths, more_rescan = watcher.wait(debounce)
+                if not more_paths and not more_rescan:
+                    break
+                paths |= more_paths
+                rescan = rescan or more_rescan
+
+            if rescan:
+                updated = analyzer.analyze_project()
+                watcher.watch(analyzer.scanner.directories)
+            elif paths:
+                print("Re-analyzing %d changed files..." % len(paths))
+                updated = analyzer.update_files(paths)
+            else:
+                continue
+
+            changed = [section for section in updated if updated[section] != config.get(section)]
+            if changed:
+                analyzer.save_config(output_path, changed)
+                print("Updated sections: %s" % ", ".join(changed))
+            # Injections are only in the index, rebuild it even when the config did not change
+            analyzer.save_index(index_path)
+            config = updated
+    except KeyboardInterrupt:
+        print("\nStopped watching")
+    finally:
+        watcher.close()
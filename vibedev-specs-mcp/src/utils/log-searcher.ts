@@ -1,4 +1,6 @@
 import * as fs from 'fs';
+import * as net from 'net';
+import * as os from 'os';
 import * as path from 'path';
 import { spawn } from 'child_process';
 
@@ -25,6 +27,8 @@ export interface LogSearchConfig {
     caseInsensitive: string;
     includeTimestamp: string;
     tidLength: string;
+    daemonSocket?: string;
+    metricsLog?: string;
   };
 }
 
@@ -35,6 +39,25 @@ export interface SearchResult {
   lines_count: number;
   timestamp: string;
   error?: string;
+  metrics?: SearchMetrics;
+}
+
+// 与 log_search.py 的 metrics 相同: 各阶段耗时(毫秒)和计数, 未经历的阶段为null
+export interface SearchMetrics {
+  operation: string;
+  trace_id: string;
+  host: string | null;
+  connect_ms: number | null;
+  first_byte_ms: number | null;
+  transfer_ms: number | null;
+  bytes: number;
+  lines: number;
+  files: number | null;
+  extract_ms: number | null;
+  matches: Record<string, number> | null;
+  total_ms: number | null;
+  cached?: boolean;
+  hosts?: SearchMetrics[];
 }
 
 export interface BusinessInfo {
@@ -47,6 +70,7 @@ export interface BusinessInfo {
 
 export class LogSearcher {
   private config: LogSearchConfig;
+  private metricsHooks: Array<(metrics: SearchMetrics) => void> = [];
 
   constructor(configPath: string = './bugfix.config.json') {
     if (!configPath) {
@@ -100,7 +124,89 @@ export class LogSearcher {
     }
   }
 
+  private daemonSocketPath(): string {
+    if (this.config.searchOptions.daemonSocket) {
+      return this.config.searchOptions.daemonSocket;
+    }
+    // Same default as log_daemon.py: one socket per user in the temp directory
+    const uid = process.getuid ? process.getuid() : 0;
+    return path.join(os.tmpdir(), `log_search-${uid}.sock`);
+  }
+
+  /**
+   * Search through a running `log_search.py --daemon`, which keeps SSH sessions warm.
+   * Resolves to null when no daemon is listening so the caller can fall back to ssh.
+   */
+  private searchViaDaemon(traceId: string): Promise<SearchResult | null> {
+    const socketPath = this.daemonSocketPath();
+    if (!fs.existsSync(socketPath)) {
+      return Promise.resolve(null);
+    }
+
+    return new Promise((resolve) => {
+      let buffer = '';
+      let settled = false;
+      const finish = (result: SearchResult | null) => {
+        if (!settled) {
+          settled = true;
+          socket.destroy();
+          resolve(result);
+        }
+      };
+
+      const socket = net.createConnection({ path: socketPath }, () => {
+        socket.write(JSON.stringify({ op: 'search', trace_id: traceId }) + '\n');
+      });
+      socket.setEncoding('utf-8');
+      socket.setTimeout((parseInt(this.config.logServer.timeout) || 30) * 1000 * 10, () => finish(null));
+      socket.on('data', (chunk: Buffer | string) => {
+        buffer += chunk.toString();
+        const newline = buffer.indexOf('\n');
+        if (newline >= 0) {
+          try {
+            finish(JSON.parse(buffer.slice(0, newline)));
+          } catch {
+            finish(null);
+          }
+        }
+      });
+      socket.on('error', () => finish(null));
+      socket.on('close', () => finish(null));
+    });
+  }
+
+  /**
+   * 注册指标回调, 通过守护进程完成的搜索会以其返回的指标调用
+   */
+  addMetricsHook(callback: (metrics: SearchMetrics) => void): void {
+    this.metricsHooks.push(callback);
+  }
+
   async searchByTraceId(traceId: string): Promise<SearchResult> {
+    const daemonResult = await this.searchViaDaemon(traceId);
+    if (daemonResult && !daemonResult.error) {
+      console.log(`Searched TraceId via log search daemon: ${traceId}`);
+      const metrics = daemonResult.metrics;
+      if (metrics) {
+        // 回调失败不影响已经成功的搜索
+        this.metricsHooks.forEach(hook => {
+          try {
+            hook(metrics);
+          } catch (error) {
+            console.error(`Metrics hook failed: ${error}`);
+          }
+        });
+      }
+      return {
+        trace_id: traceId,
+        command: daemonResult.command || 'log_search daemon',
+        output: daemonResult.output || '',
+        lines_count: daemonResult.lines_count || 0,
+        timestamp: daemonResult.timestamp || new Date().toISOString(),
+        metrics
+      };
+    }
+
     const logConfig = this.config.logServer;
     const searchConfig = this.config.searchOptions;
     